@@ -1,4 +1,4 @@
-import React, { createContext, useState, useContext, useEffect } from 'react';
+import React, { createContext, useState, useContext, useEffect, useRef } from 'react';
 import axios from 'axios';
 
 const AuthContext = createContext();
@@ -24,6 +24,59 @@ export const AuthProvider = ({ children }) => {
     axios.defaults.headers.common['Authorization'] = `Bearer ${token}`;
   }
 
+  // Access tokens are short-lived: on a 401, trade the refresh token for a
+  // new pair and replay the request. Refreshing rotates (revokes) the refresh
+  // token, so concurrent 401s share one in-flight refresh.
+  const refreshInFlight = useRef(null);
+
+  useEffect(() => {
+    const refreshTokens = () => {
+      if (!refreshInFlight.current) {
+        refreshInFlight.current = axios.post('/api/auth/refresh', null, {
+          headers: { Authorization: `Bearer ${localStorage.getItem('refresh_token')}` }
+        }).then((response) => {
+          const { access_token, refresh_token } = response.data;
+          localStorage.setItem('token', access_token);
+          localStorage.setItem('refresh_token', refresh_token);
+          setToken(access_token);
+          axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
+          return access_token;
+        }).catch((refreshError) => {
+          localStorage.removeItem('token');
+          localStorage.removeItem('refresh_token');
+          setToken(null);
+          setUser(null);
+          delete axios.defaults.headers.common['Authorization'];
+          throw refreshError;
+        }).finally(() => {
+          refreshInFlight.current = null;
+        });
+      }
+      return refreshInFlight.current;
+    };
+
+    const interceptor = axios.interceptors.response.use(null, async (error) => {
+      const original = error.config;
+      if (error.response?.status !== 401 || !localStorage.getItem('refresh_token') || !original ||
+          original._retried || original.url === '/api/auth/refresh') {
+        throw error;
+      }
+      original._retried = true;
+      let accessToken = localStorage.getItem('token');
+      // Unless another request already refreshed since this one was sent
+      if (!accessToken || original.headers['Authorization'] === `Bearer ${accessToken}`) {
+        try {
+          accessToken = await refreshTokens();
+        } catch (refreshError) {
+          throw error;
+        }
+      }
+      original.headers['Authorization'] = `Bearer ${accessToken}`;
+      return axios(original);
+    });
+    return () => axios.interceptors.response.eject(interceptor);
+  }, []);
+
   useEffect(() => {
     const initAuth = async () => {
       const storedToken = localStorage.getItem('token');
@@ -36,6 +89,7 @@ export const AuthProvider = ({ children }) => {
         } catch (error) {
           // Token is invalid, remove it
           localStorage.removeItem('token');
+          localStorage.removeItem('refresh_token');
           setToken(null);
           delete axios.defaults.headers.common['Authorization'];
         }
@@ -67,9 +121,10 @@ export const AuthProvider = ({ children }) => {
   const login = async (email, password) => {
     try {
       const response = await axios.post('/api/auth/login', { email, password });
-      const { access_token } = response.data;
+      const { access_token, refresh_token } = response.data;
 
       localStorage.setItem('token', access_token);
+      localStorage.setItem('refresh_token', refresh_token);
       setToken(access_token);
       axios.defaults.headers.common['Authorization'] = `Bearer ${access_token}`;
 
@@ -129,11 +184,13 @@ export const AuthProvider = ({ children }) => {
 
   const logout = async () => {
     try {
-      await axios.post('/api/auth/logout');
+      // Revokes both tokens server-side
+      await axios.post('/api/auth/logout', { refresh_token: localStorage.getItem('refresh_token') });
     } catch (error) {
       console.error('Logout error:', error);
     } finally {
       localStorage.removeItem('token');
+      localStorage.removeItem('refresh_token');
       setToken(null);
       setUser(null);
       delete axios.defaults.headers.common['Authorization'];
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import {
   Container,
@@ -25,6 +25,8 @@ const ScholarshipDetail = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [applying, setApplying] = useState(false);
+  // One key per submission attempt, reused if the request is retried
+  const idempotencyKey = useRef(null);
 
   useEffect(() => {
     fetchScholarship();
@@ -48,10 +50,16 @@ const ScholarshipDetail = () => {
     }
 
     setApplying(true);
+    if (!idempotencyKey.current) {
+      idempotencyKey.current = `${scholarship.id}-${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    }
     try {
       await axios.post('/api/applications', {
         scholarship_id: scholarship.id
+      }, {
+        headers: { 'Idempotency-Key': idempotencyKey.current }
       });
+      idempotencyKey.current = null;
       alert('Application submitted successfully!');
     } catch (error) {
       alert('Failed to submit application: ' + (error.response?.data?.error || 'Unknown error'));
@@ -0,0 +1,211 @@
+"""
+Application trend analytics.
+
+`application_daily_stat` holds one counter per (submission day, scholarship,
+current status). ORM events below keep it in step as applications are
+submitted, reviewed or deleted, and `flask rollup-applications` rebuilds it
+from the application tables (hot and archived) for backfills or repairs.
+Dashboard charts then read O(days) rows.
+
+The events only collect per-bucket deltas on the session; they are applied
+in a short transaction of their own once the change commits. Every
+submission on a given day hits the same few counter rows, so updating them
+inside the request transaction would serialize concurrent submissions on
+the row lock until each request committed. A crash between the two commits
+loses the increment, which the rollup command repairs.
+"""
+
+import logging
+
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, event, func, insert, inspect, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, object_session
+
+from extensions import db
+from models import Application, ApplicationDailyStat, ArchivedApplication
+
+logger = logging.getLogger(__name__)
+
+UPSERT_DIALECTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+PENDING_DELTAS = 'application_daily_stat_deltas'  # session.info key
+
+
+def _bucket(day, scholarship_id, status):
+    return {'day': day, 'scholarship_id': scholarship_id, 'status': status or 'pending'}
+
+
+def _bucket_of(application, values=None):
+    values = values or {}
+    submitted = values.get('submission_date', application.submission_date)
+    if submitted is None:
+        return None
+    return _bucket(submitted.date(), values.get('scholarship_id', application.scholarship_id),
+                   values.get('status', application.status))
+
+
+def _bump(connection, bucket, delta):
+    """Add `delta` to a bucket's counter, creating the row if needed."""
+    table = ApplicationDailyStat.__table__
+    upsert = UPSERT_DIALECTS.get(connection.dialect.name)
+    if upsert is not None:
+        statement = upsert(table).values(count=delta, **bucket)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.scholarship_id, table.c.status],
+            set_={'count': table.c.count + statement.excluded.count}
+        ))
+        return
+    result = connection.execute(
+        update(table).where(*[table.c[key] == value for key, value in bucket.items()])
+        .values(count=table.c.count + delta)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(count=delta, **bucket))
+
+
+def _defer_bump(target, bucket, delta):
+    """Queue a counter change for after the session commits."""
+    deltas = object_session(target).info.setdefault(PENDING_DELTAS, {})
+    key = tuple(bucket.items())
+    deltas[key] = deltas.get(key, 0) + delta
+
+
+@event.listens_for(Application, 'after_insert')
+def _count_submitted(mapper, connection, target):
+    bucket = _bucket_of(target)
+    if bucket:
+        _defer_bump(target, bucket, 1)
+
+
+@event.listens_for(Application, 'after_update')
+def _move_reviewed(mapper, connection, target):
+    # Values before this flush, for the columns that place the row in a bucket
+    state = inspect(target)
+    previous = {}
+    for key in ('submission_date', 'scholarship_id', 'status'):
+        history = state.attrs[key].history
+        if history.deleted:
+            previous[key] = history.deleted[0]
+    if not previous:
+        return
+    old, new = _bucket_of(target, previous), _bucket_of(target)
+    if old != new:
+        if old:
+            _defer_bump(target, old, -1)
+        if new:
+            _defer_bump(target, new, 1)
+
+
+@event.listens_for(Application, 'after_delete')
+def _count_deleted(mapper, connection, target):
+    bucket = _bucket_of(target)
+    if bucket:
+        _defer_bump(target, bucket, -1)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_deltas(session):
+    deltas = session.info.pop(PENDING_DELTAS, None)
+    if not deltas:
+        return
+    try:
+        with session.get_bind(mapper=inspect(ApplicationDailyStat)).begin() as connection:
+            # A fixed order keeps concurrent appliers from deadlocking
+            for key in sorted(deltas, key=repr):
+                if deltas[key]:
+                    _bump(connection, dict(key), deltas[key])
+    except Exception:
+        # The application change is committed; `flask rollup-applications` repairs the counts
+        logger.exception('Could not update application_daily_stat')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_deltas(session):
+    session.info.pop(PENDING_DELTAS, None)
+
+
+def rebuild_daily_stats(since=None):
+    """Recompute the rollup (from `since`, a date, onwards) from the application tables.
+
+    Returns the number of buckets written.
+    """
+    sources = [
+        select(model.submission_date, model.scholarship_id, model.status)
+        for model in (Application, ArchivedApplication)
+    ]
+    if since is not None:
+        start = datetime.combine(since, datetime.min.time())
+        sources = [source.where(source.selected_columns.submission_date >= start) for source in sources]
+    rows = union_all(*sources).subquery()
+
+    day = func.date(rows.c.submission_date)
+    status = func.coalesce(rows.c.status, 'pending')
+    buckets = select(day, rows.c.scholarship_id, status, func.count()).where(
+        rows.c.submission_date.isnot(None)
+    ).group_by(day, rows.c.scholarship_id, status)
+
+    clear = delete(ApplicationDailyStat)
+    if since is not None:
+        clear = clear.where(ApplicationDailyStat.day >= since)
+    try:
+        db.session.execute(clear)
+        result = db.session.execute(insert(ApplicationDailyStat).from_select(
+            ['day', 'scholarship_id', 'status', 'count'], buckets
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result.rowcount
+
+
+def daily_application_counts(start, end, group_by='status', scholarship_id=None):
+    """Per-day totals between `start` and `end` (dates, inclusive).
+
+    Returns a list with one entry per day - days without applications
+    included - each broken down by status or by scholarship.
+    """
+    key = ApplicationDailyStat.status if group_by == 'status' else ApplicationDailyStat.scholarship_id
+    statement = select(ApplicationDailyStat.day, key, func.sum(ApplicationDailyStat.count)).where(
+        ApplicationDailyStat.day >= start, ApplicationDailyStat.day <= end
+    ).group_by(ApplicationDailyStat.day, key)
+    if scholarship_id is not None:
+        statement = statement.where(ApplicationDailyStat.scholarship_id == scholarship_id)
+
+    days = {}
+    for day, group, count in db.session.execute(statement):
+        if count:
+            days.setdefault(day, {})[str(group)] = int(count)
+
+    series = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        breakdown = days.get(day, {})
+        series.append({
+            'date': day.isoformat(),
+            'total': sum(breakdown.values()),
+            f'by_{group_by}': breakdown
+        })
+    return series
+
+
+def recent_application_count(days=30):
+    """Applications submitted over the last `days` calendar days, from the rollup."""
+    start = datetime.utcnow().date() - timedelta(days=days - 1)
+    return db.session.execute(
+        select(func.coalesce(func.sum(ApplicationDailyStat.count), 0))
+        .where(ApplicationDailyStat.day >= start)
+    ).scalar()
+
+
+@click.command('rollup-applications')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Only rebuild days from this date (YYYY-MM-DD) onwards.')
+@with_appcontext
+def rollup_applications_command(since):
+    """Rebuild the daily application rollup from the application tables."""
+    written = rebuild_daily_stats(since.date() if since else None)
+    click.echo(f'Wrote {written} daily buckets')
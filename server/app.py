@@ -1,149 +1,175 @@
-from flask import Flask
+from flask import Flask, request, redirect, url_for
 import os
-from flask_mail import Mail
-from flask_cors import CORS
-
-# Initialize Flask app
-app = Flask(__name__)
-
-# Enable CORS
-cors = CORS(app)
-
-# Configure mail settings
-app.config.update(
-    MAIL_SERVER='smtp.gmail.com',
-    MAIL_PORT=587,
-    MAIL_USE_TLS=True,
-    MAIL_USERNAME='your-email@gmail.com',  # Replace with your Gmail email
-    MAIL_PASSWORD='your-app-password',      # Replace with your Gmail app password
-    MAIL_DEFAULT_SENDER='your-email@gmail.com'
-)
-
-# Initialize Flask-Mail
-mail = Mail(app)
-
-@app.route('/test-email', methods=['GET'])
-def test_email():
-    try:
-        msg = mail.send_message(
-            subject='Test Email',
-            recipients=['test@example.com'],
-            body='This is a test email to verify that the email configuration works.'
-        )
-        return {'success': True, 'message': 'Email sent successfully'}
-    except Exception as e:
-        return {'success': False, 'error': str(e)}, 500
-
-if __name__ == '__main__':
-    app.run(debug=True, port=5002)
-
-# Initialize extensions
-@app.before_request
-def handle_preflight():
-    if request.method == "OPTIONS":
-        response = make_response()
-        response.headers.add('Access-Control-Allow-Origin', request.headers.get('Origin', '*'))
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization')
-        response.headers.add('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response
-
-# Configure CORS
-cors.init_app(app, 
-    resources={r"/*": {
-        "origins": ["http://localhost:3000", "http://localhost:3001"],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
-        "supports_credentials": True,
-        "expose_headers": ["Content-Type", "Authorization"]
-    }},
-    send_wildcard=False)
-db.init_app(app)
-migrate.init_app(app, db)
-cache.init_app(app)
-cors.init_app(app, 
-              origins=app.config['CORS_ORIGINS'], 
-              supports_credentials=True,
-              methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-              allow_headers=["Content-Type", "Authorization"])
-
-# Security headers middleware
-@app.after_request
-def add_security_headers(response):
+from sqlalchemy import text
+from config import config
+from extensions import db, migrate, cache, cors, bcrypt, login_manager, jwt, mail, limiter, slow_queries
+
+
+def create_app(config_name=None, test_config=None):
+    """Application factory.
+
+    Each extension is initialized exactly once here. Blueprints and models are
+    imported inside the factory rather than at module import, and bcrypt /
+    Flask-Mail are loaded on first use (see extensions.LazyExtension), so
+    importing this module stays cheap for worker startup and the test suite.
+    """
+    config_name = config_name or os.environ.get('FLASK_CONFIG', 'default')
+    app = Flask(__name__)
+    app.config.from_object(config[config_name])
+    if test_config:
+        app.config.update(test_config)
+
+    # Initialize extensions
+    db.init_app(app)
+    migrate.init_app(app, db)
+    cache.init_app(app)
+    cors.init_app(app,
+                  origins=app.config['CORS_ORIGINS'],
+                  supports_credentials=app.config['CORS_SUPPORTS_CREDENTIALS'],
+                  methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+                  allow_headers=app.config['CORS_ALLOW_HEADERS'],
+                  expose_headers=app.config['CORS_EXPOSE_HEADERS'])
+    bcrypt.init_app(app)
+    login_manager.init_app(app)
+    login_manager.login_view = 'auth.login'
+    jwt.init_app(app)
+    mail.init_app(app)
+    limiter.init_app(app)
+    slow_queries.init_app(app)
+
+    register_security_hooks(app)
+    register_blueprints(app)
+    register_rate_limits(app)
+    register_profiler(app)
+    register_commands(app)
+
+    return app
+
+
+SECURITY_HEADERS = {
     # Prevent clickjacking
-    response.headers['X-Frame-Options'] = 'SAMEORIGIN'
+    'X-Frame-Options': 'SAMEORIGIN',
     # Prevent MIME type sniffing
-    response.headers['X-Content-Type-Options'] = 'nosniff'
+    'X-Content-Type-Options': 'nosniff',
     # Enable XSS protection
-    response.headers['X-XSS-Protection'] = '1; mode=block'
+    'X-XSS-Protection': '1; mode=block',
     # Referrer policy
-    response.headers['Referrer-Policy'] = 'strict-origin-when-cross-origin'
+    'Referrer-Policy': 'strict-origin-when-cross-origin',
     # Content Security Policy (basic)
-    response.headers['Content-Security-Policy'] = "default-src 'self'; script-src 'self' 'unsafe-inline'; style-src 'self' 'unsafe-inline'"
-    return response
-
-# HTTPS redirection middleware
-@app.before_request
-def https_redirect():
-    if app.config.get('FORCE_HTTPS') and request.headers.get('X-Forwarded-Proto') == 'http':
-        url = request.url.replace('http://', 'https://', 1)
-        return redirect(url, code=301)
-bcrypt.init_app(app)
-login_manager.init_app(app)
-jwt.init_app(app)
-mail.init_app(app)
-
-# JWT user loader
-@jwt.user_lookup_loader
-def user_lookup_callback(_jwt_header, jwt_data):
-    identity = jwt_data["sub"]
-    return db.session.query(User).get(int(identity))
-
-@login_manager.user_loader
-def load_user(user_id):
-    return db.session.query(User).get(int(user_id))
-login_manager.login_view = 'auth.login'
-
-# Import models and blueprints
-from models import User, Scholarship, Application
-from routes import main_bp, auth_bp, scholarships_bp, applications_bp, profile_bp, search_bp, admin_bp
-
-app.register_blueprint(main_bp)
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(scholarships_bp, url_prefix='/api/scholarships')
-app.register_blueprint(applications_bp, url_prefix='/api/applications')
-app.register_blueprint(profile_bp, url_prefix='/api/profile')
-app.register_blueprint(search_bp, url_prefix='/api/search')
-app.register_blueprint(admin_bp, url_prefix='/api/admin')
-
-# Apply specific rate limits to endpoints
-with app.app_context():
+    'Content-Security-Policy': "default-src 'self'; script-src 'self' 'unsafe-inline'; style-src 'self' 'unsafe-inline'"
+}
+
+
+def register_security_hooks(app):
+    # Security headers middleware
+    @app.after_request
+    def add_security_headers(response):
+        response.headers.update(SECURITY_HEADERS)
+        return response
+
+    # HTTPS redirection middleware
+    @app.before_request
+    def https_redirect():
+        if app.config.get('FORCE_HTTPS') and request.headers.get('X-Forwarded-Proto') == 'http':
+            url = request.url.replace('http://', 'https://', 1)
+            return redirect(url, code=301)
+
+
+def register_blueprints(app):
+    # Import models and blueprints lazily so importing app.py stays cheap
+    from models import User
+    from routes import main_bp, auth_bp, scholarships_bp, applications_bp, profile_bp, search_bp, admin_bp, attachments_bp
+
+    # JWT user loader
+    @jwt.user_lookup_loader
+    def user_lookup_callback(_jwt_header, jwt_data):
+        identity = jwt_data["sub"]
+        return db.session.get(User, int(identity))
+
+    # Checked on every request; costs no I/O unless the Bloom filter matches
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(_jwt_header, jwt_payload):
+        from revocation import is_token_revoked
+        return is_token_revoked(jwt_payload['jti'])
+
+    app.register_blueprint(main_bp)
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(scholarships_bp, url_prefix='/api/scholarships')
+    app.register_blueprint(applications_bp, url_prefix='/api/applications')
+    app.register_blueprint(profile_bp, url_prefix='/api/profile')
+    app.register_blueprint(search_bp, url_prefix='/api/search')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(attachments_bp, url_prefix='/api')
+
+
+def register_rate_limits(app):
+    # Apply specific rate limits to endpoints
     limiter.limit("5/hour", methods=["POST"])(app.view_functions['auth.register'])
     limiter.limit("10/hour", methods=["POST"])(app.view_functions['auth.login'])
     limiter.limit("3/hour", methods=["POST"])(app.view_functions['applications.submit_application'])
 
-@app.route('/')
-def home():
-    return jsonify({
-        'message': 'Scholarship Portal API',
-        'endpoints': {
-            'auth': {
-                'register': '/api/auth/register [POST]',
-                'login': '/api/auth/login [POST]',
-                'logout': '/api/auth/logout [GET]'
-            },
-            'scholarships': {
-                'list': '/api/scholarships [GET]',
-                'create': '/api/scholarships [POST]',
-                'get': '/api/scholarships/<id> [GET]'
-            },
-            'applications': {
-                'submit': '/api/applications [POST]',
-                'list': '/api/applications [GET]',
-                'get': '/api/applications/<id> [GET]'
-            }
-        }
-    })
+
+def register_profiler(app):
+    """Profile requests that send X-Profile (see profiler.py).
+
+    The view dispatch is only wrapped when PROFILE_DIR is set, so an app
+    without it runs Flask's own dispatch_request untouched.
+    """
+    if not app.config.get('PROFILE_DIR'):
+        return
+    from profiler import (PROFILE_HEADER, PROFILE_PARAM, PROFILE_URL_HEADER, Sampler,
+                          profiling_allowed, save_profile)
+    dispatch_request = app.dispatch_request
+
+    def profiled_dispatch_request():
+        if PROFILE_HEADER not in request.headers and PROFILE_PARAM not in request.args:
+            return dispatch_request()
+        if not profiling_allowed():
+            return dispatch_request()
+        with Sampler(app.config['PROFILE_INTERVAL']) as sampler:
+            response = app.make_response(dispatch_request())
+        name = save_profile(sampler, request.endpoint)
+        response.headers[PROFILE_URL_HEADER] = url_for('admin.get_profile', name=name)
+        response.headers['Server-Timing'] = f'profile;dur={sampler.duration * 1000:.1f}'
+        return response
+
+    app.dispatch_request = profiled_dispatch_request
+
+
+def register_commands(app):
+    from archive import archive_applications_command
+    # Importing analytics also installs the rollup's ORM event listeners
+    from analytics import rollup_applications_command
+    from idempotency import purge_idempotency_keys_command
+    from slow_queries import slow_queries_command
+    from profiler import profile_token_command
+    from warmup import warm_cache_command
+    from provisioning import provision_users_command
+    from revocation import purge_revoked_tokens_command
+    from attachments import sweep_uploads_command
+    app.cli.add_command(archive_applications_command)
+    app.cli.add_command(rollup_applications_command)
+    app.cli.add_command(purge_idempotency_keys_command)
+    app.cli.add_command(slow_queries_command)
+    app.cli.add_command(profile_token_command)
+    app.cli.add_command(warm_cache_command)
+    app.cli.add_command(provision_users_command)
+    app.cli.add_command(purge_revoked_tokens_command)
+    app.cli.add_command(sweep_uploads_command)
+
+
+_default_app = None
+
+
+def __getattr__(name):
+    # Keep `from app import app` working for scripts without building an app at import time
+    global _default_app
+    if name == 'app':
+        if _default_app is None:
+            _default_app = create_app()
+        return _default_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def test_db_connection():
     try:
@@ -164,7 +190,8 @@ def test_db_connection():
     return True
 
 if __name__ == '__main__':
+    app = create_app()
     port = int(os.environ.get('PORT', 5002))  # Default to 5002 to avoid conflicts
     with app.app_context():
         test_db_connection()
-    app.run(debug=True, port=port)
\ No newline at end of file
+    app.run(debug=True, port=port)
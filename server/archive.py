@@ -0,0 +1,111 @@
+"""
+Application archival.
+
+Decided applications older than APPLICATION_ARCHIVE_AFTER_DAYS are moved from
+`application` into `application_archive` so the hot table (and its indexes)
+only holds the current intake. Read endpoints only look at the archive when
+the caller passes include_archived=true.
+"""
+
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, request
+from flask.cli import with_appcontext
+from sqlalchemy import delete, insert, literal, select, union_all
+
+from extensions import db
+from cache_utils import invalidate_user_applications
+from models import Application, ArchivedApplication
+
+DECIDED_STATUSES = ('approved', 'rejected')
+ARCHIVE_COLUMNS = ['id', 'student_id', 'scholarship_id', 'status', 'essay',
+                   'submission_date', 'reviewed_at', 'reviewed_by', 'notes']
+# List projections leave out the (large, compressed) essay
+LIST_COLUMNS = [column for column in ARCHIVE_COLUMNS if column != 'essay']
+
+
+def include_archived_requested():
+    """True when the current request asked for archived applications too."""
+    return request.args.get('include_archived', 'false').lower() in ('1', 'true', 'yes')
+
+
+def archive_decided_applications(older_than_days=None, batch_size=1000):
+    """Move decided applications submitted before the cutoff into the archive.
+
+    Rows are copied with INSERT ... SELECT and deleted in batches of
+    `batch_size`, one transaction per batch, so a large backlog never holds
+    long locks on the hot table. Returns the number of rows moved.
+    """
+    if older_than_days is None:
+        older_than_days = current_app.config.get('APPLICATION_ARCHIVE_AFTER_DAYS', 365)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    moved = 0
+    while True:
+        batch = db.session.query(Application.id, Application.student_id).filter(
+            Application.status.in_(DECIDED_STATUSES),
+            Application.submission_date < cutoff
+        ).order_by(Application.id).limit(batch_size).all()
+        if not batch:
+            break
+        ids = [application_id for application_id, _ in batch]
+
+        source = select(*[getattr(Application, column) for column in ARCHIVE_COLUMNS]).where(
+            Application.id.in_(ids)
+        )
+        try:
+            db.session.execute(insert(ArchivedApplication).from_select(ARCHIVE_COLUMNS, source))
+            db.session.execute(delete(Application).where(Application.id.in_(ids)))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        invalidate_user_applications(*[student_id for _, student_id in batch])
+        moved += len(ids)
+
+    return moved
+
+
+def application_rows(build_query):
+    """Union the hot and archive tables into one subquery.
+
+    `build_query(model)` receives `Application` or `ArchivedApplication` and
+    returns a select of that model's LIST_COLUMNS with any filters or joins
+    applied. The resulting subquery exposes the same columns plus an
+    `archived` flag.
+    """
+    hot = build_query(Application).add_columns(literal(False).label('archived'))
+    archived = build_query(ArchivedApplication).add_columns(literal(True).label('archived'))
+    return union_all(hot, archived).subquery()
+
+
+def application_columns(model):
+    """The shared column projection used with application_rows()."""
+    return select(*[getattr(model, column) for column in LIST_COLUMNS])
+
+
+def row_to_dict(row):
+    """Serialize a row of application_rows() like Application.to_dict(include_essay=False)."""
+    return {
+        'id': row.id,
+        'student_id': row.student_id,
+        'scholarship_id': row.scholarship_id,
+        'status': row.status,
+        'submission_date': row.submission_date.isoformat() if row.submission_date else None,
+        'reviewed_at': row.reviewed_at.isoformat() if row.reviewed_at else None,
+        'reviewed_by': row.reviewed_by,
+        'notes': row.notes,
+        'archived': bool(row.archived)
+    }
+
+
+@click.command('archive-applications')
+@click.option('--days', type=int, default=None,
+              help='Archive decided applications older than this many days.')
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+@with_appcontext
+def archive_applications_command(days, batch_size):
+    """Move old decided applications into the archive table."""
+    moved = archive_decided_applications(older_than_days=days, batch_size=batch_size)
+    click.echo(f'Archived {moved} applications')
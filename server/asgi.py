@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point for Scholarship Portal.
+
+    uvicorn --factory asgi:create_asgi_app --host 0.0.0.0 --port 8000 --workers 4
+
+The read endpoints students poll most (scholarship list/detail, scholarship
+search, my-applications, application detail) are served natively on an async
+SQLAlchemy engine, so a slow database or a slow client only parks a coroutine
+instead of holding a worker thread. Every other request - writes, admin,
+auth, and the rare read variants listed below - is forwarded unchanged to the
+Flask app through asgiref's WSGI adapter, so behaviour stays identical.
+
+Falls back to Flask for:
+    - include_archived=true on application reads
+    - facets=... on scholarship search (the facet counts are cached via Flask-Caching)
+    - fuzzy scholarship search, including the automatic retry when `q` matches nothing
+    - scholarship detail cache misses (Flask renders the 404, or builds and
+      caches the detail under the key the native handler reads)
+    - search_bp's /applications (Flask-Login session auth)
+
+Native responses go through the rate limits attached to the matching Flask
+view; a request handed to Flask is counted by Flask instead.
+"""
+
+import asyncio
+import os
+import re
+import time
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from jwt import ExpiredSignatureError
+from sqlalchemy import select
+from sqlalchemy.orm import undefer
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.datastructures import Headers, MultiDict
+
+from app import SECURITY_HEADERS, create_app
+from extensions import cache, limiter, slow_queries
+from cache_serialization import response_freshness, unpack_response
+from cache_utils import (USER_APPLICATIONS_CACHED_PAGES, get_cached_user_applications,
+                         set_cached_user_applications)
+from models import Application, Scholarship, User
+from pagination import count_requested, paginate_async
+from revocation import is_token_revoked
+from popularity import popularity_tracker
+from profiler import PROFILE_HEADER, PROFILE_PARAM
+from routes.applications import application_detail, application_list_item
+from routes.scholarships import scholarship_detail_key, scholarship_list_item
+from routes.search import scholarship_search_statement
+from slow_queries import current_endpoint as slow_query_endpoint
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'postgres': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_url(url):
+    """Map a sync SQLAlchemy URL onto the matching async driver."""
+    scheme, rest = url.split('://', 1)
+    dialect = scheme.split('+', 1)[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver configured for {dialect!r}')
+    return f'{ASYNC_DRIVERS[dialect]}://{rest}'
+
+
+class AsyncRequest:
+    """The parts of an HTTP scope the native handlers need."""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.path = scope['path']
+        self.args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        self.headers = Headers([(k.decode('latin-1'), v.decode('latin-1')) for k, v in scope.get('headers', [])])
+
+
+class RawResponse:
+    """An already rendered body (e.g. a cached Flask response) for a native handler to return."""
+
+    def __init__(self, status, body, headers):
+        self.status = status
+        self.body = body
+        self.headers = headers
+
+
+class AuthError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class AsyncReadAPI:
+    """ASGI application serving hot read endpoints natively, Flask for the rest."""
+
+    def __init__(self, flask_app, engine=None):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        if engine is None:
+            engine = create_async_engine(
+                async_database_url(flask_app.config['SQLALCHEMY_DATABASE_URI']),
+                **flask_app.config.get('ASYNC_ENGINE_OPTIONS', {})
+            )
+        self.engine = engine
+        slow_queries.watch(engine.sync_engine, flask_app)
+        self.sessions = async_sessionmaker(engine, expire_on_commit=False)
+        # (path, native handler, endpoint of the Flask view it stands in for)
+        self.routes = [
+            (re.compile(r'^/api/scholarships/?$'), self.get_scholarships, 'scholarships.get_scholarships'),
+            (re.compile(r'^/api/scholarships/(?P<id>\d+)$'), self.get_scholarship, 'scholarships.get_scholarship'),
+            (re.compile(r'^/api/search/scholarships/?$'), self.search_scholarships, 'search.search_scholarships'),
+            (re.compile(r'^/api/applications/my-applications/?$'), self.get_user_applications,
+             'applications.get_user_applications'),
+            (re.compile(r'^/api/applications/(?P<id>\d+)$'), self.get_application, 'applications.get_application'),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, handler, endpoint in self.routes:
+                match = pattern.match(scope['path'])
+                if match:
+                    request = AsyncRequest(scope)
+                    if _profile_requested(request):
+                        break  # Profiling wraps the Flask view dispatch
+                    slow_query_endpoint.set(f'asgi.{handler.__name__}')
+                    try:
+                        result = await handler(request, **match.groupdict())
+                    except AuthError as e:
+                        result = e.status, {'msg': e.message}
+                    if result is None:
+                        break
+                    rejected, limit_headers = await self._rate_limit(request, endpoint)
+                    if rejected is not None:
+                        result = rejected
+                    if isinstance(result, RawResponse):
+                        return await self._send(send, request, result.status, result.body,
+                                                result.headers + limit_headers)
+                    return await self._send_json(send, request, *result, headers=limit_headers)
+
+        # Everything without a native handler runs on the Flask app
+        await self.wsgi(scope, receive, send)
+
+    # Native handlers. Each returns (status, body), a RawResponse, or None to
+    # defer to Flask.
+
+    async def get_scholarships(self, request):
+        try:
+            page = int(request.args.get('page', 1))
+            per_page = int(request.args.get('per_page', 10))
+            if page < 1:
+                page = 1
+            if per_page < 1 or per_page > 100:
+                per_page = 10
+
+            statement = select(Scholarship).where(Scholarship.is_active == True).order_by(Scholarship.deadline)
+            async with self.sessions() as session:
+                scholarships, pagination = await paginate_async(
+                    session, statement, page, per_page, count_requested(request.args), 'total_scholarships'
+                )
+
+            return 200, {
+                'scholarships': [scholarship_list_item(s) for s in scholarships],
+                'pagination': pagination
+            }
+        except Exception:
+            self.flask_app.logger.exception('Failed to fetch scholarships')
+            return 500, {'error': 'Failed to fetch scholarships'}
+
+    async def get_scholarship(self, request, id):
+        await self._record_hit('scholarship', int(id))
+        # Serve the response the Flask view cached; Flask builds it on a miss
+        # (and refreshes it near expiry, under its single-flight lock)
+        payload = await self._in_app_context(cache.get, scholarship_detail_key(int(id)))
+        freshness = response_freshness(payload)
+        if freshness is None or freshness[0] <= time.time():
+            return None
+        accept_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+        body, status, headers = unpack_response(payload, accept_gzip)
+        return RawResponse(status, body, [tuple(header) for header in headers])
+
+    async def search_scholarships(self, request):
+        fuzzy_mode = request.args.get('fuzzy', 'auto').lower()
+        if request.args.get('facets') or fuzzy_mode in ('1', 'true', 'yes'):
+            return None
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        # Same normalization as Flask-SQLAlchemy's paginate(error_out=False)
+        if page is None or page < 1:
+            page = 1
+        if per_page is None or per_page < 1:
+            per_page = 20
+
+        statement, error = scholarship_search_statement(request.args)
+        if error:
+            return 400, {'error': error}
+        if request.args.get('q'):
+            await self._record_hit('search', request.args['q'].strip().lower())
+
+        with_total = count_requested(request.args)
+        async with self.sessions() as session:
+            scholarships, pagination = await paginate_async(
+                session, statement, page, per_page, with_total, 'total_scholarships'
+            )
+        no_matches = pagination['total_scholarships'] == 0 if with_total else (page == 1 and not scholarships)
+        if no_matches and fuzzy_mode == 'auto' and request.args.get('q'):
+            return None  # Flask retries with fuzzy matching
+
+        return 200, {
+            'scholarships': [s.to_dict() for s in scholarships],
+            'pagination': pagination
+        }
+
+    async def get_user_applications(self, request):
+        if _include_archived(request):
+            return None
+        user_id = await self._jwt_identity(request)
+        try:
+            page = int(request.args.get('page', 1))
+            per_page = int(request.args.get('per_page', 10))
+            if page < 1:
+                page = 1
+            if per_page < 1 or per_page > 50:
+                per_page = 10
+
+            # Share the per-student cache with the Flask view
+            with_total = count_requested(request.args)
+            cacheable = with_total and page <= USER_APPLICATIONS_CACHED_PAGES
+            if cacheable:
+                cache_key, cached = await self._in_app_context(get_cached_user_applications, user_id, page, per_page)
+                if cached is not None:
+                    return 200, cached
+
+            statement = (select(Application).where(Application.student_id == int(user_id))
+                         .order_by(Application.submission_date.desc()))
+            async with self.sessions() as session:
+                applications, pagination = await paginate_async(
+                    session, statement, page, per_page, with_total, 'total_applications'
+                )
+
+            result = {
+                'applications': [application_list_item(app) for app in applications],
+                'pagination': pagination
+            }
+            if cacheable:
+                await self._in_app_context(set_cached_user_applications, cache_key, result)
+            return 200, result
+        except Exception:
+            self.flask_app.logger.exception('Failed to fetch applications for user %s', user_id)
+            return 500, {'error': 'Failed to fetch applications'}
+
+    async def get_application(self, request, id):
+        if _include_archived(request):
+            return None
+        user_id = int(await self._jwt_identity(request))
+        async with self.sessions() as session:
+            application = await session.get(Application, int(id), options=[undefer(Application.essay)])
+            if not application:
+                return 404, {'error': 'Application not found'}
+            if application.student_id != user_id:
+                user = await session.get(User, user_id)
+                if user is None or user.role != 'admin':
+                    return 403, {'error': 'Unauthorized'}
+        return 200, application_detail(application)
+
+    # Helpers
+
+    async def _jwt_identity(self, request):
+        """Decode the bearer token the same way @jwt_required() does."""
+        from flask_jwt_extended import decode_token
+        authorization = request.headers.get('Authorization', '')
+        if not authorization.startswith('Bearer '):
+            raise AuthError(401, 'Missing Authorization Header')
+        with self.flask_app.app_context():
+            try:
+                decoded = decode_token(authorization[len('Bearer '):])
+            except ExpiredSignatureError:
+                raise AuthError(401, 'Token has expired')
+            except Exception as e:
+                raise AuthError(422, str(e))
+        if decoded.get('type') != 'access':
+            raise AuthError(422, 'Only non-refresh tokens are allowed')
+        # The filter sync and a filter hit query the database and cache
+        if await self._in_app_context(is_token_revoked, decoded['jti']):
+            raise AuthError(401, 'Token has been revoked')
+        return decoded['sub']
+
+    async def _rate_limit(self, request, endpoint):
+        """(429 result or None, rate limit headers) for the Flask view's limits."""
+        if not self.flask_app.config['RATELIMIT_ENABLED'] or not limiter.limits_for(self.flask_app, endpoint):
+            return None, []
+
+        def check():
+            client = request.scope.get('client') or ('', 0)
+            with self.flask_app.test_request_context(
+                request.path, query_string=request.scope.get('query_string', b''),
+                headers=list(request.headers.items()), environ_base={'REMOTE_ADDR': client[0]}
+            ):
+                rejected, headers = limiter.check_request()
+            if rejected is None:
+                return None, headers
+            return (rejected.status_code, rejected.get_json()), headers
+        return await asyncio.to_thread(check)
+
+    async def _record_hit(self, kind, key):
+        """popularity.record_hit() for native handlers; flushes off the event loop."""
+        tracker = popularity_tracker(self.flask_app)
+        if tracker.record(kind, key):
+            await self._in_app_context(tracker.flush)
+
+    async def _in_app_context(self, func, *args):
+        """Run a blocking helper (e.g. a cache call) off the event loop."""
+        def call():
+            with self.flask_app.app_context():
+                return func(*args)
+        return await asyncio.to_thread(call)
+
+    def _response_headers(self, request, body, extra):
+        headers = [(name, value) for name, value in extra if name.lower() != 'content-length']
+        headers.append(('Content-Length', str(len(body))))
+        headers.extend(SECURITY_HEADERS.items())
+        origin = request.headers.get('Origin')
+        if origin and origin in self.flask_app.config['CORS_ORIGINS']:
+            headers.extend([
+                ('Access-Control-Allow-Origin', origin),
+                ('Access-Control-Allow-Credentials', 'true'),
+                ('Access-Control-Expose-Headers', ', '.join(self.flask_app.config['CORS_EXPOSE_HEADERS'])),
+                ('Vary', 'Origin'),
+            ])
+        return [(k.encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+    async def _send_json(self, send, request, status, payload, headers=()):
+        body = (self.flask_app.json.dumps(payload) + '\n').encode('utf-8')
+        await self._send(send, request, status, body, [('Content-Type', 'application/json'), *headers])
+
+    async def _send(self, send, request, status, body, headers):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': self._response_headers(request, body, headers)})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def _include_archived(request):
+    return request.args.get('include_archived', 'false').lower() in ('1', 'true', 'yes')
+
+
+def _profile_requested(request):
+    return PROFILE_HEADER in request.headers or PROFILE_PARAM in request.args
+
+
+def create_asgi_app(config_name=None, test_config=None, engine=None):
+    """ASGI application factory (uvicorn --factory asgi:create_asgi_app)."""
+    config_name = config_name or os.environ.get('FLASK_CONFIG', 'production')
+    return AsyncReadAPI(create_app(config_name, test_config), engine=engine)
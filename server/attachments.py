@@ -0,0 +1,181 @@
+"""
+Content-addressed file store for application attachments.
+
+Uploads arrive in chunks and are appended to a staging file under
+`<root>/uploads/<attachment id>`; the request body is copied through a small
+fixed-size buffer so a multi-MB chunk never sits in worker memory. When the
+last byte arrives the staging file is hashed (again in blocks) and renamed to
+`<root>/objects/ab/cd/<sha256>`. Identical files uploaded by different
+applicants therefore share one object on disk.
+
+Uploads abandoned before their last chunk are swept once their staging file
+has gone ATTACHMENT_STAGING_MAX_AGE seconds without a write: whenever a new
+upload starts, and by `flask sweep-uploads`.
+
+Deciding whether an object is still referenced and acting on it (reusing it
+for a new upload, deleting it with its last attachment) happens under
+`object_lock(sha256)`, an flock on one of 256 lock files, together with the
+database commit that adds or removes the reference.
+"""
+
+import fcntl
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class UploadOffsetMismatch(Exception):
+    """A chunk did not start where the staged upload currently ends."""
+
+    def __init__(self, expected):
+        super().__init__(f'Upload offset is {expected}')
+        self.expected = expected
+
+
+class AttachmentStore:
+    def __init__(self, root):
+        self.root = root
+        self.uploads_dir = os.path.join(root, 'uploads')
+        self.objects_dir = os.path.join(root, 'objects')
+        self.locks_dir = os.path.join(root, 'locks')
+
+    def staging_path(self, attachment_id):
+        return os.path.join(self.uploads_dir, str(attachment_id))
+
+    def object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], sha256[2:4], sha256)
+
+    def received(self, attachment_id):
+        """Bytes staged so far for an upload (the offset to resume from)."""
+        try:
+            return os.path.getsize(self.staging_path(attachment_id))
+        except FileNotFoundError:
+            return 0
+
+    def append_chunk(self, attachment_id, offset, stream, length):
+        """Stream `length` bytes from `stream` onto the staged upload at `offset`.
+
+        The staging file is locked for the duration of the write so two
+        concurrent requests for the same upload can't interleave. Returns the
+        new offset; raises UploadOffsetMismatch if `offset` isn't the current
+        end of the file (the client should resume from `expected`).
+        """
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        fd = os.open(self.staging_path(attachment_id), os.O_WRONLY | os.O_CREAT, 0o640)
+        with os.fdopen(fd, 'wb') as staged:
+            fcntl.flock(staged, fcntl.LOCK_EX)
+            end = staged.seek(0, os.SEEK_END)
+            if end != offset:
+                raise UploadOffsetMismatch(end)
+            remaining = length
+            try:
+                while remaining:
+                    block = stream.read(min(COPY_BUFFER_SIZE, remaining))
+                    if not block:
+                        break
+                    staged.write(block)
+                    remaining -= len(block)
+            finally:
+                if remaining:
+                    # Client went away mid-chunk; drop the partial chunk so
+                    # the offset stays at a boundary the client knows about
+                    staged.truncate(offset)
+            staged.flush()
+            if remaining:
+                raise UploadOffsetMismatch(offset)
+            return offset + length
+
+    def hash_upload(self, attachment_id):
+        """SHA-256 of a complete staged upload."""
+        digest = hashlib.sha256()
+        with open(self.staging_path(attachment_id), 'rb') as f:
+            for block in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @contextmanager
+    def object_lock(self, sha256):
+        """Exclusive lock on `sha256`'s object, across processes."""
+        os.makedirs(self.locks_dir, exist_ok=True)
+        fd = os.open(os.path.join(self.locks_dir, sha256[:2]), os.O_WRONLY | os.O_CREAT, 0o640)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)  # Releases the lock
+
+    def commit(self, attachment_id, sha256):
+        """Move a complete upload into the object store (hold object_lock(sha256))."""
+        staged = self.staging_path(attachment_id)
+        target = self.object_path(sha256)
+        if os.path.exists(target):
+            os.remove(staged)  # Already stored for another attachment
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(staged, target)
+        return sha256
+
+    def discard(self, attachment_id):
+        """Drop a staged (incomplete) upload."""
+        _remove(self.staging_path(attachment_id))
+
+    def sweep_staged(self, max_age):
+        """Drop staged uploads not written to for `max_age` seconds; returns how many.
+
+        A staging file that is being appended to right now is locked and
+        skipped.
+        """
+        cutoff = time.time() - max_age
+        try:
+            entries = list(os.scandir(self.uploads_dir))
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for entry in entries:
+            try:
+                if not entry.is_file() or entry.stat().st_mtime >= cutoff:
+                    continue
+                fd = os.open(entry.path, os.O_WRONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if os.fstat(fd).st_mtime < cutoff:
+                    _remove(entry.path)
+                    removed += 1
+            except BlockingIOError:
+                pass  # A chunk is being written
+            finally:
+                os.close(fd)
+        return removed
+
+    def remove_object(self, sha256):
+        """Delete an object (hold object_lock(sha256) across the reference check)."""
+        _remove(self.object_path(sha256))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def attachment_store():
+    """The store configured for the current app."""
+    return AttachmentStore(current_app.config['ATTACHMENT_STORAGE_DIR'])
+
+
+@click.command('sweep-uploads')
+@with_appcontext
+def sweep_uploads_command():
+    """Delete staged uploads abandoned for ATTACHMENT_STAGING_MAX_AGE seconds."""
+    removed = attachment_store().sweep_staged(current_app.config['ATTACHMENT_STAGING_MAX_AGE'])
+    click.echo(f'Deleted {removed} abandoned uploads')
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+ASGI vs threaded WSGI benchmark
+Compares the read endpoints asgi.py serves natively - scholarship list,
+detail and search - on the thread-per-request Flask app and on the native
+async handlers, against the same database.
+
+By default both run on a seeded temporary SQLite file. Point --database-url
+at a real (seeded) database to measure actual database latency; --io-wait-ms
+adds a simulated wait to every statement instead, for a quick look at how
+each model copes with a slow database.
+
+Usage:
+    python benchmark_asgi.py --requests 400 --concurrency 100 --threads 8
+    python benchmark_asgi.py --database-url postgresql://localhost/scholarship_db
+    python benchmark_asgi.py --io-wait-ms 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Add current directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+import sqlalchemy.util
+
+PATHS = ['/api/scholarships/', '/api/scholarships/1', '/api/search/scholarships?q=Scholarship']
+io_wait = 0.0
+
+
+def _sleep_on_statement(_statement):
+    if io_wait:
+        time.sleep(io_wait)
+
+
+def install_io_wait(sync_engine, async_engine):
+    """Sleep inside the driver for every statement.
+
+    The sleep runs wherever the driver executes SQL: on the request thread
+    for the sync engine, on aiosqlite's connection thread for the async one -
+    exactly where a real database wait would block.
+    """
+    @event.listens_for(sync_engine, 'connect')
+    def sync_connect(dbapi_connection, _record):
+        dbapi_connection.set_trace_callback(_sleep_on_statement)
+
+    await_ = getattr(sqlalchemy.util, 'await_', None) or sqlalchemy.util.await_only
+
+    @event.listens_for(async_engine.sync_engine, 'connect')
+    def async_connect(dbapi_connection, _record):
+        await_(dbapi_connection._connection.set_trace_callback(_sleep_on_statement))
+
+
+def seed(flask_app, count=50):
+    from extensions import db
+    from models import Scholarship
+    with flask_app.app_context():
+        db.create_all()
+        for i in range(count):
+            db.session.add(Scholarship(
+                title=f'Scholarship {i}', description='Benchmark scholarship',
+                amount=1000 + i, deadline=datetime.utcnow() + timedelta(days=i + 1)
+            ))
+        db.session.commit()
+
+
+def bench_wsgi(flask_app, path, requests, threads):
+    client = flask_app.test_client()
+
+    def one(_):
+        start = time.perf_counter()
+        assert client.get(path).status_code == 200
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    return time.perf_counter() - start, latencies
+
+
+async def bench_asgi(application, path, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'headers': [], 'server': ('bench', 80), 'client': ('127.0.0.1', 0),
+    }
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def one():
+        status = []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        async with semaphore:
+            start = time.perf_counter()
+            await application(dict(scope), receive, send)
+            assert status == [200]
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*[one() for _ in range(requests)])
+    elapsed = time.perf_counter() - start
+    await application.engine.dispose()  # Connections belong to this event loop
+    return elapsed, latencies
+
+
+def report(name, elapsed, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f'{name:<28} {len(latencies) / elapsed:>9.1f} req/s   '
+          f'p50 {statistics.median(latencies) * 1000:>7.1f} ms   p95 {p95 * 1000:>7.1f} ms')
+
+
+def main():
+    global io_wait
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads')
+    parser.add_argument('--database-url', help='Benchmark an existing database instead of a seeded SQLite file')
+    parser.add_argument('--io-wait-ms', type=float, default=0.0, help='Simulated wait per SQL statement')
+    parser.add_argument('--path', action='append', dest='paths', help=f'Endpoint to request (default: {", ".join(PATHS)})')
+    args = parser.parse_args()
+
+    from asgi import create_asgi_app
+    from extensions import cache, db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        application = create_asgi_app('testing', test_config={
+            'SQLALCHEMY_DATABASE_URI': args.database_url or f'sqlite:///{tmp}/bench.db',
+            'ASYNC_ENGINE_OPTIONS': {'pool_size': args.concurrency, 'max_overflow': 0},
+            'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': args.threads, 'max_overflow': 0},
+            'RATELIMIT_ENABLED': False,
+            'SLOW_QUERY_THRESHOLD_MS': None,
+        })
+        flask_app = application.flask_app
+        if args.io_wait_ms:
+            with flask_app.app_context():
+                install_io_wait(db.engine, application.engine)
+        if not args.database_url:
+            seed(flask_app)
+
+        io_wait = args.io_wait_ms / 1000
+        wait = f', {args.io_wait_ms:g} ms simulated I/O wait per statement' if io_wait else ''
+        print(f'{args.requests} requests per endpoint{wait}')
+        for path in args.paths or PATHS:
+            print(path)
+            # Both sides start cold: the detail and search responses are cached
+            with flask_app.app_context():
+                cache.clear()
+            report(f'  WSGI ({args.threads} threads)', *bench_wsgi(flask_app, path, args.requests, args.threads))
+            with flask_app.app_context():
+                cache.clear()
+            report(f'  ASGI ({args.concurrency} concurrent)',
+                   *asyncio.run(bench_asgi(application, path, args.requests, args.concurrency)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+Two-tier cache backend: a per-process LRU in front of the shared cache.
+
+    CACHE_TYPE = 'cache_backends.LayeredCache'
+    LAYERED_CACHE_REMOTE = 'RedisCache'
+
+Reads are served from process memory when possible and fall through to the
+remote backend (Redis in production) otherwise. Changes to keys that
+already exist - overwrites, deletes, inc/dec - go to the remote backend
+first and are then announced on an invalidation bus (Redis pub/sub in
+production, MemoryInvalidationBus in tests), and every other process drops
+its local copy of the key. Writing a new key needs no announcement: at
+most a copy read just before the remote entry expired is still held, and
+the local TTL retires it. Local entries also expire after
+LAYERED_CACHE_LOCAL_TTL seconds, which bounds staleness if an invalidation
+is lost (e.g. while the pub/sub connection reconnects).
+
+A value read from the remote tier is only copied into the local tier if no
+invalidation arrived while it was being fetched, so a fetch that raced a
+write can't pin the old value locally.
+
+Local entries are serialized like remote ones (CompactSerializer: bytes
+kept as-is, everything else pickled), so callers never share mutable
+objects, and the LRU is bounded by total serialized size. Locks taken with `add` always go to
+the remote backend.
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask_caching.backends.base import BaseCache
+from werkzeug.utils import import_string
+
+from cache_serialization import CompactSerializer
+
+CLEAR_ALL = '*'
+
+
+class MemoryInvalidationBus:
+    """In-process stand-in for Redis pub/sub; caches sharing one bus act like workers."""
+
+    def __init__(self):
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def publish(self, message):
+        for callback in list(self.subscribers):
+            callback(message)
+
+
+class RedisInvalidationBus:
+    """Redis pub/sub channel, read by one daemon thread per process."""
+
+    def __init__(self, client, channel):
+        self.client = client
+        self.channel = channel
+        self.callbacks = []
+        self.thread = None
+        self.lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self.thread = None  # Threads don't survive a fork
+
+    def subscribe(self, callback):
+        self.callbacks.append(callback)
+
+    def ensure_listening(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._listen, name='cache-invalidation', daemon=True)
+                self.thread.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Anything published while we were not listening is lost
+                self._deliver(f'- {CLEAR_ALL}')
+                for message in pubsub.listen():
+                    data = message['data']
+                    self._deliver(data.decode('utf-8') if isinstance(data, bytes) else data)
+            except Exception:
+                time.sleep(1)
+
+    def _deliver(self, message):
+        for callback in list(self.callbacks):
+            callback(message)
+
+    def publish(self, message):
+        self.client.publish(self.channel, message)
+
+
+class LocalLRU:
+    """Serialized values, least recently used first out, bounded by total size."""
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 8
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, blob)
+        self.size = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.serializer = CompactSerializer()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._pop(key)
+                return None
+            self.entries.move_to_end(key)
+            blob = entry[1]
+        return self.serializer.loads(blob)
+
+    def set(self, key, value, timeout):
+        blob = self.serializer.dumps(value)
+        ttl = min(self.ttl, timeout) if timeout else self.ttl
+        with self.lock:
+            self._pop(key)
+            if len(blob) > self.max_entry_bytes or ttl <= 0:
+                return
+            self.entries[key] = (time.monotonic() + ttl, blob)
+            self.size += len(blob)
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self._pop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class LayeredCache(BaseCache):
+    def __init__(self, remote, bus, local_ttl=5, local_max_bytes=32 * 1024 * 1024, default_timeout=300):
+        super().__init__(default_timeout=default_timeout)
+        self.remote = remote
+        self.bus = bus
+        self.local = LocalLRU(local_max_bytes, local_ttl)
+        self.origin = uuid.uuid4().hex
+        self.metrics = {'local_hits': 0, 'remote_hits': 0, 'misses': 0, 'invalidations': 0}
+        self.metrics_lock = threading.Lock()
+        self.invalidation_count = 0  # Bumped by every local or remote invalidation
+        bus.subscribe(self._on_invalidation)
+        os.register_at_fork(after_in_child=self.local.clear)
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        remote_type = config.get('LAYERED_CACHE_REMOTE', 'RedisCache')
+        if '.' not in remote_type:
+            remote_type = 'flask_caching.backends.' + remote_type
+        remote = import_string(remote_type).factory(app, config, args, dict(kwargs))
+        if config.get('LAYERED_CACHE_BUS', 'redis') == 'memory':
+            bus = MemoryInvalidationBus()
+        else:
+            bus = RedisInvalidationBus(remote._write_client, config.get('LAYERED_CACHE_CHANNEL', 'cache-invalidation'))
+        return cls(
+            remote, bus,
+            local_ttl=config.get('LAYERED_CACHE_LOCAL_TTL', 5),
+            local_max_bytes=config.get('LAYERED_CACHE_LOCAL_MAX_BYTES', 32 * 1024 * 1024),
+            default_timeout=kwargs.get('default_timeout', 300)
+        )
+
+    @property
+    def serializer(self):
+        return self.remote.serializer
+
+    @serializer.setter
+    def serializer(self, serializer):
+        # CACHE_SERIALIZER applies to the shared tier
+        self.remote.serializer = serializer
+
+    def _count(self, metric):
+        with self.metrics_lock:
+            self.metrics[metric] += 1
+
+    def _on_invalidation(self, message):
+        origin, _, key = message.partition(' ')
+        if origin == self.origin:
+            return
+        with self.metrics_lock:
+            self.metrics['invalidations'] += 1
+            self.invalidation_count += 1
+        if key == CLEAR_ALL:
+            self.local.clear()
+        else:
+            self.local.delete(key)
+
+    def _invalidate(self, *keys, publish=True):
+        with self.metrics_lock:
+            self.invalidation_count += 1
+        for key in keys:
+            self.local.delete(key)
+            if publish:
+                self.bus.publish(f'{self.origin} {key}')
+
+    def _listening(self):
+        ensure_listening = getattr(self.bus, 'ensure_listening', None)
+        if ensure_listening is not None:
+            ensure_listening()
+
+    def get(self, key):
+        self._listening()
+        value = self.local.get(key)
+        if value is not None:
+            self._count('local_hits')
+            return value
+        seen = self.invalidation_count
+        value = self.remote.get(key)
+        if value is None:
+            self._count('misses')
+            return None
+        self._count('remote_hits')
+        if self.invalidation_count == seen:
+            self.local.set(key, value, None)
+        return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self._normalize_timeout(timeout)
+        # Filling a missing key (the common case) is one round trip and no
+        # announcement; only overwrites are published
+        if self.remote.add(key, value, timeout=timeout):
+            self._invalidate(key, publish=False)
+            result = True
+        else:
+            result = self.remote.set(key, value, timeout=timeout)
+            self._invalidate(key)
+        self.local.set(key, value, timeout)
+        return result
+
+    def add(self, key, value, timeout=None):
+        result = self.remote.add(key, value, timeout=self._normalize_timeout(timeout))
+        if result:
+            self._invalidate(key, publish=False)  # The key didn't exist anywhere
+        return result
+
+    def delete(self, key):
+        result = self.remote.delete(key)
+        self._invalidate(key)
+        return result
+
+    def delete_many(self, *keys):
+        result = self.remote.delete_many(*keys)
+        self._invalidate(*keys)
+        return result
+
+    def has(self, key):
+        return self.local.get(key) is not None or self.remote.has(key)
+
+    def clear(self):
+        result = self.remote.clear()
+        self.local.clear()
+        self.bus.publish(f'{self.origin} {CLEAR_ALL}')
+        return result
+
+    def inc(self, key, delta=1):
+        result = self.remote.inc(key, delta)
+        self._invalidate(key)
+        return result
+
+    def dec(self, key, delta=1):
+        result = self.remote.dec(key, delta)
+        self._invalidate(key)
+        return result
+
+    def stats(self):
+        """Hit counts per tier and the size of the local tier."""
+        with self.metrics_lock:
+            metrics = dict(self.metrics)
+        lookups = metrics['local_hits'] + metrics['remote_hits'] + metrics['misses']
+        return dict(
+            metrics,
+            local_hit_ratio=round(metrics['local_hits'] / lookups, 3) if lookups else None,
+            local_entries=len(self.local.entries),
+            local_bytes=self.local.size,
+            local_evictions=self.local.evictions
+        )
@@ -0,0 +1,103 @@
+"""
+Compact cache payloads.
+
+Cached view responses (cache_utils.cached) are stored as one bytes value:
+
+    header   struct RESPONSE_HEADER: magic, flags, status, soft expiry,
+             build seconds, length of the header block
+    headers  JSON list of [name, value] pairs (no Content-Length)
+    body     the rendered response body, gzip-compressed when it is at
+             least COMPRESS_MIN_SIZE bytes
+
+CompactSerializer stores bytes values as-is behind a one-byte tag instead of
+pickling them, so reading a cached response is a byte copy. A gzip-compressed
+body goes out unchanged, with Content-Encoding: gzip, to clients that accept
+gzip. Every other value is pickled as before, and ints stay plain ASCII so
+Redis INCR/DECR keep working.
+"""
+
+import gzip
+import json
+import pickle
+import struct
+
+from cachelib.serializers import BaseSerializer
+
+RAW_TAG = b'\x00'
+PICKLE_TAG = b'!'
+
+RESPONSE_MAGIC = b'CR'
+RESPONSE_HEADER = struct.Struct('!2sBHddI')
+FLAG_GZIP = 0x01
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVEL = 6
+# Set per response, never replayed from the cache
+SKIPPED_HEADERS = {'content-length', 'content-encoding'}
+
+
+class CompactSerializer(BaseSerializer):
+    """Raw bytes for bytes values, pickle for everything else (CACHE_SERIALIZER)."""
+
+    def dumps(self, value, protocol=pickle.HIGHEST_PROTOCOL):
+        if type(value) is int:
+            return str(value).encode('ascii')
+        if type(value) is bytes:
+            return RAW_TAG + value
+        return PICKLE_TAG + pickle.dumps(value, protocol)
+
+    def loads(self, value):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = value.encode('latin-1')
+        tag = value[:1]
+        if tag == RAW_TAG:
+            return value[1:]
+        if tag == PICKLE_TAG:
+            try:
+                return pickle.loads(value[1:])
+            except pickle.PickleError:
+                return None
+        return int(value)
+
+
+def pack_response(body, status, headers, expires, delta):
+    """Encode a rendered response and its freshness metadata as bytes."""
+    flags = 0
+    if len(body) >= COMPRESS_MIN_SIZE:
+        body = gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0)
+        flags |= FLAG_GZIP
+    header_block = json.dumps(
+        [[name, value] for name, value in headers if name.lower() not in SKIPPED_HEADERS],
+        separators=(',', ':')
+    ).encode('utf-8')
+    return RESPONSE_HEADER.pack(RESPONSE_MAGIC, flags, status, expires, delta, len(header_block)) + header_block + body
+
+
+def response_freshness(payload):
+    """(soft expiry, build seconds) without touching the body; None if not a packed response."""
+    if not isinstance(payload, bytes) or len(payload) < RESPONSE_HEADER.size:
+        return None
+    magic, _, _, expires, delta, _ = RESPONSE_HEADER.unpack_from(payload)
+    if magic != RESPONSE_MAGIC:
+        return None
+    return expires, delta
+
+
+def unpack_response(payload, accept_gzip=False):
+    """(body, status, headers) for a packed response.
+
+    The body stays compressed, and a Content-Encoding header is added, when
+    the client accepts gzip.
+    """
+    _, flags, status, _, _, header_length = RESPONSE_HEADER.unpack_from(payload)
+    start = RESPONSE_HEADER.size
+    headers = json.loads(payload[start:start + header_length])
+    body = payload[start + header_length:]
+    if flags & FLAG_GZIP:
+        headers.append(['Vary', 'Accept-Encoding'])
+        if accept_gzip:
+            headers.append(['Content-Encoding', 'gzip'])
+        else:
+            body = gzip.decompress(body)
+    return body, status, headers
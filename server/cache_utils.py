@@ -0,0 +1,212 @@
+"""
+Shared cache keys and invalidation helpers.
+
+Write paths call these helpers instead of building cache keys by hand so
+every blueprint invalidates the same entries the read paths populate.
+"""
+
+import math
+import random
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+from cache_serialization import pack_response, response_freshness, unpack_response
+from extensions import cache
+
+# Per-student application list: the first few pages are cached under keys
+# carrying a per-student generation. Invalidating bumps the generation, so a
+# page rendered from data read before the change can only land under a key
+# nobody reads any more.
+USER_APPLICATIONS_TIMEOUT = 60  # 1 minute
+USER_APPLICATIONS_CACHED_PAGES = 3
+USER_APPLICATIONS_GENERATION_TIMEOUT = 24 * 3600  # Outlives any page; expiry just retires them
+
+
+def user_applications_generation_key(user_id):
+    return f'user_applications_generation_{user_id}'
+
+
+def user_applications_key(user_id, page, per_page):
+    """Cache key of one page of a student's application list."""
+    generation_key = user_applications_generation_key(user_id)
+    generation = cache.get(generation_key)
+    if generation is None:
+        cache.add(generation_key, time.time_ns(), timeout=USER_APPLICATIONS_GENERATION_TIMEOUT)
+        generation = cache.get(generation_key)
+    return f'user_applications_{user_id}_{generation}_{page}_{per_page}'
+
+
+def get_cached_user_applications(user_id, page, per_page):
+    """(key, cached page or None) for one page of a student's list."""
+    key = user_applications_key(user_id, page, per_page)
+    return key, cache.get(key)
+
+
+def set_cached_user_applications(key, result):
+    cache.set(key, result, timeout=USER_APPLICATIONS_TIMEOUT)
+
+
+def invalidate_user_applications(*user_ids):
+    """Retire the cached application lists of the given students."""
+    generation = time.time_ns()
+    generations = {user_applications_generation_key(user_id): generation
+                   for user_id in set(user_ids) if user_id is not None}
+    if generations:
+        cache.set_many(generations, timeout=USER_APPLICATIONS_GENERATION_TIMEOUT)
+
+
+# Catalog generation: bumped whenever scholarships are created or change
+# visibility. Derived caches (search facets, ...) put it in their keys, so one
+# bump retires every entry built from the old catalog without a key scan.
+CATALOG_GENERATION_KEY = 'catalog_generation'
+
+
+def catalog_generation():
+    generation = cache.get(CATALOG_GENERATION_KEY)
+    if generation is None:
+        generation = bump_catalog_generation()
+    return generation
+
+
+def bump_catalog_generation():
+    # A timestamp rather than a counter: still unique if the key was evicted
+    generation = time.time_ns()
+    cache.set(CATALOG_GENERATION_KEY, generation, timeout=0)
+    return generation
+
+
+class CatalogIndex:
+    """A per-process structure built from the catalog by `build()`.
+
+    Rebuilt when the catalog generation changes; the shared generation is
+    re-read at most every CATALOG_GENERATION_CHECK_INTERVAL seconds so hot
+    lookups don't hit the cache backend on every request.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._lock = threading.Lock()
+        self._value = None
+        self._generation = None
+        self._checked_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        interval = current_app.config['CATALOG_GENERATION_CHECK_INTERVAL']
+        if self._value is not None and now - self._checked_at < interval:
+            return self._value
+        generation = catalog_generation()
+        self._checked_at = now
+        if self._value is None or generation != self._generation:
+            with self._lock:
+                if self._value is None or generation != self._generation:
+                    self._value = self._build()
+                    self._generation = generation
+        return self._value
+
+
+def catalog_index(name, build):
+    """The current app's CatalogIndex `name`, built by `build()`."""
+    indexes = current_app.extensions.setdefault('catalog_indexes', {})
+    if name not in indexes:
+        indexes[name] = CatalogIndex(build)
+    return indexes[name].get()
+
+
+# Stampede-protected view caching. Entries are packed responses (see
+# cache_serialization.py) carrying their soft expiry and build time, stored
+# under the key the view used with cache.cached and kept `stale_ttl` seconds
+# past their soft expiry so there is something to serve while one worker
+# rebuilds them.
+VIEW_CACHE_LOCK_TIMEOUT = 30  # Seconds a rebuild may hold the lock
+VIEW_CACHE_WAIT = 5  # Seconds a miss waits for another worker's rebuild
+VIEW_CACHE_POLL_INTERVAL = 0.05
+
+
+def _should_refresh_early(freshness, beta, now):
+    """XFetch: refresh before expiry with a probability that rises as it nears.
+
+    Slow-to-build entries start refreshing earlier. `1 - random()` keeps the
+    log argument in (0, 1].
+    """
+    expires, delta = freshness
+    return now - delta * beta * math.log(1.0 - random.random()) >= expires
+
+
+def _cached_response(key):
+    """(payload, freshness) for a packed response, or (None, None)."""
+    payload = cache.get(key)
+    freshness = response_freshness(payload)
+    return (payload, freshness) if freshness else (None, None)
+
+
+def _replay_response(payload):
+    accept_gzip = 'gzip' in request.accept_encodings
+    body, status, headers = unpack_response(payload, accept_gzip)
+    return make_response(body, status, headers)
+
+
+def cached(timeout, key_prefix, stale_ttl=None, beta=1.0):
+    """Drop-in for `cache.cached` that keeps expirations from stampeding.
+
+    - Single flight: only the worker holding `<key>:lock` rebuilds an entry.
+    - Early refresh: each hit may rebuild shortly before expiry (XFetch), so
+      popular keys rarely expire at all.
+    - Stale while revalidate: once an entry expires, the lock holder rebuilds
+      it and everyone else gets the stale copy for up to `stale_ttl` seconds
+      (default: `timeout`) instead of queueing on the database.
+
+    A miss with no stale copy waits up to VIEW_CACHE_WAIT seconds for the
+    rebuild. `key_prefix` is a string or a callable, as for cache.cached.
+    Only GET/HEAD responses with status 200 are stored.
+    """
+    stale_ttl = timeout if stale_ttl is None else stale_ttl
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+            key = key_prefix() if callable(key_prefix) else key_prefix
+            lock_key = f'{key}:lock'
+
+            def rebuild():
+                started = time.time()
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    now = time.time()
+                    cache.set(key, pack_response(
+                        response.get_data(), response.status_code, response.headers.items(),
+                        now + timeout, now - started
+                    ), timeout=timeout + stale_ttl)
+                return response
+
+            def locked_rebuild():
+                try:
+                    return rebuild()
+                finally:
+                    cache.delete(lock_key)
+
+            payload, freshness = _cached_response(key)
+            if payload is not None:
+                if not _should_refresh_early(freshness, beta, time.time()):
+                    return _replay_response(payload)
+                if cache.add(lock_key, 1, timeout=VIEW_CACHE_LOCK_TIMEOUT):
+                    return locked_rebuild()
+                # Someone else is rebuilding; the stale copy will do
+                return _replay_response(payload)
+
+            deadline = time.monotonic() + VIEW_CACHE_WAIT
+            while not cache.add(lock_key, 1, timeout=VIEW_CACHE_LOCK_TIMEOUT):
+                if time.monotonic() >= deadline:
+                    return rebuild()  # The rebuild is stuck; don't fail the request
+                time.sleep(VIEW_CACHE_POLL_INTERVAL)
+                payload, _ = _cached_response(key)
+                if payload is not None:
+                    return _replay_response(payload)
+            return locked_rebuild()
+        return wrapper
+    return decorator
@@ -1,11 +1,55 @@
+import importlib
+
+from flask import current_app, has_app_context
 from flask_login import LoginManager
-from flask_bcrypt import Bcrypt
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from flask_mail import Mail
+from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
+from flask_caching import Cache
+from ratelimit import RateLimiter
+from slow_queries import SlowQueryRecorder
+
+
+class LazyExtension:
+    """Stand-in for an extension whose package is imported on first use.
+
+    bcrypt and Flask-Mail are only needed when a password is hashed or an
+    email is sent, so workers don't pay for importing them at startup.
+    `init_app` is deferred the same way: the real extension is initialized
+    for the current app the first time one of its attributes is accessed.
+    """
+
+    def __init__(self, module, name):
+        self._module = module
+        self._name = name
+        self._instance = None
+
+    def init_app(self, app):
+        app.extensions.setdefault('lazy_extensions', {})[self._name] = False
+
+    def _load(self):
+        if self._instance is None:
+            self._instance = getattr(importlib.import_module(self._module), self._name)()
+        instance = self._instance
+        if has_app_context():
+            initialized = current_app.extensions.setdefault('lazy_extensions', {})
+            if not initialized.get(self._name):
+                instance.init_app(current_app)
+                initialized[self._name] = True
+        return instance
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
 
+db = SQLAlchemy()
+migrate = Migrate()
+cache = Cache()
 login_manager = LoginManager()
-bcrypt = Bcrypt()
+bcrypt = LazyExtension('flask_bcrypt', 'Bcrypt')
 cors = CORS()
 jwt = JWTManager()
-mail = Mail()
\ No newline at end of file
+mail = LazyExtension('flask_mail', 'Mail')
+limiter = RateLimiter()
+slow_queries = SlowQueryRecorder()
@@ -0,0 +1,115 @@
+"""
+Typo-tolerant scholarship matching for databases without pg_trgm.
+
+Postgres does fuzzy search in SQL (trigram and full-text indexes, see
+routes/search.py). Elsewhere this module keeps a per-process inverted index:
+
+    trigram -> stemmed terms containing it
+    term    -> scholarships whose title / eligibility criteria contain it
+
+A query term only gets compared with vocabulary terms that share one of its
+trigrams, so a search never walks the whole catalog.
+"""
+
+import re
+from collections import defaultdict
+
+from sqlalchemy import select
+
+from cache_utils import catalog_index
+
+# Minimum trigram similarity between a query term and an indexed term; the
+# same measure and default as pg_trgm's similarity_threshold
+MIN_SIMILARITY = 0.3
+# Upper bound on the ids handed back to SQL for filtering and ordering
+MAX_CANDIDATES = 500
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+# Applied in order, at most one suffix per step: plural, then inflection,
+# then agent noun - so engineers / engineering / engineer all become "engine"
+SUFFIX_STEPS = (
+    ('ies', 'es', 's'),
+    ('ation', 'ing', 'ed'),
+    ('er',),
+)
+MIN_STEM_LENGTH = 3
+
+
+def stem(word):
+    """A small suffix-stripping stemmer (no external dependency)."""
+    for suffixes in SUFFIX_STEPS:
+        for suffix in suffixes:
+            if word.endswith('ss') and suffix == 's':
+                continue  # business, class
+            if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+                word = word[:-len(suffix)]
+                break
+    return word
+
+
+def terms(text):
+    return [stem(token) for token in TOKEN_RE.findall(text.casefold())]
+
+
+def trigrams(term):
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIndex:
+    def __init__(self, scholarships):
+        """`scholarships` is an iterable of (id, title, eligibility_criteria) rows."""
+        self.postings = defaultdict(dict)  # term -> {scholarship id: weight}
+        self.term_trigrams = {}
+        self.trigram_terms = defaultdict(set)
+        for id, title, criteria in scholarships:
+            # Title hits count double
+            for weight, text in ((2.0, title), (1.0, criteria or '')):
+                for term in terms(text):
+                    postings = self.postings[term]
+                    postings[id] = max(postings.get(id, 0.0), weight)
+        for term in self.postings:
+            grams = trigrams(term)
+            self.term_trigrams[term] = grams
+            for gram in grams:
+                self.trigram_terms[gram].add(term)
+
+    def similar_terms(self, term):
+        """(indexed term, similarity) pairs for one query term."""
+        grams = trigrams(term)
+        candidates = set()
+        for gram in grams:
+            candidates |= self.trigram_terms.get(gram, set())
+        for candidate in candidates:
+            other = self.term_trigrams[candidate]
+            similarity = len(grams & other) / len(grams | other)
+            if similarity >= MIN_SIMILARITY:
+                yield candidate, similarity
+
+    def search(self, query, limit=MAX_CANDIDATES):
+        """Scholarship ids ranked by how well they match `query`."""
+        scores = defaultdict(float)
+        for term in set(terms(query)):
+            best = {}
+            for candidate, similarity in self.similar_terms(term):
+                for id, weight in self.postings[candidate].items():
+                    best[id] = max(best.get(id, 0.0), similarity * weight)
+            for id, score in best.items():
+                scores[id] += score
+        ranked = sorted(scores, key=lambda id: (-scores[id], id))
+        return ranked[:limit]
+
+
+def _build_fuzzy_index():
+    from extensions import db
+    from models import Scholarship
+    rows = db.session.execute(
+        select(Scholarship.id, Scholarship.title, Scholarship.eligibility_criteria)
+        .where(Scholarship.is_active == True)
+    ).all()
+    return FuzzyIndex(rows)
+
+
+def fuzzy_index():
+    """The current app's FuzzyIndex, rebuilt when the catalog changes."""
+    return catalog_index('fuzzy', _build_fuzzy_index)
@@ -0,0 +1,96 @@
+"""
+Gunicorn configuration for Scholarship Portal
+Loaded automatically by `gunicorn wsgi:app` when started from the server
+directory (or explicitly with `-c gunicorn.conf.py`).
+
+    gunicorn wsgi:app                                   # threaded WSGI workers
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \\
+        gunicorn 'asgi:create_asgi_app()'                # ASGI workers (see asgi.py)
+
+Every setting can be overridden through the environment variables below.
+"""
+
+import multiprocessing
+import os
+
+
+def _int_env(name, default):
+    return int(os.environ.get(name, default))
+
+
+def default_workers(cores=None):
+    """(2 x cores) + 1 worker processes, capped by GUNICORN_MAX_WORKERS."""
+    cores = cores or multiprocessing.cpu_count()
+    return min(cores * 2 + 1, _int_env('GUNICORN_MAX_WORKERS', 17))
+
+
+# Server socket
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+backlog = _int_env('GUNICORN_BACKLOG', 2048)
+
+# Worker processes - one per core-ish, each with a small thread pool so a slow
+# client or DB wait doesn't idle a whole process
+workers = _int_env('WEB_CONCURRENCY', default_workers())
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = _int_env('GUNICORN_THREADS', 4)
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None  # heartbeat file off disk
+timeout = _int_env('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _int_env('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _int_env('GUNICORN_KEEPALIVE', 5)
+
+# Recycle workers after N requests (+ jitter so they don't all restart at once)
+max_requests = _int_env('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _int_env('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# Import the app once in the master; workers share its memory copy-on-write
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Logging
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+# HTTPS, when certificates are available (otherwise terminate TLS at the proxy)
+_cert = os.environ.get('SSL_CERT_PATH')
+_key = os.environ.get('SSL_KEY_PATH')
+if _cert and _key and os.path.exists(_cert) and os.path.exists(_key):
+    certfile = _cert
+    keyfile = _key
+
+
+def _dispose_engines(app, close):
+    """Drop pooled DB connections for every engine of the Flask app."""
+    flask_app = getattr(app, 'flask_app', app)  # ASGI wrapper or Flask app
+    if not hasattr(flask_app, 'app_context'):
+        return
+    from extensions import db
+    with flask_app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+    # The ASGI read API keeps its own async pool
+    async_engine = getattr(app, 'engine', None)
+    if async_engine is not None and not close:
+        async_engine.sync_engine.dispose(close=False)
+
+
+def pre_fork(server, worker):
+    # Close anything the master opened while preloading so no socket is shared
+    if preload_app:
+        _dispose_engines(server.app.wsgi(), close=True)
+
+
+def post_fork(server, worker):
+    # The child inherits the master's pool objects; forget them without closing
+    # the parent's sockets and let the worker open its own connections
+    if preload_app:
+        _dispose_engines(worker.app.wsgi(), close=False)
+    server.log.info(f'Worker spawned (pid: {worker.pid})')
+
+
+
+def post_worker_init(worker):
+    # Refill a cold cache after a deploy; the warm-up lock lets one worker do it
+    flask_app = getattr(worker.app.wsgi(), 'flask_app', worker.app.wsgi())
+    if hasattr(flask_app, 'config') and flask_app.config.get('CACHE_WARM_ON_START'):
+        from warmup import warm_in_background
+        warm_in_background(flask_app)
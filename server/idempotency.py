@@ -0,0 +1,211 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+    @applications_bp.route('/apply', methods=['POST'])
+    @jwt_required()
+    @idempotent()
+    def apply_for_scholarship(): ...
+
+A request carrying an `Idempotency-Key` header runs once; repeats from the
+same caller with the same key get the stored response back (with
+`Idempotent-Replayed: true`) until IDEMPOTENCY_TTL expires. Responses live in
+the cache, backed by the `idempotency_record` table so they survive cache
+eviction and are shared between workers. That row is inserted before the view
+runs, so a concurrent duplicate finds it and waits for the first request to
+finish instead of running a second transaction. 5xx responses are not stored;
+the client may retry those.
+
+Records are read and written through short-lived sessions of their own, so
+claiming or completing a key never commits, or rolls back, the work of the
+view in `db.session`.
+"""
+
+import hashlib
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+import click
+from flask import current_app, jsonify, make_response, request
+from flask.cli import with_appcontext
+from flask_login import current_user
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from extensions import db, cache
+from models import IdempotencyRecord
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05  # Seconds between checks while a duplicate is in flight
+
+
+def _caller():
+    """Who the key belongs to: JWT identity, session user, or client address."""
+    from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+    try:
+        verify_jwt_in_request(optional=True)
+        user_id = get_jwt_identity()
+    except Exception:
+        user_id = None
+    if user_id is not None:
+        return f'user:{user_id}'
+    if current_user.is_authenticated:
+        return f'user:{current_user.id}'
+    return f'ip:{request.remote_addr}'
+
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _cache_key(key):
+    return f'idempotency_{key}'
+
+
+def _request_fingerprint():
+    return _digest(request.method, request.path, request.query_string, request.get_data())
+
+
+def _records():
+    """A session for idempotency records, separate from the view's db.session."""
+    return Session(db.engine)
+
+
+def _load(key):
+    """The stored entry for `key` as a dict, or None. Pending entries have status None."""
+    entry = cache.get(_cache_key(key))
+    if entry is not None:
+        return entry
+    # A new session per poll sees rows committed by other workers
+    with _records() as session:
+        record = session.get(IdempotencyRecord, key)
+        if record is None:
+            return None
+        expires_at = record.expires_at
+        entry = {
+            'fingerprint': record.fingerprint,
+            'status': record.status_code,
+            'body': record.response_body,
+            'content_type': record.content_type
+        }
+    if expires_at <= datetime.utcnow():
+        _release(key)  # Expired response, or the lock of a worker that died
+        return None
+    if entry['status'] is not None:
+        cache.set(_cache_key(key), entry, timeout=_seconds_left(expires_at))
+    return entry
+
+
+def _claim(key, fingerprint):
+    """Insert the pending row; False if another request already holds the key."""
+    lock_timeout = current_app.config['IDEMPOTENCY_LOCK_TIMEOUT']
+    with _records() as session:
+        session.add(IdempotencyRecord(
+            key=key, fingerprint=fingerprint,
+            expires_at=datetime.utcnow() + timedelta(seconds=lock_timeout)
+        ))
+        try:
+            session.commit()
+            return True
+        except IntegrityError:
+            session.rollback()
+            return False
+
+
+def _complete(key, fingerprint, response):
+    ttl = current_app.config['IDEMPOTENCY_TTL']
+    with _records() as session:
+        record = session.get(IdempotencyRecord, key)
+        if record is None:
+            return
+        record.status_code = response.status_code
+        record.response_body = response.get_data()
+        record.content_type = response.content_type
+        record.expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+        session.commit()
+    cache.set(_cache_key(key), {
+        'fingerprint': fingerprint,
+        'status': response.status_code,
+        'body': response.get_data(),
+        'content_type': response.content_type
+    }, timeout=ttl)
+
+
+def _release(key):
+    with _records() as session:
+        session.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key == key))
+        session.commit()
+    cache.delete(_cache_key(key))
+
+
+def _seconds_left(expires_at):
+    return max(int((expires_at - datetime.utcnow()).total_seconds()), 1)
+
+
+def _replay(entry):
+    response = make_response(entry['body'], entry['status'])
+    response.content_type = entry['content_type']
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent():
+    """Make a POST view honour the Idempotency-Key header (apply below auth decorators)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            client_key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not client_key:
+                return view(*args, **kwargs)
+            if len(client_key) > MAX_KEY_LENGTH:
+                return jsonify({'error': f'{IDEMPOTENCY_HEADER} is too long'}), 400
+
+            key = _digest(request.endpoint, _caller(), client_key)
+            fingerprint = _request_fingerprint()
+            deadline = time.monotonic() + current_app.config['IDEMPOTENCY_WAIT']
+            while True:
+                entry = _load(key)
+                if entry is None:
+                    if _claim(key, fingerprint):
+                        break
+                    continue  # Lost the race; wait for the winner
+                if entry['fingerprint'] != fingerprint:
+                    return jsonify({'error': f'{IDEMPOTENCY_HEADER} was used for a different request'}), 422
+                if entry['status'] is not None:
+                    return _replay(entry)
+                if time.monotonic() >= deadline:
+                    response = jsonify({'error': 'A request with this key is still in progress'})
+                    response.headers['Retry-After'] = '1'
+                    return response, 409
+                time.sleep(POLL_INTERVAL)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                _release(key)
+                raise
+            if response.status_code >= 500 or response.is_streamed:
+                _release(key)
+            else:
+                _complete(key, fingerprint, response)
+            return response
+        return wrapper
+    return decorator
+
+
+@click.command('purge-idempotency-keys')
+@with_appcontext
+def purge_idempotency_keys_command():
+    """Delete expired idempotency records."""
+    result = db.session.execute(
+        delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= datetime.utcnow())
+    )
+    db.session.commit()
+    click.echo(f'Deleted {result.rowcount} expired idempotency records')
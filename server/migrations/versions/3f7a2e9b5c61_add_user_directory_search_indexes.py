@@ -0,0 +1,34 @@
+"""Add user directory search indexes
+
+Revision ID: 3f7a2e9b5c61
+Revises: e62b9c4d7a18
+Create Date: 2026-10-19 19:32:18.540126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f7a2e9b5c61'
+down_revision = 'e62b9c4d7a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_created_at_id', 'user', ['created_at', 'id'], unique=False)
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # lower(email) LIKE 'prefix%' needs text_pattern_ops under a non-C collation
+    op.execute('CREATE INDEX ix_user_email_lower ON "user" (lower(email) text_pattern_ops)')
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_user_name_trgm', 'user', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_user_name_trgm', table_name='user')
+        op.drop_index('ix_user_email_lower', table_name='user')
+    op.drop_index('ix_user_created_at_id', table_name='user')
@@ -0,0 +1,41 @@
+"""Add attachment table
+
+Revision ID: 5c9e13b7f2a4
+Revises: d41f0a6c8e27
+Create Date: 2026-10-19 15:21:07.664213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c9e13b7f2a4'
+down_revision = 'd41f0a6c8e27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('attachment',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('application_id', sa.Integer(), nullable=False),
+    sa.Column('uploaded_by', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=30), nullable=True),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('content_type', sa.String(length=100), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['uploaded_by'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_attachment_application_id'), 'attachment', ['application_id'], unique=False)
+    op.create_index(op.f('ix_attachment_sha256'), 'attachment', ['sha256'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_attachment_sha256'), table_name='attachment')
+    op.drop_index(op.f('ix_attachment_application_id'), table_name='attachment')
+    op.drop_table('attachment')
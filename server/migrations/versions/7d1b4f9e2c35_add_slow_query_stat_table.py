@@ -0,0 +1,37 @@
+"""Add slow query stat table
+
+Revision ID: 7d1b4f9e2c35
+Revises: c2d8e5a1f7b9
+Create Date: 2026-10-19 23:31:40.205417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d1b4f9e2c35'
+down_revision = 'c2d8e5a1f7b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('slow_query_stat',
+    sa.Column('fingerprint', sa.String(length=16), nullable=False),
+    sa.Column('endpoint', sa.String(length=200), nullable=False),
+    sa.Column('statement', sa.Text(), nullable=False),
+    sa.Column('bind_shape', sa.Text(), nullable=True),
+    sa.Column('calls', sa.Integer(), nullable=False),
+    sa.Column('total_ms', sa.Float(), nullable=False),
+    sa.Column('max_ms', sa.Float(), nullable=False),
+    sa.Column('plan', sa.Text(), nullable=True),
+    sa.Column('last_seen', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('fingerprint', 'endpoint')
+    )
+    op.create_index(op.f('ix_slow_query_stat_last_seen'), 'slow_query_stat', ['last_seen'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_slow_query_stat_last_seen'), table_name='slow_query_stat')
+    op.drop_table('slow_query_stat')
@@ -0,0 +1,31 @@
+"""Add trigram index on scholarship title
+
+Revision ID: 8a3d6f0e1b52
+Revises: 5c9e13b7f2a4
+Create Date: 2026-10-19 16:40:12.903771
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a3d6f0e1b52'
+down_revision = '5c9e13b7f2a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Backs the fuzzy fallback of /api/search/suggest; Postgres only
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_scholarship_title_trgm', 'scholarship', ['title'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_scholarship_title_trgm', table_name='scholarship')
@@ -0,0 +1,40 @@
+"""Add application daily stat table
+
+Revision ID: a94c51e8d3f0
+Revises: 3f7a2e9b5c61
+Create Date: 2026-10-19 21:14:36.802594
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a94c51e8d3f0'
+down_revision = '3f7a2e9b5c61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('application_daily_stat',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('scholarship_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['scholarship_id'], ['scholarship.id'], ),
+    sa.PrimaryKeyConstraint('day', 'scholarship_id', 'status')
+    )
+    # Backfill from existing applications (same as `flask rollup-applications`)
+    op.execute(
+        "INSERT INTO application_daily_stat (day, scholarship_id, status, count) "
+        "SELECT date(submission_date), scholarship_id, coalesce(status, 'pending'), count(*) FROM ("
+        "SELECT submission_date, scholarship_id, status FROM application "
+        "UNION ALL SELECT submission_date, scholarship_id, status FROM application_archive"
+        ") AS applications WHERE submission_date IS NOT NULL "
+        "GROUP BY date(submission_date), scholarship_id, coalesce(status, 'pending')"
+    )
+
+
+def downgrade():
+    op.drop_table('application_daily_stat')
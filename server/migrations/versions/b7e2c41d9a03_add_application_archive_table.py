@@ -0,0 +1,45 @@
+"""Add application archive table
+
+Revision ID: b7e2c41d9a03
+Revises: 46a7343c7624
+Create Date: 2026-10-19 09:12:31.402115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2c41d9a03'
+down_revision = '46a7343c7624'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('application_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('scholarship_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('essay', sa.Text(), nullable=True),
+    sa.Column('submission_date', sa.DateTime(), nullable=True),
+    sa.Column('reviewed_at', sa.DateTime(), nullable=True),
+    sa.Column('reviewed_by', sa.Integer(), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['reviewed_by'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['scholarship_id'], ['scholarship.id'], ),
+    sa.ForeignKeyConstraint(['student_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_application_archive_scholarship_id'), 'application_archive', ['scholarship_id'], unique=False)
+    op.create_index(op.f('ix_application_archive_student_id'), 'application_archive', ['student_id'], unique=False)
+    op.create_index(op.f('ix_application_archive_submission_date'), 'application_archive', ['submission_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_application_archive_submission_date'), table_name='application_archive')
+    op.drop_index(op.f('ix_application_archive_student_id'), table_name='application_archive')
+    op.drop_index(op.f('ix_application_archive_scholarship_id'), table_name='application_archive')
+    op.drop_table('application_archive')
@@ -0,0 +1,35 @@
+"""Add idempotency record table
+
+Revision ID: c2d8e5a1f7b9
+Revises: a94c51e8d3f0
+Create Date: 2026-10-19 22:47:03.115862
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2d8e5a1f7b9'
+down_revision = 'a94c51e8d3f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('idempotency_record',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('fingerprint', sa.String(length=64), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('response_body', sa.LargeBinary(), nullable=True),
+    sa.Column('content_type', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_idempotency_record_expires_at'), 'idempotency_record', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_idempotency_record_expires_at'), table_name='idempotency_record')
+    op.drop_table('idempotency_record')
@@ -0,0 +1,50 @@
+"""Store application essays compressed
+
+Revision ID: d41f0a6c8e27
+Revises: b7e2c41d9a03
+Create Date: 2026-10-19 14:03:52.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f0a6c8e27'
+down_revision = 'b7e2c41d9a03'
+branch_labels = None
+depends_on = None
+
+TABLES = ('application', 'application_archive')
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table in TABLES:
+        if bind.dialect.name == 'postgresql':
+            # Existing text becomes a raw (uncompressed) CompressedText value
+            op.execute(
+                f"ALTER TABLE {table} ALTER COLUMN essay TYPE BYTEA "
+                f"USING ('\\x00'::bytea || convert_to(essay, 'UTF8'))"
+            )
+        else:
+            # CompressedText reads unmarked legacy text as-is
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.alter_column('essay', existing_type=sa.Text(), type_=sa.LargeBinary())
+
+
+def downgrade():
+    from models import CompressedText
+    decoder = CompressedText()
+    bind = op.get_bind()
+    for table in TABLES:
+        op.add_column(table, sa.Column('essay_text', sa.Text(), nullable=True))
+        rows = bind.execute(sa.text(f'SELECT id, essay FROM {table} WHERE essay IS NOT NULL')).fetchall()
+        for row in rows:
+            bind.execute(
+                sa.text(f'UPDATE {table} SET essay_text = :essay WHERE id = :id'),
+                {'essay': decoder.process_result_value(row.essay, bind.dialect), 'id': row.id}
+            )
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('essay')
+            batch_op.alter_column('essay_text', new_column_name='essay')
@@ -0,0 +1,38 @@
+"""Add fuzzy search indexes on scholarship
+
+Revision ID: e62b9c4d7a18
+Revises: 8a3d6f0e1b52
+Create Date: 2026-10-19 18:05:44.217390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e62b9c4d7a18'
+down_revision = '8a3d6f0e1b52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Back fuzzy_text_match() in routes/search.py; other databases use the
+    # in-process index in fuzzy.py
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_scholarship_eligibility_criteria_trgm', 'scholarship', ['eligibility_criteria'],
+                    unique=False, postgresql_using='gin',
+                    postgresql_ops={'eligibility_criteria': 'gin_trgm_ops'})
+    op.execute(
+        "CREATE INDEX ix_scholarship_search_tsv ON scholarship USING gin "
+        "(to_tsvector('english', coalesce(title, '') || ' ' || coalesce(eligibility_criteria, '')))"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_scholarship_search_tsv', table_name='scholarship')
+    op.drop_index('ix_scholarship_eligibility_criteria_trgm', table_name='scholarship')
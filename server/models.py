@@ -1,7 +1,79 @@
 from extensions import db, login_manager, bcrypt
+from flask import current_app
 from flask_login import UserMixin
+from itsdangerous import BadSignature, SignatureExpired, URLSafeSerializer
+from sqlalchemy.orm import deferred
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime, timedelta
-import secrets
+import hashlib
+import hmac
+import time
+import zlib
+
+class CompressedText(TypeDecorator):
+    """Text stored as bytes, zlib-compressed above `threshold` bytes.
+
+    The first byte records the encoding (0 = raw UTF-8, 1 = zlib) so small
+    values skip compression entirely. Values without a known marker are read
+    as plain UTF-8 text written before the column was converted.
+    """
+    impl = db.LargeBinary
+    cache_ok = True
+
+    RAW = b'\x00'
+    ZLIB = b'\x01'
+
+    def __init__(self, threshold=1024, level=6, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threshold = threshold
+        self.level = level
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        data = value.encode('utf-8')
+        if len(data) >= self.threshold:
+            compressed = zlib.compress(data, self.level)
+            if len(compressed) < len(data):
+                return self.ZLIB + compressed
+        return self.RAW + data
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        value = bytes(value)
+        if value[:1] == self.ZLIB:
+            return zlib.decompress(value[1:]).decode('utf-8')
+        if value[:1] == self.RAW:
+            return value[1:].decode('utf-8')
+        return value.decode('utf-8')
+
+# Lifetime of the signed tokens emailed for each purpose
+SIGNED_TOKEN_TTL = {
+    'reset': timedelta(hours=1),
+    'verify': timedelta(hours=24)
+}
+
+def _token_serializer(purpose):
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt=f'user-token-{purpose}')
+
+def token_fingerprint(password_hash, email, email_verified):
+    """Changes whenever outstanding tokens should stop working.
+
+    A new password, a new email or completing verification all retire the
+    tokens issued before, which makes each token single-use without storing it.
+    """
+    data = f'{password_hash}|{email}|{int(bool(email_verified))}'
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+
+def issue_signed_token(purpose, user_id, fingerprint, ttl=None):
+    """HMAC-signed [user id, fingerprint, expiry] for reset or verification links."""
+    expires = int(time.time() + (ttl or SIGNED_TOKEN_TTL[purpose]).total_seconds())
+    return _token_serializer(purpose).dumps([user_id, fingerprint, expires])
+
+def is_signed_token(token):
+    # token_urlsafe() tokens stored in the database never contain a dot
+    return '.' in token
 
 @login_manager.user_loader
 def load_user(id):
@@ -9,6 +81,9 @@ def load_user(id):
     return db.session.query(User).get(int(id))
 
 class User(UserMixin, db.Model):
+    # Keyset pagination of the admin user directory (newest first)
+    __table_args__ = (db.Index('ix_user_created_at_id', 'created_at', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
@@ -29,10 +104,36 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return bcrypt.check_password_hash(self.password_hash, password)
 
+    def token_fingerprint(self):
+        return token_fingerprint(self.password_hash, self.email, self.email_verified)
+
     def generate_reset_token(self):
-        self.password_reset_token = secrets.token_urlsafe(32)
-        self.password_reset_expires = datetime.utcnow() + timedelta(hours=1)
-        return self.password_reset_token
+        """Signed, stateless reset token (nothing is written to the database)."""
+        return issue_signed_token('reset', self.id, self.token_fingerprint())
+
+    def generate_verification_token(self):
+        """Signed, stateless verification token; the user must have an id."""
+        return issue_signed_token('verify', self.id, self.token_fingerprint())
+
+    @classmethod
+    def from_signed_token(cls, token, purpose):
+        """The user a signed token was issued to, with one primary-key fetch.
+
+        Raises SignatureExpired for an expired token and BadSignature for any
+        other invalid one.
+        """
+        try:
+            user_id, fingerprint, expires = _token_serializer(purpose).loads(token)
+        except (TypeError, ValueError) as e:
+            raise BadSignature('Malformed token') from e
+        if expires < time.time():
+            raise SignatureExpired('Token has expired')
+        user = db.session.get(cls, user_id)
+        if user is None or not hmac.compare_digest(user.token_fingerprint(), fingerprint):
+            raise BadSignature('Token is no longer valid')
+        return user
+
+    # Database-stored tokens, still accepted for links sent before signed tokens
 
     def verify_reset_token(self, token):
         if self.password_reset_token == token and self.password_reset_expires > datetime.utcnow():
@@ -43,11 +144,6 @@ class User(UserMixin, db.Model):
         self.password_reset_token = None
         self.password_reset_expires = None
 
-    def generate_verification_token(self):
-        self.email_verification_token = secrets.token_urlsafe(32)
-        self.email_verification_expires = datetime.utcnow() + timedelta(hours=24)  # 24 hours for email verification
-        return self.email_verification_token
-
     def verify_email_token(self, token):
         if self.email_verification_token == token and self.email_verification_expires > datetime.utcnow():
             self.email_verified = True
@@ -105,7 +201,9 @@ class Application(db.Model):
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     scholarship_id = db.Column(db.Integer, db.ForeignKey('scholarship.id'), nullable=False, index=True)
     status = db.Column(db.String(20), default='pending', index=True)  # pending, under_review, approved, rejected
-    essay = db.Column(db.Text)  # Personal statement or essay
+    # Personal statement or essay - the widest column by far, so it is stored
+    # compressed and only loaded when accessed (or undefer()'d by get_application)
+    essay = deferred(db.Column(CompressedText))
     submission_date = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     reviewed_at = db.Column(db.DateTime, index=True)
     reviewed_by = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
@@ -114,15 +212,157 @@ class Application(db.Model):
     def __repr__(self):
         return f'<Application {self.id} - {self.status}>'
 
-    def to_dict(self):
-        return {
+    def to_dict(self, include_essay=True):
+        data = {
             'id': self.id,
             'student_id': self.student_id,
             'scholarship_id': self.scholarship_id,
             'status': self.status,
-            'essay': self.essay,
             'submission_date': self.submission_date.isoformat() if self.submission_date else None,
             'reviewed_at': self.reviewed_at.isoformat() if self.reviewed_at else None,
             'reviewed_by': self.reviewed_by,
             'notes': self.notes
-        }
\ No newline at end of file
+        }
+        if include_essay:
+            data['essay'] = self.essay
+        return data
+
+class ArchivedApplication(db.Model):
+    """Decided applications moved out of the hot `application` table."""
+    __tablename__ = 'application_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Keeps the original application id
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    scholarship_id = db.Column(db.Integer, db.ForeignKey('scholarship.id'), nullable=False, index=True)
+    status = db.Column(db.String(20))
+    essay = deferred(db.Column(CompressedText))
+    submission_date = db.Column(db.DateTime, index=True)
+    reviewed_at = db.Column(db.DateTime)
+    reviewed_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    notes = db.Column(db.Text)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    scholarship = db.relationship('Scholarship')
+
+    def __repr__(self):
+        return f'<ArchivedApplication {self.id} - {self.status}>'
+
+    def to_dict(self, include_essay=True):
+        data = {
+            'id': self.id,
+            'student_id': self.student_id,
+            'scholarship_id': self.scholarship_id,
+            'status': self.status,
+            'submission_date': self.submission_date.isoformat() if self.submission_date else None,
+            'reviewed_at': self.reviewed_at.isoformat() if self.reviewed_at else None,
+            'reviewed_by': self.reviewed_by,
+            'notes': self.notes,
+            'archived': True
+        }
+        if include_essay:
+            data['essay'] = self.essay
+        return data
+
+class Attachment(db.Model):
+    """A file (transcript, recommendation letter, ...) attached to an application.
+
+    The bytes live in the content-addressed AttachmentStore (attachments.py);
+    `sha256` is set once the upload completes and names the stored object.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    # No FK: the id survives archival into application_archive
+    application_id = db.Column(db.Integer, nullable=False, index=True)
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(30), default='other')  # transcript, recommendation, other
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(100), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    sha256 = db.Column(db.String(64), index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<Attachment {self.id} - {self.filename}>'
+
+    @property
+    def is_complete(self):
+        return self.sha256 is not None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'application_id': self.application_id,
+            'kind': self.kind,
+            'filename': self.filename,
+            'content_type': self.content_type,
+            'size': self.size,
+            'sha256': self.sha256,
+            'complete': self.is_complete,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+class ApplicationDailyStat(db.Model):
+    """Applications submitted per day, by scholarship and current status.
+
+    Maintained incrementally on insert/review (analytics.py) and rebuilt
+    with `flask rollup-applications`, so trend queries read one row per
+    day/scholarship/status instead of scanning applications.
+    """
+    __tablename__ = 'application_daily_stat'
+
+    day = db.Column(db.Date, primary_key=True)
+    scholarship_id = db.Column(db.Integer, db.ForeignKey('scholarship.id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ApplicationDailyStat {self.day} {self.scholarship_id} {self.status}: {self.count}>'
+
+class IdempotencyRecord(db.Model):
+    """Stored response for an Idempotency-Key (see idempotency.py).
+
+    `status_code` is NULL while the first request is still running; the row
+    doubles as the lock that makes concurrent duplicates wait for it.
+    """
+    __tablename__ = 'idempotency_record'
+
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of endpoint, caller and client key
+    fingerprint = db.Column(db.String(64), nullable=False)  # sha256 of the request
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.LargeBinary)
+    content_type = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyRecord {self.key} - {self.status_code}>'
+
+class SlowQueryStat(db.Model):
+    """Aggregated slow statements, one row per fingerprint and endpoint (see slow_queries.py)."""
+    __tablename__ = 'slow_query_stat'
+
+    fingerprint = db.Column(db.String(16), primary_key=True)  # sha1 prefix of the normalized SQL
+    endpoint = db.Column(db.String(200), primary_key=True)
+    statement = db.Column(db.Text, nullable=False)
+    bind_shape = db.Column(db.Text)
+    calls = db.Column(db.Integer, nullable=False, default=0)
+    total_ms = db.Column(db.Float, nullable=False, default=0.0)
+    max_ms = db.Column(db.Float, nullable=False, default=0.0)
+    plan = db.Column(db.Text)
+    last_seen = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<SlowQueryStat {self.fingerprint} {self.endpoint}: {self.calls}>'
+
+class RevokedToken(db.Model):
+    """A JWT denied before its expiry: logged out or rotated (see revocation.py)."""
+    __tablename__ = 'revoked_token'
+
+    jti = db.Column(db.String(36), primary_key=True)
+    token_type = db.Column(db.String(10), nullable=False)  # access or refresh
+    user_id = db.Column(db.Integer, nullable=False)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Incremental syncs
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti} ({self.token_type})>'
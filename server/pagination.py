@@ -0,0 +1,176 @@
+"""
+Pagination helpers shared by the list endpoints.
+
+`paginate()` fetches a page and its total the cheapest way it can:
+
+- small results: one query, the total riding along as COUNT(*) OVER ();
+- large results (PAGINATION_ESTIMATE_THRESHOLD rows or more, as shown by
+  an exact count): that count cached for a few minutes, then the Postgres
+  planner's row estimate, flagged with `total_estimated: true` in the
+  pagination block. Queries never seen to be large never run EXPLAIN;
+- `count=false` in the request: no total at all, one extra row tells
+  whether there is a next page.
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+
+from flask import current_app
+from sqlalchemy import func, select, text
+
+TOTAL_COLUMN = 'total_count'
+COUNT_CACHE_TIMEOUT = 300  # Seconds a large result's count is reused
+LARGE_QUERY_TIMEOUT = 3600  # Seconds a query stays known as large (estimated after its count expires)
+
+
+def page_metadata(page, per_page, total, total_key='total', has_next=None, estimated=False):
+    """Build the `pagination` block returned by list endpoints.
+
+    With `total` None (count=false) the page count is unknown and `has_next`
+    must be given.
+    """
+    if total is None:
+        total_pages = None
+    else:
+        total_pages = (total + per_page - 1) // per_page
+        has_next = page < total_pages
+    metadata = {
+        'page': page,
+        'per_page': per_page,
+        total_key: total,
+        'total_pages': total_pages,
+        'has_next': has_next,
+        'has_prev': page > 1,
+        'next_page': page + 1 if has_next else None,
+        'prev_page': page - 1 if page > 1 else None
+    }
+    if estimated:
+        metadata['total_estimated'] = True
+    return metadata
+
+
+def count_requested(args):
+    """False when the client opted out of totals with count=false."""
+    return args.get('count', 'true').lower() not in ('false', '0', 'no')
+
+
+def _items(statement, rows):
+    # Single-entity selects yield the entity; column selects keep the row
+    descriptions = statement.column_descriptions
+    if len(descriptions) == 1 and descriptions[0]['entity'] is not None \
+            and descriptions[0]['expr'] is descriptions[0]['entity']:
+        return [row[0] for row in rows]
+    return list(rows)
+
+
+def _window_statement(statement, page, per_page):
+    return (statement.add_columns(func.count().over().label(TOTAL_COLUMN))
+            .offset((page - 1) * per_page).limit(per_page))
+
+
+def _lookahead_statement(statement, page, per_page):
+    return statement.offset((page - 1) * per_page).limit(per_page + 1)
+
+
+def _count_statement(statement):
+    return select(func.count()).select_from(statement.order_by(None).subquery())
+
+
+def _count_cache_key(statement, dialect):
+    compiled = statement.order_by(None).compile(dialect=dialect)
+    params = json.dumps(sorted(compiled.params.items()), default=str)
+    digest = hashlib.md5(f'{compiled}|{params}'.encode('utf-8')).hexdigest()
+    return f'pagination_count_{digest}'
+
+
+def _planner_estimate(connection, statement):
+    """Postgres' row estimate for `statement` (EXPLAIN without running it)."""
+    if connection.dialect.name != 'postgresql':
+        return None
+    # Compile with :name parameters (expanding IN lists rendered out) so the
+    # EXPLAIN goes through text() with the values still bound by the driver
+    dialect = type(connection.dialect)(paramstyle='named')
+    dialect.server_version_info = connection.dialect.server_version_info
+    compiled = statement.order_by(None).compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+    sql = str(compiled).replace('::', r'\:\:')  # Casts aren't parameters
+    plan = connection.execute(text(f'EXPLAIN (FORMAT JSON) {sql}'), compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def paginate(statement, page, per_page, with_total=True, total_key='total'):
+    """(items, pagination block) for one page of an ordered select."""
+    from extensions import cache, db
+
+    if not with_total:
+        rows = db.session.execute(_lookahead_statement(statement, page, per_page)).all()
+        items = _items(statement, rows)
+        return items[:per_page], page_metadata(page, per_page, None, total_key, has_next=len(items) > per_page)
+
+    threshold = current_app.config['PAGINATION_ESTIMATE_THRESHOLD']
+    connection = db.session.connection()
+    cache_key = _count_cache_key(statement, connection.dialect)
+    estimate = cache.get(cache_key)
+    if estimate is None and cache.get(f'{cache_key}_large'):
+        # Only queries an exact count already showed to be large pay for EXPLAIN
+        estimate = _planner_estimate(connection, statement)
+        if estimate is not None and estimate >= threshold:
+            cache.set(cache_key, estimate, timeout=COUNT_CACHE_TIMEOUT)
+        else:
+            estimate = None
+    if estimate is not None:
+        rows = db.session.execute(statement.offset((page - 1) * per_page).limit(per_page)).all()
+        return _items(statement, rows), page_metadata(page, per_page, estimate, total_key, estimated=True)
+
+    rows = db.session.execute(_window_statement(statement, page, per_page)).all()
+    if rows:
+        total = rows[0]._mapping[TOTAL_COLUMN]
+    else:
+        # Past the last page the window has no row to carry the total
+        total = db.session.execute(_count_statement(statement)).scalar()
+    if total >= threshold:
+        cache.set(cache_key, total, timeout=COUNT_CACHE_TIMEOUT)
+        cache.set(f'{cache_key}_large', True, timeout=LARGE_QUERY_TIMEOUT)
+    return _items(statement, rows), page_metadata(page, per_page, total, total_key)
+
+
+async def paginate_async(session, statement, page, per_page, with_total=True, total_key='total'):
+    """paginate() for the ASGI handlers' AsyncSession (exact or no totals; no estimates)."""
+    if not with_total:
+        rows = (await session.execute(_lookahead_statement(statement, page, per_page))).all()
+        items = _items(statement, rows)
+        return items[:per_page], page_metadata(page, per_page, None, total_key, has_next=len(items) > per_page)
+    rows = (await session.execute(_window_statement(statement, page, per_page))).all()
+    if rows:
+        total = rows[0]._mapping[TOTAL_COLUMN]
+    else:
+        total = await session.scalar(_count_statement(statement))
+    return _items(statement, rows), page_metadata(page, per_page, total, total_key)
+
+
+def encode_cursor(*values):
+    """Opaque keyset cursor for the last row of a page (JSON-serializable values)."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, count):
+    """Values from encode_cursor(); raises ValueError if the cursor is malformed."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (UnicodeEncodeError, binascii.Error, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list) or len(values) != count:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def cursor_metadata(per_page, next_cursor):
+    """The `pagination` block for keyset-paginated endpoints."""
+    return {
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'has_next': next_cursor is not None
+    }
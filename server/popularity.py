@@ -0,0 +1,86 @@
+"""
+Approximate popularity counts (most viewed scholarships, top search queries).
+
+Hits are counted in process memory and merged into one shared cache entry
+per kind at most every FLUSH_INTERVAL seconds, so tracking costs a counter
+increment per request. Concurrent merges from different workers can drop a
+few increments; the counts only rank what the cache warmer precomputes.
+"""
+
+import hmac
+import secrets
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, has_request_context, request
+
+from extensions import cache
+
+FLUSH_INTERVAL = 30  # Seconds
+MAX_TRACKED = 500  # Entries kept per kind
+POPULARITY_TIMEOUT = 7 * 24 * 60 * 60
+# Requests made by the cache warmer don't count as interest; the header must
+# carry warm_secret() so clients can't use it to hide their hits
+WARM_HEADER = 'X-Cache-Warm'
+
+
+def popularity_key(kind):
+    return f'popular_{kind}'
+
+
+class PopularityTracker:
+    def __init__(self):
+        self.pending = {}  # kind -> Counter
+        self.lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+    def record(self, kind, key):
+        """Count one hit; True when the pending counts are due to be flushed."""
+        with self.lock:
+            self.pending.setdefault(kind, Counter())[key] += 1
+            return time.monotonic() - self.flushed_at >= FLUSH_INTERVAL
+
+    def flush(self):
+        """Merge pending counts into the shared entries (needs an app context)."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flushed_at = time.monotonic()
+        for kind, counts in pending.items():
+            merged = Counter(cache.get(popularity_key(kind)) or {})
+            merged.update(counts)
+            cache.set(popularity_key(kind), dict(merged.most_common(MAX_TRACKED)), timeout=POPULARITY_TIMEOUT)
+
+
+def popularity_tracker(app=None):
+    return (app or current_app).extensions.setdefault('popularity', PopularityTracker())
+
+
+def warm_secret(app=None):
+    """CACHE_WARM_SECRET, or a random value private to this process."""
+    app = app or current_app
+    secret = app.config.get('CACHE_WARM_SECRET')
+    if not secret:
+        secret = app.extensions.setdefault('cache_warm_secret', secrets.token_urlsafe(32))
+    return secret
+
+
+def is_warm_request():
+    value = request.headers.get(WARM_HEADER)
+    return bool(value) and hmac.compare_digest(value, warm_secret())
+
+
+def record_hit(kind, key):
+    """Count a hit from a Flask request."""
+    if has_request_context() and is_warm_request():
+        return
+    tracker = popularity_tracker()
+    if tracker.record(kind, key):
+        tracker.flush()
+
+
+def most_popular(kind, limit):
+    """The `limit` most hit keys of `kind`, most popular first."""
+    popularity_tracker().flush()
+    counts = cache.get(popularity_key(kind)) or {}
+    return [key for key, _ in Counter(counts).most_common(limit)]
@@ -0,0 +1,168 @@
+"""
+On-demand request profiling.
+
+With PROFILE_DIR set, an admin can send `X-Profile: 1` (or pass
+`?_profile=<token>` from `flask profile-token`) and the request runs under a
+sampling profiler: a helper thread records the request thread's stack every
+PROFILE_INTERVAL seconds. The samples are written to PROFILE_DIR in folded
+stack format - one `frame;frame;frame count` line per distinct stack, which
+flamegraph.pl, speedscope and inferno render as a flame graph - and the
+response carries an `X-Profile-URL` header pointing at it. Only the newest
+PROFILE_MAX_FILES profiles are kept.
+
+PROFILE_DIR is unset by default; DevelopmentConfig points it at profiles/.
+
+Sampling only adds the cost of the helper thread taking the GIL now and
+then, whatever the view does. Requests that don't ask for a profile pay one
+header lookup, and nothing at all when PROFILE_DIR is unset.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = '_profile'
+PROFILE_URL_HEADER = 'X-Profile-URL'
+PROFILE_SUFFIX = '.folded'
+TOKEN_SALT = 'request-profile'
+# Deepest stack recorded per sample; deeper frames are cut at the root side
+MAX_DEPTH = 200
+
+UNSAFE_NAME_RE = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class Sampler:
+    """Counts the stacks seen on one thread at a fixed interval."""
+
+    def __init__(self, interval, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        self.samples = Counter()
+        self.started = None
+        self.duration = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+
+def profile_serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=TOKEN_SALT)
+
+
+def valid_profile_token(token):
+    try:
+        profile_serializer().loads(token, max_age=current_app.config['PROFILE_TOKEN_MAX_AGE'])
+    except BadSignature:
+        return False
+    return True
+
+
+def profiling_allowed():
+    """A valid signed token, or a request authenticated as an admin."""
+    from flask import request
+    from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+    from flask_login import current_user
+    from extensions import db
+    from models import User
+
+    token = request.args.get(PROFILE_PARAM)
+    if token:
+        return valid_profile_token(token)
+    try:
+        verify_jwt_in_request(optional=True)
+        user_id = get_jwt_identity()
+    except Exception:
+        user_id = None
+    if user_id is not None:
+        user = db.session.get(User, int(user_id))
+    else:
+        user = current_user if current_user.is_authenticated else None
+    return user is not None and user.role == 'admin'
+
+
+def save_profile(sampler, endpoint):
+    """Write the samples to PROFILE_DIR; returns the file name."""
+    directory = current_app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    name = f'{stamp}-{UNSAFE_NAME_RE.sub("_", endpoint or "unknown")}-{uuid.uuid4().hex[:8]}{PROFILE_SUFFIX}'
+    with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+        f.write(sampler.folded())
+    prune_profiles(directory, current_app.config['PROFILE_MAX_FILES'])
+    return name
+
+
+def prune_profiles(directory, keep):
+    """Delete all but the newest `keep` profiles in `directory`."""
+    names = sorted((entry.name for entry in os.scandir(directory)
+                    if entry.is_file() and entry.name.endswith(PROFILE_SUFFIX)), reverse=True)
+    for name in names[keep:]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass  # Pruned by another worker
+
+
+def list_profiles(limit=50):
+    """Saved profiles, newest first."""
+    directory = current_app.config['PROFILE_DIR']
+    if not directory or not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(PROFILE_SUFFIX):
+            stat = entry.stat()
+            profiles.append({
+                'name': entry.name,
+                'size': stat.st_size,
+                'created_at': datetime.utcfromtimestamp(stat.st_mtime).isoformat()
+            })
+    profiles.sort(key=lambda profile: profile['name'], reverse=True)
+    return profiles[:limit]
+
+
+@click.command('profile-token')
+@with_appcontext
+def profile_token_command():
+    """Print a signed token for profiling requests with ?_profile=<token>."""
+    max_age = current_app.config['PROFILE_TOKEN_MAX_AGE']
+    click.echo(profile_serializer().dumps('profile'))
+    click.echo(f'Valid for {max_age} seconds', err=True)
@@ -0,0 +1,309 @@
+"""
+Bulk account provisioning from university rosters.
+
+A roster is CSV with a header row: `name` and `email` are required, `role`
+(student or donor, default student) and `password` are optional. Rows are
+processed in batches of PROVISION_BATCH_SIZE:
+
+- passwords are bcrypt-hashed on a process pool (PROVISION_WORKERS), since
+  hashing is what makes one-by-one registration slow;
+- rows without a password get an invite instead: a signed password reset
+  token valid for PROVISION_INVITE_DAYS, and an unusable password until it
+  is used;
+- each batch is one multi-row INSERT ... ON CONFLICT (email) DO NOTHING, so
+  an email that already exists (or appears twice in the roster) is reported
+  for its line without failing the batch (other databases skip existing
+  emails first and fall back to row-by-row inserts on a conflict);
+- invite emails for a batch go out over one SMTP connection. The HTTP
+  endpoint sends them on a background thread unless PROVISION_INVITES_ASYNC
+  is off; `flask provision-users` always sends them before it exits.
+
+Provisioned accounts are marked email-verified: the roster comes from the
+institution that owns the addresses.
+
+The process pool is for `flask provision-users` only. The HTTP endpoint hashes
+in the request's own process and takes at most PROVISION_HTTP_MAX_ROWS rows;
+larger rosters go through the CLI.
+"""
+
+import csv
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db, mail
+from models import User, issue_signed_token, token_fingerprint
+
+PROVISION_ROLES = ('student', 'donor')
+UPSERT_DIALECTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+HASH_CHUNK_SIZE = 64  # Passwords sent to a worker at a time
+NAME_MAX_LENGTH = User.name.type.length
+EMAIL_MAX_LENGTH = User.email.type.length
+
+
+class RosterTooLarge(ValueError):
+    pass
+
+
+def _hash_password(password, rounds):
+    # Runs in a pool worker; same hash format as Flask-Bcrypt
+    import bcrypt
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds, prefix=b'2b')).decode('utf-8')
+
+
+def read_roster(stream, max_rows=None):
+    """(line number, row dict) for each row of a CSV roster (text stream).
+
+    Raises RosterTooLarge past `max_rows` rows.
+    """
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames:
+        raise ValueError('Roster is empty')
+    fields = [name.strip().lower() for name in reader.fieldnames]
+    missing = [name for name in ('name', 'email') if name not in fields]
+    if missing:
+        raise ValueError(f'Roster is missing column: {missing[0]}')
+    reader.fieldnames = fields
+    for count, row in enumerate(reader, 1):
+        if max_rows is not None and count > max_rows:
+            raise RosterTooLarge(f'Roster has more than {max_rows} rows')
+        yield reader.line_num, {key: (value or '').strip() for key, value in row.items() if key}
+
+
+def _validate(row):
+    if not row.get('name') or not row.get('email'):
+        return 'Missing required fields'
+    if '@' not in row['email'] or len(row['email']) > EMAIL_MAX_LENGTH:
+        return 'Invalid email'
+    if len(row['name']) > NAME_MAX_LENGTH:
+        return 'Name is too long'
+    if (row.get('role') or 'student') not in PROVISION_ROLES:
+        return 'Invalid role'
+    return None
+
+
+class Provisioner:
+    """Creates users from roster rows; call `run()` once."""
+
+    def __init__(self, batch_size=None, workers=None, send_invites=True, background_invites=None):
+        config = current_app.config
+        self.batch_size = batch_size or config['PROVISION_BATCH_SIZE']
+        self.workers = workers or config['PROVISION_WORKERS']
+        self.send_invites = send_invites
+        if background_invites is None:
+            background_invites = config['PROVISION_INVITES_ASYNC']
+        self.background_invites = background_invites
+        self.rounds = config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.invite_ttl = timedelta(days=config['PROVISION_INVITE_DAYS'])
+        self.report = {'created': 0, 'invited': 0, 'errors': []}
+        self.seen = set()
+        self.pool = None
+        self.unusable_hash = None
+
+    def run(self, rows):
+        """Provision `rows` ((line, row dict) pairs); returns the report."""
+        if self.workers > 1:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            # Invited accounts share one hash of a secret nobody knows
+            self.unusable_hash = _hash_password(secrets.token_urlsafe(32), self.rounds)
+            batch = []
+            for line, row in rows:
+                batch.append((line, row))
+                if len(batch) >= self.batch_size:
+                    self._provision_batch(batch)
+                    batch = []
+            if batch:
+                self._provision_batch(batch)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+        self.report['errors'].sort(key=lambda error: error['line'])
+        return self.report
+
+    def _error(self, line, row, message):
+        self.report['errors'].append({'line': line, 'email': row.get('email') or None, 'error': message})
+
+    def _hash_all(self, passwords):
+        rounds = [self.rounds] * len(passwords)
+        if self.pool is None:
+            return list(map(_hash_password, passwords, rounds))
+        return list(self.pool.map(_hash_password, passwords, rounds, chunksize=HASH_CHUNK_SIZE))
+
+    def _provision_batch(self, batch):
+        accepted = []
+        for line, row in batch:
+            error = _validate(row)
+            if error is None and row['email'] in self.seen:
+                error = 'Duplicate email in roster'
+            if error:
+                self._error(line, row, error)
+                continue
+            self.seen.add(row['email'])
+            accepted.append((line, row))
+
+        # Emails already registered are reported without going to the pool
+        emails = [row['email'] for _, row in accepted]
+        existing = set(db.session.scalars(select(User.email).where(User.email.in_(emails)))) if emails else set()
+        for line, row in accepted:
+            if row['email'] in existing:
+                self._error(line, row, 'User already exists')
+        accepted = [(line, row) for line, row in accepted if row['email'] not in existing]
+        if not accepted:
+            return
+
+        with_password = [row for _, row in accepted if row.get('password')]
+        hashes = dict(zip((row['email'] for row in with_password),
+                          self._hash_all([row['password'] for row in with_password])))
+        now = datetime.utcnow()
+        values = [{
+            'name': row['name'], 'email': row['email'], 'role': row.get('role') or 'student',
+            'password_hash': hashes.get(row['email'], self.unusable_hash),
+            'created_at': now, 'email_verified': True
+        } for _, row in accepted]
+
+        created = self._insert(values)
+        for line, row in accepted:
+            if row['email'] not in created:
+                self._error(line, row, 'User already exists')  # Registered since the check above
+        self.report['created'] += len(created)
+
+        # Invites are signed reset tokens, which need the new ids
+        invites = [
+            (value['name'], value['email'], issue_signed_token(
+                'reset', created[value['email']],
+                token_fingerprint(value['password_hash'], value['email'], True), self.invite_ttl
+            ))
+            for value in values if value['email'] not in hashes and value['email'] in created
+        ]
+        self.report['invited'] += len(invites)
+        if invites and self.send_invites:
+            enqueue_invites(invites, self.background_invites)
+
+    def _insert(self, values):
+        """Insert the batch in one statement; returns {email: id} for the rows created."""
+        table = User.__table__
+        upsert = UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+        try:
+            if upsert is not None:
+                statement = upsert(table).values(values).on_conflict_do_nothing(
+                    index_elements=[table.c.email]
+                ).returning(table.c.email, table.c.id)
+                created = dict(db.session.execute(statement).all())
+            else:
+                created = self._insert_new(values)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return created
+
+    def _insert_new(self, values):
+        # Without ON CONFLICT: skip emails that exist, and if one was registered
+        # in the meantime, insert the chunk row by row
+        emails = [value['email'] for value in values]
+        existing = set(db.session.scalars(select(User.email).where(User.email.in_(emails))))
+        values = [value for value in values if value['email'] not in existing]
+        if not values:
+            return {}
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(User.__table__).values(values))
+        except IntegrityError:
+            inserted = []
+            for value in values:
+                try:
+                    with db.session.begin_nested():
+                        db.session.execute(insert(User.__table__).values(**value))
+                    inserted.append(value['email'])
+                except IntegrityError:
+                    continue
+        else:
+            inserted = [value['email'] for value in values]
+        if not inserted:
+            return {}
+        return dict(db.session.execute(select(User.email, User.id).where(User.email.in_(inserted))).all())
+
+
+def provision_users(rows, batch_size=None, workers=None, send_invites=True, background_invites=None):
+    """Create accounts for roster rows; returns {created, invited, errors}."""
+    return Provisioner(batch_size, workers, send_invites, background_invites).run(rows)
+
+
+def invite_message(name, email, token):
+    from flask_mail import Message
+    message = Message('Your Scholarship Portal account',
+                      sender='noreply@scholarshipportal.com',
+                      recipients=[email])
+    message.body = f'''Welcome to the Scholarship Portal, {name}!
+
+Your institution has created an account for you. Choose a password here:
+http://localhost:3000/reset-password/{token}
+
+This link will expire in {current_app.config['PROVISION_INVITE_DAYS']} days.
+'''
+    return message
+
+
+def send_invites(invites):
+    """Send (name, email, token) invites over one SMTP connection."""
+    sent = 0
+    with mail.connect() as connection:
+        for name, email, token in invites:
+            try:
+                connection.send(invite_message(name, email, token))
+                sent += 1
+            except Exception:
+                current_app.logger.exception('Invite email to %s failed', email)
+    return sent
+
+
+def enqueue_invites(invites, background=None):
+    """Send invites on a daemon thread, or inline when `background` is false.
+
+    `background` defaults to PROVISION_INVITES_ASYNC. Callers that exit right
+    after provisioning (the CLI) must send inline, or the thread dies unsent.
+    """
+    if background is None:
+        background = current_app.config['PROVISION_INVITES_ASYNC']
+    if not background:
+        return send_invites(invites)
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                send_invites(invites)
+            except Exception:
+                app.logger.exception('Sending %d invite emails failed', len(invites))
+
+    threading.Thread(target=run, name='invite-mailer', daemon=True).start()
+    return None
+
+
+@click.command('provision-users')
+@click.argument('roster', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--batch-size', type=int, default=None, help='Rows per INSERT.')
+@click.option('--workers', type=int, default=None, help='Password hashing processes.')
+@click.option('--invites/--no-invites', default=True, help='Email invites to rows without a password.')
+@with_appcontext
+def provision_users_command(roster, batch_size, workers, invites):
+    """Create accounts from a CSV roster (name,email[,role][,password])."""
+    try:
+        # Inline sends: a background mailer would die with this process
+        report = provision_users(read_roster(roster), batch_size, workers, invites, background_invites=False)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for error in report['errors']:
+        click.echo(f"line {error['line']}: {error['email'] or '-'}: {error['error']}", err=True)
+    click.echo(f"Created {report['created']} accounts ({report['invited']} invited), "
+               f"{len(report['errors'])} rows rejected")
+
@@ -0,0 +1,250 @@
+"""
+Rate limiting.
+
+Limits are enforced with a sliding-window counter: each (route, identity)
+pair keeps one counter per fixed window and the previous window's count is
+weighted by how much of it still overlaps the sliding window. That costs two
+small keys per identity regardless of traffic, and one pipelined round trip
+per request.
+
+Counters live in Redis when RATELIMIT_STORAGE_URL points at it, so limits are
+shared by every worker and host. `MemoryStorage` implements the same
+operations in-process; it is used for tests, for `memory://`, and as the
+fallback while Redis is unreachable.
+"""
+
+import inspect
+import logging
+import re
+import threading
+import time
+
+from flask import current_app, g, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+_LIMIT_RE = re.compile(r'^\s*(\d+)\s*(?:/|per)\s*(second|minute|hour|day)s?\s*$')
+
+
+def parse_limit(limit):
+    """Parse '5/hour' or '10 per minute' into (amount, window_seconds)."""
+    match = _LIMIT_RE.match(limit)
+    if not match:
+        raise ValueError(f'Invalid rate limit: {limit!r}')
+    return int(match.group(1)), _PERIODS[match.group(2)]
+
+
+class MemoryStorage:
+    """In-process counter storage with the same semantics as RedisStorage."""
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def hit(self, current_key, previous_key, expiry):
+        """Increment `current_key` and return (current, previous) counts."""
+        now = time.monotonic()
+        with self._lock:
+            count, expires_at = self._counters.get(current_key, (0, 0))
+            if expires_at <= now:
+                count = 0
+            self._counters[current_key] = (count + 1, now + expiry)
+            previous, previous_expires = self._counters.get(previous_key, (0, 0))
+            if previous_expires <= now:
+                previous = 0
+            if len(self._counters) > 10000:
+                self._purge(now)
+        return count + 1, previous
+
+    def undo(self, key):
+        with self._lock:
+            if key in self._counters:
+                count, expires_at = self._counters[key]
+                self._counters[key] = (max(count - 1, 0), expires_at)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+    def _purge(self, now):
+        for key in [k for k, (_, expires_at) in self._counters.items() if expires_at <= now]:
+            del self._counters[key]
+
+
+class RedisStorage:
+    """Counter storage shared through Redis (or any server speaking its protocol).
+
+    INCR, EXPIRE and GET are sent as one MULTI/EXEC pipeline so the increment
+    and the read of the previous window are atomic and cost a single round
+    trip. If Redis is unreachable the limiter keeps working per-process on a
+    MemoryStorage fallback rather than failing requests.
+    """
+
+    def __init__(self, url, fallback=None):
+        import redis
+        self._redis = redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.fallback = fallback or MemoryStorage()
+        self.degraded = False
+
+    def hit(self, current_key, previous_key, expiry):
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            pipe.incr(current_key)
+            pipe.expire(current_key, expiry)
+            pipe.get(previous_key)
+            current, _, previous = pipe.execute()
+        except self._redis.RedisError as e:
+            # Once per outage, not once per request
+            if not self.degraded:
+                self.degraded = True
+                logger.warning('Rate limit storage unavailable, using per-process in-memory fallback: %s', e)
+            return self.fallback.hit(current_key, previous_key, expiry)
+        if self.degraded:
+            self.degraded = False
+            logger.warning('Rate limit storage reachable again')
+        return int(current), int(previous or 0)
+
+    def undo(self, key):
+        try:
+            self.client.decr(key)
+        except self._redis.RedisError:
+            self.fallback.undo(key)
+
+    def reset(self):
+        self.fallback.reset()
+
+
+def storage_from_url(url):
+    if not url or url.startswith('memory://'):
+        return MemoryStorage()
+    try:
+        return RedisStorage(url)
+    except ImportError:
+        logger.warning('RATELIMIT_STORAGE_URL is set but the redis package is not installed; '
+                       'rate limits are per process')
+        return MemoryStorage()
+
+
+class RateLimiter:
+    """Flask extension applying per-route, per-identity rate limits.
+
+    Limits are attached to view functions with `limiter.limit('5/hour')`,
+    either as a decorator or by calling it on an already registered view.
+    """
+
+    def __init__(self, app=None):
+        self.storage = None
+        self._route_limits = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_STORAGE_URL', 'memory://')
+        app.config.setdefault('RATELIMIT_KEY_PREFIX', 'ratelimit')
+        app.config.setdefault('RATELIMIT_HEADERS_ENABLED', True)
+        self.storage = storage_from_url(app.config['RATELIMIT_STORAGE_URL'])
+        app.extensions['ratelimiter'] = self
+        app.before_request(self._check_request_limit)
+        app.after_request(self._inject_headers)
+
+    def limit(self, limit, methods=None, key_func=None):
+        """Attach `limit` (e.g. '5/hour') to a view function."""
+        amount, window = parse_limit(limit)
+        methods = {m.upper() for m in methods} if methods else None
+
+        def decorator(view):
+            limits = self._route_limits.setdefault(inspect.unwrap(view), [])
+            if (amount, window, methods, key_func) not in limits:
+                limits.append((amount, window, methods, key_func))
+            return view
+        return decorator
+
+    def exempt(self, view):
+        """Drop any limits attached to `view`."""
+        self._route_limits.pop(inspect.unwrap(view), None)
+        return view
+
+    def hit(self, scope, identity, amount, window):
+        """Count one request against `scope`/`identity`.
+
+        Returns (allowed, remaining, reset_seconds).
+        """
+        now = time.time()
+        window_start = int(now // window) * window
+        prefix = current_app.config['RATELIMIT_KEY_PREFIX']
+        current_key = f'{prefix}:{scope}:{identity}:{window_start}'
+        previous_key = f'{prefix}:{scope}:{identity}:{window_start - window}'
+
+        current, previous = self.storage.hit(current_key, previous_key, window * 2)
+        overlap = 1 - (now - window_start) / window
+        estimated = previous * overlap + current
+        reset = int(window_start + window - now) + 1
+
+        if estimated > amount:
+            # Rejected requests don't consume quota
+            self.storage.undo(current_key)
+            return False, 0, reset
+        return True, max(int(amount - estimated), 0), reset
+
+    def limits_for(self, app, endpoint):
+        """The limits attached to `endpoint`'s view, if any."""
+        view = app.view_functions.get(endpoint)
+        return self._route_limits.get(inspect.unwrap(view)) if view else None
+
+    def check_request(self):
+        """Apply the current request's limits outside Flask's dispatch (see asgi.py).
+
+        Returns the 429 response or None, and the rate limit headers.
+        """
+        rejected = self._check_request_limit()
+        response = self._inject_headers(rejected or current_app.response_class())
+        headers = [(name, value) for name, value in response.headers.items()
+                   if name.startswith('RateLimit-') or name == 'Retry-After']
+        return rejected, headers
+
+    def _check_request_limit(self):
+        if not current_app.config['RATELIMIT_ENABLED'] or request.endpoint is None:
+            return None
+        limits = self.limits_for(current_app, request.endpoint)
+        if not limits:
+            return None
+
+        for amount, window, methods, key_func in limits:
+            if methods and request.method not in methods:
+                continue
+            identity = key_func() if key_func else request_identity()
+            allowed, remaining, reset = self.hit(request.endpoint, identity, amount, window)
+            # Report the tightest limit that applied to this request
+            if 'ratelimit' not in g or remaining < g.ratelimit[1]:
+                g.ratelimit = (amount, remaining, reset)
+            if not allowed:
+                response = jsonify({'error': 'Rate limit exceeded. Please try again later.'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(reset)
+                return response
+        return None
+
+    def _inject_headers(self, response):
+        if current_app.config['RATELIMIT_HEADERS_ENABLED'] and 'ratelimit' in g:
+            amount, remaining, reset = g.ratelimit
+            response.headers['RateLimit-Limit'] = str(amount)
+            response.headers['RateLimit-Remaining'] = str(remaining)
+            response.headers['RateLimit-Reset'] = str(reset)
+        return response
+
+
+def request_identity():
+    """Key requests by JWT identity when present, otherwise by client address."""
+    from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+    try:
+        verify_jwt_in_request(optional=True)
+        user_id = get_jwt_identity()
+    except Exception:
+        user_id = None
+    if user_id is not None:
+        return f'user:{user_id}'
+    return f'ip:{request.remote_addr}'
+
@@ -0,0 +1,211 @@
+"""
+JWT revocation (logout and refresh token rotation).
+
+Revoked token ids (`jti`) are kept in the `revoked_token` table until the
+token would have expired anyway. Each worker holds a Bloom filter of them in
+memory, so checking a token that was never revoked - nearly every request -
+costs a few hash computations and no I/O. Only a filter hit (a revoked
+token, or a false positive at about REVOCATION_FILTER_ERROR_RATE) is
+confirmed against the table.
+
+Workers stay in sync through a generation number in the shared cache,
+bumped on every revocation. Each worker re-reads it at most every
+REVOCATION_SYNC_INTERVAL seconds and, when it moved, adds the tokens revoked
+since its last sync to the filter it already has. Filters are only rebuilt
+from the whole table when they fill up or after `purge-revoked-tokens`.
+The revoking worker adds the token to its own filter at once; the others
+honour the revocation within REVOCATION_SYNC_INTERVAL.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from extensions import cache, db
+from models import RevokedToken
+
+REVOCATION_GENERATION_KEY = 'revocation_generation'  # Bumped by every revocation
+REVOCATION_EPOCH_KEY = 'revocation_epoch'  # Bumped when revocations are purged
+SYNC_OVERLAP = timedelta(seconds=30)
+UPSERT_DIALECTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+class BloomFilter:
+    """Set membership with false positives but never false negatives."""
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def revocation_generation():
+    generation = cache.get(REVOCATION_GENERATION_KEY)
+    if generation is None:
+        generation = bump_revocation_generation()
+    return generation
+
+
+def bump_revocation_generation():
+    generation = time.time_ns()
+    cache.set(REVOCATION_GENERATION_KEY, generation, timeout=0)
+    return generation
+
+
+def revocation_epoch():
+    epoch = cache.get(REVOCATION_EPOCH_KEY)
+    if epoch is None:
+        epoch = bump_revocation_epoch()
+    return epoch
+
+
+def bump_revocation_epoch():
+    """Make every worker rebuild its filter (after rows were deleted)."""
+    epoch = time.time_ns()
+    cache.set(REVOCATION_EPOCH_KEY, epoch, timeout=0)
+    return epoch
+
+
+class RevocationList:
+    """One app's in-memory view of the denylist."""
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.filter = None
+        self.capacity = 0
+        self.generation = None
+        self.epoch = None
+        self.synced_at = None
+        self.checked_at = 0.0
+        self.stats = {'checks': 0, 'filter_hits': 0, 'revoked': 0, 'rebuilds': 0, 'syncs': 0}
+
+    def _rebuild(self):
+        self.synced_at = datetime.utcnow()
+        jtis = db.session.scalars(
+            select(RevokedToken.jti).where(RevokedToken.expires_at > self.synced_at)
+        ).all()
+        config = self.app.config
+        # Room to grow through incremental syncs until the next rebuild
+        self.capacity = max(len(jtis) * 2, config['REVOCATION_FILTER_CAPACITY'])
+        bloom = BloomFilter(self.capacity, config['REVOCATION_FILTER_ERROR_RATE'])
+        for jti in jtis:
+            bloom.add(jti)
+        self.filter = bloom
+        self.stats['rebuilds'] += 1
+
+    def _sync_recent(self):
+        """Add revocations made since the last sync to the existing filter."""
+        since = self.synced_at - SYNC_OVERLAP  # Tolerate clock skew between workers
+        self.synced_at = datetime.utcnow()
+        jtis = db.session.scalars(select(RevokedToken.jti).where(RevokedToken.revoked_at >= since)).all()
+        for jti in jtis:
+            if jti not in self.filter:
+                self.filter.add(jti)
+        self.stats['syncs'] += 1
+
+    def sync(self):
+        now = time.monotonic()
+        if self.filter is not None and now - self.checked_at < self.app.config['REVOCATION_SYNC_INTERVAL']:
+            return
+        generation, epoch = revocation_generation(), revocation_epoch()
+        self.checked_at = now
+        if self.filter is not None and generation == self.generation and epoch == self.epoch:
+            return
+        with self.lock:
+            if self.filter is None or epoch != self.epoch or self.filter.count >= self.capacity:
+                self._rebuild()
+            elif generation != self.generation:
+                self._sync_recent()
+            self.generation, self.epoch = generation, epoch
+
+    def is_revoked(self, jti):
+        self.sync()
+        self.stats['checks'] += 1
+        if jti not in self.filter:
+            return False
+        self.stats['filter_hits'] += 1
+        revoked = db.session.get(RevokedToken, jti) is not None
+        if revoked:
+            self.stats['revoked'] += 1
+        return revoked
+
+    def add(self, jti):
+        self.sync()
+        with self.lock:
+            self.filter.add(jti)
+
+
+def revocation_list(app=None):
+    app = app or current_app._get_current_object()
+    revocations = app.extensions.get('revocation')
+    if revocations is None:
+        revocations = app.extensions.setdefault('revocation', RevocationList(app))
+    return revocations
+
+
+def is_token_revoked(jti):
+    """True for a revoked token id; no I/O unless the Bloom filter matches."""
+    return revocation_list().is_revoked(jti)
+
+
+def revoke_token(jwt_payload):
+    """Deny a decoded token (access or refresh) for the rest of its lifetime."""
+    jti = jwt_payload['jti']
+    values = {
+        'jti': jti,
+        'token_type': jwt_payload.get('type', 'access'),
+        'user_id': int(jwt_payload['sub']),
+        'revoked_at': datetime.utcnow(),
+        'expires_at': datetime.utcfromtimestamp(jwt_payload['exp'])
+    }
+    # Concurrent revocations of one token (e.g. a refresh sent twice) are fine
+    upsert = UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    try:
+        if upsert is not None:
+            db.session.execute(upsert(RevokedToken).values(**values).on_conflict_do_nothing(index_elements=['jti']))
+        else:
+            db.session.execute(insert(RevokedToken).values(**values))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+    revocation_list().add(jti)
+    bump_revocation_generation()
+
+
+@click.command('purge-revoked-tokens')
+@with_appcontext
+def purge_revoked_tokens_command():
+    """Delete revocations of tokens that have expired anyway."""
+    result = db.session.execute(
+        delete(RevokedToken).where(RevokedToken.expires_at <= datetime.utcnow())
+    )
+    db.session.commit()
+    bump_revocation_epoch()
+    click.echo(f'Deleted {result.rowcount} expired token revocations')
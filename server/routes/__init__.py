@@ -5,5 +5,6 @@ from .applications import applications_bp
 from .profile import profile_bp
 from .search import search_bp
 from .admin import admin_bp
+from .attachments import attachments_bp
 
-__all__ = ['main_bp', 'auth_bp', 'scholarships_bp', 'applications_bp', 'profile_bp', 'search_bp', 'admin_bp']
\ No newline at end of file
+__all__ = ['main_bp', 'auth_bp', 'scholarships_bp', 'applications_bp', 'profile_bp', 'search_bp', 'admin_bp', 'attachments_bp']
\ No newline at end of file
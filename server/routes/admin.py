@@ -1,18 +1,38 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, current_app, send_from_directory, stream_with_context
 from flask_login import login_required, current_user
-from extensions import db
-from models import User, Scholarship, Application
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from extensions import db, cache
+from models import User, Scholarship, Application, ArchivedApplication
+from archive import include_archived_requested
+from cache_utils import bump_catalog_generation, invalidate_user_applications
+from sqlalchemy import and_, func, or_, select, tuple_, union_all
+from export import csv_stream, xlsx_stream
+from analytics import daily_application_counts, recent_application_count
+from pagination import count_requested, cursor_metadata, decode_cursor, encode_cursor, paginate
+from slow_queries import SORT_KEYS, top_slow_queries
+from profiler import PROFILE_SUFFIX, list_profiles
+from warmup import warm_after_invalidation
+from provisioning import RosterTooLarge, provision_users, read_roster
+from datetime import date, datetime, timedelta
+import io
 
 admin_bp = Blueprint('admin', __name__)
 
+ADMIN_STATS_TIMEOUT = 60  # Dashboard numbers may lag by up to a minute
+
 @admin_bp.route('/stats', methods=['GET'])
 @login_required
 def get_stats():
     """Get admin dashboard statistics"""
     if current_user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
+    return jsonify(dashboard_stats(include_archived_requested()))
+
+def dashboard_stats(include_archived=False, refresh=False):
+    """The get_stats() payload, cached for ADMIN_STATS_TIMEOUT seconds."""
+    key = f'admin_stats_{int(include_archived)}'
+    stats = None if refresh else cache.get(key)
+    if stats is not None:
+        return stats
 
     # Get counts
     total_users = User.query.count()
@@ -20,11 +40,8 @@ def get_stats():
     active_scholarships = Scholarship.query.filter_by(is_active=True).count()
     total_applications = Application.query.count()
 
-    # Get recent applications (last 30 days)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    recent_applications = Application.query.filter(
-        Application.submission_date >= thirty_days_ago
-    ).count()
+    # Get recent applications (last 30 days) from the daily rollup
+    recent_applications = recent_application_count(30)
 
     # Get applications by status
     status_counts = db.session.query(
@@ -34,43 +51,296 @@ def get_stats():
 
     status_dict = {status: count for status, count in status_counts}
 
-    return jsonify({
+    stats = {
         'total_users': total_users,
         'total_scholarships': total_scholarships,
         'active_scholarships': active_scholarships,
         'total_applications': total_applications,
         'recent_applications': recent_applications,
         'applications_by_status': status_dict
-    })
+    }
+
+    # Archived applications are only counted when explicitly requested
+    if include_archived:
+        archived_counts = db.session.query(
+            ArchivedApplication.status,
+            func.count(ArchivedApplication.id)
+        ).group_by(ArchivedApplication.status).all()
+        archived_total = 0
+        for status, count in archived_counts:
+            status_dict[status] = status_dict.get(status, 0) + count
+            archived_total += count
+        stats['total_applications'] = total_applications + archived_total
+        stats['archived_applications'] = archived_total
+
+    cache.set(key, stats, timeout=ADMIN_STATS_TIMEOUT)
+    return stats
 
 @admin_bp.route('/users', methods=['GET'])
 @login_required
 def get_users():
-    """Get all users (admin only)"""
+    """Search users (admin only)
+
+    Filters: q (email prefix or name substring), role, email_verified,
+    created_after / created_before (ISO dates). Newest first, paged with
+    `page` and the usual pagination block (count=false skips the total;
+    has_next still says whether there is another page). Passing `cursor` (empty for the first page)
+    switches to keyset paging instead: no total, no OFFSET scan, and the
+    returned `next_cursor` is the next page's `cursor`.
+    """
     if current_user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
 
-    page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
-    role_filter = request.args.get('role')
+    if per_page is None or per_page < 1 or per_page > 100:
+        per_page = 20
+    statement, error = user_search_statement(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    # Accounts without created_at (legacy rows) sort first, as a backward
+    # scan of ix_user_created_at_id returns them on Postgres
+    order = (User.created_at.desc().nulls_first(), User.id.desc())
+
+    if 'cursor' not in request.args:
+        page = max(request.args.get('page', 1, type=int) or 1, 1)
+        users, pagination = paginate(statement.order_by(*order), page, per_page, count_requested(request.args))
+        pagination['pages'] = pagination['total_pages']  # Name used before paginate()
+        return jsonify({
+            'users': [user.to_dict() for user in users],
+            'pagination': pagination
+        })
+
+    cursor = request.args['cursor']
+    if cursor:
+        try:
+            created_at, user_id = decode_cursor(cursor, 2)
+            created_at = datetime.fromisoformat(created_at) if created_at is not None else None
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        if created_at is None:
+            statement = statement.where(or_(
+                and_(User.created_at.is_(None), User.id < user_id), User.created_at.isnot(None)
+            ))
+        else:
+            # Row-value comparison walks ix_user_created_at_id from the cursor
+            statement = statement.where(tuple_(User.created_at, User.id) < tuple_(created_at, user_id))
+
+    users = db.session.scalars(statement.order_by(*order).limit(per_page + 1)).all()
+    next_cursor = None
+    if len(users) > per_page:
+        users = users[:per_page]
+        last = users[-1]
+        next_cursor = encode_cursor(last.created_at.isoformat() if last.created_at else None, last.id)
+
+    return jsonify({
+        'users': [user.to_dict() for user in users],
+        'pagination': cursor_metadata(per_page, next_cursor)
+    })
+
+@admin_bp.route('/users/provision', methods=['POST'])
+@login_required
+def provision_roster():
+    """Create accounts from a CSV roster (admin only)
+
+    Send the CSV as the request body or as a `roster` file field. Columns:
+    name, email, optional role and password; rows without a password get an
+    invite email. Rejected rows are listed with their line number. Rosters
+    over PROVISION_HTTP_MAX_ROWS rows are refused; use `flask provision-users`.
+    """
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
 
-    users_query = User.query
+    upload = request.files.get('roster')
+    stream = io.TextIOWrapper(upload.stream if upload else request.stream, encoding='utf-8-sig', newline='')
+    send_invites = request.args.get('invites', 'true').lower() not in ('false', '0', 'no')
+    max_rows = current_app.config['PROVISION_HTTP_MAX_ROWS']
+    try:
+        # Read the whole roster first, so an oversized one creates nothing;
+        # hashing stays in this worker (no process pool per request)
+        rows = list(read_roster(stream, max_rows))
+        report = provision_users(rows, workers=1, send_invites=send_invites)
+    except RosterTooLarge as e:
+        return jsonify({'error': f'{e}; use the provision-users command'}), 413
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'Invalid roster: {e}'}), 400
+    return jsonify(report)
+
+def user_search_statement(args):
+    """Build the get_users() select from request args; returns (statement, error)."""
+    statement = select(User)
 
+    query = args.get('q', '').strip().lower()
+    if query:
+        pattern = _escape_like(query)
+        # lower(email) LIKE 'q%' uses ix_user_email_lower; the name match uses
+        # the trigram index on Postgres
+        statement = statement.where(or_(
+            func.lower(User.email).like(f'{pattern}%', escape='\\'),
+            User.name.ilike(f'%{pattern}%', escape='\\')
+        ))
+
+    role_filter = args.get('role')
     if role_filter:
-        users_query = users_query.filter_by(role=role_filter)
+        statement = statement.where(User.role == role_filter)
+
+    email_verified = args.get('email_verified')
+    if email_verified:
+        statement = statement.where(User.email_verified == (email_verified.lower() in ('1', 'true', 'yes')))
 
-    users = users_query.order_by(User.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
+    for name, compare in (('created_after', User.created_at.__ge__), ('created_before', User.created_at.__le__)):
+        value = args.get(name)
+        if value:
+            try:
+                statement = statement.where(compare(datetime.fromisoformat(value)))
+            except ValueError:
+                return None, f'Invalid {name} format. Use ISO format.'
+
+    return statement, None
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+ANALYTICS_DEFAULT_DAYS = 30
+ANALYTICS_MAX_DAYS = 366
+
+@admin_bp.route('/analytics/applications', methods=['GET'])
+@login_required
+def application_analytics():
+    """Applications per day (admin only)
+
+    `start` / `end` are ISO dates (default: the last 30 days); `group_by` is
+    status (default) or scholarship; `scholarship_id` narrows to one.
+    """
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else datetime.utcnow().date()
+        start = (date.fromisoformat(request.args['start']) if request.args.get('start')
+                 else end - timedelta(days=ANALYTICS_DEFAULT_DAYS - 1))
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD.'}), 400
+    if start > end or (end - start).days >= ANALYTICS_MAX_DAYS:
+        return jsonify({'error': f'Range must be between 1 and {ANALYTICS_MAX_DAYS} days'}), 400
+    group_by = request.args.get('group_by', 'status')
+    if group_by not in ('status', 'scholarship'):
+        return jsonify({'error': 'group_by must be status or scholarship'}), 400
 
     return jsonify({
-        'users': [user.to_dict() for user in users.items],
-        'pagination': {
-            'page': users.page,
-            'per_page': users.per_page,
-            'total': users.total,
-            'pages': users.pages
-        }
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'series': daily_application_counts(start, end, group_by, request.args.get('scholarship_id', type=int))
+    })
+
+SLOW_QUERY_MAX_LIMIT = 100
+
+@admin_bp.route('/slow-queries', methods=['GET'])
+@login_required
+def slow_query_report():
+    """Slowest query fingerprints with endpoints and plans (admin only)
+
+    `sort` is total (default), max, avg or calls; `limit` defaults to 20.
+    """
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+
+    sort = request.args.get('sort', 'total')
+    if sort not in SORT_KEYS:
+        return jsonify({'error': f"sort must be one of {', '.join(SORT_KEYS)}"}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), SLOW_QUERY_MAX_LIMIT)
+    return jsonify({'queries': top_slow_queries(limit, sort)})
+
+@admin_bp.route('/cache-stats', methods=['GET'])
+@login_required
+def cache_stats():
+    """Hit counts per cache tier for this worker (admin only)"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    backend = cache.cache
+    stats = getattr(backend, 'stats', None)
+    return jsonify({'backend': type(backend).__name__, 'tiers': stats() if stats else None})
+
+@admin_bp.route('/profiles', methods=['GET'])
+@login_required
+def get_profiles():
+    """Request profiles captured with X-Profile, newest first (admin only)"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    return jsonify({'profiles': list_profiles()})
+
+@admin_bp.route('/profiles/<name>', methods=['GET'])
+@login_required
+def get_profile(name):
+    """One profile as folded stacks, ready for flamegraph.pl or speedscope (admin only)"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    if not name.endswith(PROFILE_SUFFIX) or not current_app.config.get('PROFILE_DIR'):
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_from_directory(current_app.config['PROFILE_DIR'], name, mimetype='text/plain')
+
+EXPORT_COLUMNS = ['application_id', 'status', 'submission_date', 'reviewed_at',
+                  'scholarship_id', 'scholarship_title', 'student_id', 'student_name', 'student_email']
+EXPORT_BATCH_SIZE = 1000
+
+@admin_bp.route('/applications/export', methods=['GET'])
+@login_required
+def export_applications():
+    """Stream applications as CSV (default) or XLSX (`format=xlsx`)
+
+    Admins export everything; donors export applications to their own
+    scholarships. Filters: status, scholarship_id, include_archived.
+    """
+    if current_user.role not in ('admin', 'donor'):
+        return jsonify({'error': 'Admin or donor access required'}), 403
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'xlsx'):
+        return jsonify({'error': 'format must be csv or xlsx'}), 400
+
+    status = request.args.get('status')
+    scholarship_id = request.args.get('scholarship_id', type=int)
+    donor_id = current_user.id if current_user.role == 'donor' else None
+
+    def build_query(model):
+        # One query joins scholarship title and applicant, no per-row lookups
+        query = select(
+            model.id.label('application_id'), model.status, model.submission_date, model.reviewed_at,
+            model.scholarship_id, Scholarship.title.label('scholarship_title'),
+            model.student_id, User.name.label('student_name'), User.email.label('student_email')
+        ).join(Scholarship, Scholarship.id == model.scholarship_id).join(User, User.id == model.student_id)
+        if status:
+            query = query.where(model.status == status)
+        if scholarship_id:
+            query = query.where(model.scholarship_id == scholarship_id)
+        if donor_id is not None:
+            query = query.where(Scholarship.created_by == donor_id)
+        return query
+
+    if include_archived_requested():
+        rows = select(union_all(build_query(Application), build_query(ArchivedApplication)).subquery())
+        statement = rows.order_by(rows.selected_columns.application_id)
+    else:
+        statement = build_query(Application).order_by(Application.id)
+
+    def generate_rows():
+        # yield_per streams from a server-side cursor in fixed-size batches
+        result = db.session.execute(statement, execution_options={'yield_per': EXPORT_BATCH_SIZE})
+        try:
+            for row in result:
+                yield tuple(row)
+        finally:
+            result.close()
+
+    filename = f"applications-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    if export_format == 'xlsx':
+        body = xlsx_stream(EXPORT_COLUMNS, generate_rows(), sheet_name='Applications')
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        body = csv_stream(EXPORT_COLUMNS, generate_rows())
+        mimetype = 'text/csv'
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no'  # Let nginx pass chunks through as they are produced
     })
 
 @admin_bp.route('/applications/<int:id>/review', methods=['POST'])
@@ -96,9 +366,11 @@ def review_application(id):
 
     try:
         db.session.commit()
+        invalidate_user_applications(application.student_id)
         return jsonify({
             'message': 'Application reviewed successfully',
-            'application': application.to_dict()
+            # No essay: loading it would decompress the deferred column
+            'application': application.to_dict(include_essay=False)
         })
     except Exception as e:
         db.session.rollback()
@@ -116,6 +388,8 @@ def toggle_scholarship_status(id):
 
     try:
         db.session.commit()
+        bump_catalog_generation()
+        warm_after_invalidation()
         status = 'activated' if scholarship.is_active else 'deactivated'
         return jsonify({
             'message': f'Scholarship {status} successfully',
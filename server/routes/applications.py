@@ -2,12 +2,43 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from extensions import db, cache
-from models import Application, Scholarship, User
+from idempotency import idempotent
+from models import Application, ArchivedApplication, Scholarship, User
+from archive import application_columns, application_rows, include_archived_requested
+from sqlalchemy import select
+from sqlalchemy.orm import undefer
+from pagination import count_requested, paginate
+from cache_utils import (USER_APPLICATIONS_CACHED_PAGES, get_cached_user_applications,
+                         invalidate_user_applications, set_cached_user_applications)
 
 applications_bp = Blueprint('applications', __name__)
 
+def application_list_item(app):
+    return {
+        'id': app.id,
+        'scholarship_id': app.scholarship_id,
+        'status': app.status,
+        'submission_date': app.submission_date.isoformat() if app.submission_date else None,
+        'reviewed_at': app.reviewed_at.isoformat() if app.reviewed_at else None,
+        'reviewed_by': app.reviewed_by,
+        'notes': app.notes,
+        'archived': bool(getattr(app, 'archived', False))
+    }
+
+def application_detail(application):
+    return {
+        'id': application.id,
+        'scholarship_id': application.scholarship_id,
+        'submission_date': application.submission_date.isoformat() if application.submission_date else None,
+        'status': application.status,
+        'essay': application.essay,
+        'reviewed_at': application.reviewed_at.isoformat() if application.reviewed_at else None,
+        'notes': application.notes
+    }
+
 @applications_bp.route('/', methods=['POST'])
 @login_required
+@idempotent()
 def submit_application():
     data = request.get_json()
     scholarship = Scholarship.query.get_or_404(data['scholarship_id'])
@@ -20,7 +51,7 @@ def submit_application():
     db.session.add(application)
     db.session.commit()
     # Clear user's application cache after submission
-    cache.delete(f'user_applications_{current_user.id}')
+    invalidate_user_applications(current_user.id)
     return jsonify({'message': 'Application submitted successfully'}), 201
 
 @applications_bp.route('/my-applications', methods=['GET'], strict_slashes=False)
@@ -39,37 +70,33 @@ def get_user_applications():
         if per_page < 1 or per_page > 50:
             per_page = 10
         
-        # Get total count for pagination metadata
-        total_applications = db.session.query(Application).filter_by(student_id=int(user_id)).count()
-        
-        # Apply pagination to query
-        applications_query = db.session.query(Application).filter_by(student_id=int(user_id)).order_by(Application.submission_date.desc())
-        applications = applications_query.offset((page - 1) * per_page).limit(per_page).all()
-        
-        # Calculate pagination metadata
-        total_pages = (total_applications + per_page - 1) // per_page
-        
+        # The first few pages of the plain (non-archive) list are served from cache
+        include_archived = include_archived_requested()
+        with_total = count_requested(request.args)
+        cacheable = with_total and not include_archived and page <= USER_APPLICATIONS_CACHED_PAGES
+        if cacheable:
+            cache_key, cached = get_cached_user_applications(user_id, page, per_page)
+            if cached is not None:
+                return jsonify(cached)
+
+        if include_archived:
+            # Union the hot and archive tables only when explicitly asked
+            rows = application_rows(
+                lambda model: application_columns(model).where(model.student_id == int(user_id))
+            )
+            statement = select(rows).order_by(rows.c.submission_date.desc())
+        else:
+            statement = select(Application).filter_by(student_id=int(user_id)).order_by(Application.submission_date.desc())
+        # The page and its total come back in one query
+        applications, pagination = paginate(statement, page, per_page, with_total, 'total_applications')
+
         result = {
-            'applications': [{
-                'id': app.id,
-                'scholarship_id': app.scholarship_id,
-                'status': app.status,
-                'submission_date': app.submission_date.isoformat() if app.submission_date else None,
-                'reviewed_at': app.reviewed_at.isoformat() if app.reviewed_at else None,
-                'reviewed_by': app.reviewed_by,
-                'notes': app.notes
-            } for app in applications],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total_applications': total_applications,
-                'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1,
-                'next_page': page + 1 if page < total_pages else None,
-                'prev_page': page - 1 if page > 1 else None
-            }
+            'applications': [application_list_item(app) for app in applications],
+            'pagination': pagination
         }
+
+        if cacheable:
+            set_cached_user_applications(cache_key, result)
         
         return jsonify(result)
     except Exception as e:
@@ -79,7 +106,10 @@ def get_user_applications():
 @jwt_required()
 def get_application(id):
     user_id = get_jwt_identity()
-    application = db.session.query(Application).get(id)
+    # The essay is deferred everywhere else; load it with the row here
+    application = db.session.query(Application).options(undefer(Application.essay)).get(id)
+    if not application and include_archived_requested():
+        application = db.session.query(ArchivedApplication).options(undefer(ArchivedApplication.essay)).get(id)
     if not application:
         return jsonify({'error': 'Application not found'}), 404
         
@@ -88,18 +118,11 @@ def get_application(id):
     if application.student_id != int(user_id) and user.role != 'admin':
         return jsonify({'error': 'Unauthorized'}), 403
         
-    return jsonify({
-        'id': application.id,
-        'scholarship_id': application.scholarship_id,
-        'submission_date': application.submission_date.isoformat() if application.submission_date else None,
-        'status': application.status,
-        'essay': application.essay,
-        'reviewed_at': application.reviewed_at.isoformat() if application.reviewed_at else None,
-        'notes': application.notes
-    })
+    return jsonify(application_detail(application))
 
 @applications_bp.route('/apply', methods=['POST'])
 @jwt_required()
+@idempotent()
 def apply_for_scholarship():
     """Creates a new application for a scholarship."""
     data = request.get_json()
@@ -135,6 +158,7 @@ def apply_for_scholarship():
     try:
         db.session.add(new_application)
         db.session.commit()
+        invalidate_user_applications(student_id)
         return jsonify({'message': 'Application submitted successfully'}), 201
     except Exception as e:
         db.session.rollback()
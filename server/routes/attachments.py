@@ -0,0 +1,194 @@
+from flask import Blueprint, request, jsonify, current_app, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.http import parse_content_range_header
+from werkzeug.utils import secure_filename
+from extensions import db
+from idempotency import idempotent
+from models import Application, ArchivedApplication, Attachment, User
+from attachments import UploadOffsetMismatch, attachment_store
+from datetime import datetime
+
+attachments_bp = Blueprint('attachments', __name__)
+
+def _find_application(application_id):
+    return db.session.get(Application, application_id) or db.session.get(ArchivedApplication, application_id)
+
+def _can_view(application, user_id):
+    if application.student_id == user_id:
+        return True
+    user = db.session.get(User, user_id)
+    return user is not None and user.role == 'admin'
+
+def _attachment_or_error(id, user_id):
+    """Return (attachment, None) if the user may see it, else (None, error response)."""
+    attachment = db.session.get(Attachment, id)
+    application = _find_application(attachment.application_id) if attachment else None
+    if not application:
+        return None, (jsonify({'error': 'Attachment not found'}), 404)
+    if not _can_view(application, user_id):
+        return None, (jsonify({'error': 'Unauthorized'}), 403)
+    return attachment, None
+
+def _upload_state(attachment):
+    data = attachment.to_dict()
+    data['upload_offset'] = attachment.size if attachment.is_complete else attachment_store().received(attachment.id)
+    return data
+
+@attachments_bp.route('/applications/<int:application_id>/attachments', methods=['POST'])
+@jwt_required()
+@idempotent()
+def create_attachment(application_id):
+    """Start an upload. The file itself is sent with PUT /api/attachments/<id>."""
+    user_id = int(get_jwt_identity())
+    application = db.session.get(Application, application_id)
+    if not application:
+        return jsonify({'error': 'Application not found'}), 404
+    if application.student_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('filename') or '')
+    content_type = data.get('content_type')
+    kind = data.get('kind', 'other')
+    size = data.get('size')
+    if not filename:
+        return jsonify({'error': 'filename is required'}), 400
+    if content_type not in current_app.config['ATTACHMENT_CONTENT_TYPES']:
+        return jsonify({'error': 'Unsupported content type'}), 415
+    if kind not in current_app.config['ATTACHMENT_KINDS']:
+        return jsonify({'error': 'Invalid attachment kind'}), 400
+    if not isinstance(size, int) or size < 1 or size > current_app.config['ATTACHMENT_MAX_SIZE']:
+        return jsonify({'error': 'Invalid attachment size'}), 400
+
+    attachment = Attachment(
+        application_id=application_id,
+        uploaded_by=user_id,
+        kind=kind,
+        filename=filename,
+        content_type=content_type,
+        size=size
+    )
+    db.session.add(attachment)
+    db.session.commit()
+    # Clear out partial uploads their clients gave up on
+    attachment_store().sweep_staged(current_app.config['ATTACHMENT_STAGING_MAX_AGE'])
+    return jsonify(_upload_state(attachment)), 201
+
+@attachments_bp.route('/applications/<int:application_id>/attachments', methods=['GET'])
+@jwt_required()
+def list_attachments(application_id):
+    user_id = int(get_jwt_identity())
+    application = _find_application(application_id)
+    if not application:
+        return jsonify({'error': 'Application not found'}), 404
+    if not _can_view(application, user_id):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    attachments = Attachment.query.filter(
+        Attachment.application_id == application_id,
+        Attachment.sha256.isnot(None)
+    ).order_by(Attachment.created_at).all()
+    return jsonify({'attachments': [a.to_dict() for a in attachments]})
+
+@attachments_bp.route('/attachments/<int:id>', methods=['GET'])
+@jwt_required()
+def get_attachment(id):
+    """Attachment metadata; `upload_offset` tells a client where to resume."""
+    attachment, error = _attachment_or_error(id, int(get_jwt_identity()))
+    if error:
+        return error
+    return jsonify(_upload_state(attachment))
+
+@attachments_bp.route('/attachments/<int:id>', methods=['PUT'])
+@jwt_required()
+def upload_chunk(id):
+    """Append one chunk, described by `Content-Range: bytes start-end/total`.
+
+    A request without Content-Range sends the whole file in one go. The body
+    is streamed to disk, never read into memory.
+    """
+    user_id = int(get_jwt_identity())
+    attachment = db.session.get(Attachment, id)
+    if not attachment or attachment.uploaded_by != user_id:
+        return jsonify({'error': 'Attachment not found'}), 404
+    if attachment.is_complete:
+        return jsonify({'error': 'Upload already complete'}), 409
+
+    length = request.content_length
+    if length is None:
+        return jsonify({'error': 'Content-Length is required'}), 411
+    if length > current_app.config['ATTACHMENT_MAX_CHUNK_SIZE']:
+        return jsonify({'error': 'Chunk too large'}), 413
+
+    content_range = request.headers.get('Content-Range')
+    if content_range:
+        parsed = parse_content_range_header(content_range)
+        if parsed is None or parsed.length != attachment.size or parsed.stop - parsed.start != length:
+            return jsonify({'error': 'Invalid Content-Range'}), 400
+        offset = parsed.start
+    else:
+        offset = 0
+        if length != attachment.size:
+            return jsonify({'error': 'Content-Range is required for partial uploads'}), 400
+
+    store = attachment_store()
+    try:
+        received = store.append_chunk(attachment.id, offset, request.stream, length)
+    except UploadOffsetMismatch as e:
+        return jsonify({'error': 'Unexpected offset', 'upload_offset': e.expected}), 409
+
+    if received < attachment.size:
+        return jsonify({'upload_offset': received})
+
+    sha256 = store.hash_upload(attachment.id)
+    # A concurrent delete of the last attachment sharing this object must not
+    # remove it between the move and this attachment's reference being committed
+    with store.object_lock(sha256):
+        attachment.sha256 = store.commit(attachment.id, sha256)
+        attachment.completed_at = datetime.utcnow()
+        db.session.commit()
+    return jsonify(_upload_state(attachment)), 201
+
+@attachments_bp.route('/attachments/<int:id>/download', methods=['GET'])
+@jwt_required()
+def download_attachment(id):
+    """Serve the stored file; honours Range / If-None-Match via send_file."""
+    attachment, error = _attachment_or_error(id, int(get_jwt_identity()))
+    if error:
+        return error
+    if not attachment.is_complete:
+        return jsonify({'error': 'Upload not complete'}), 409
+
+    # A path (not a file object) lets the server use wsgi.file_wrapper /
+    # sendfile, or X-Sendfile when USE_X_SENDFILE is on
+    return send_file(
+        attachment_store().object_path(attachment.sha256),
+        mimetype=attachment.content_type,
+        as_attachment=True,
+        download_name=attachment.filename,
+        conditional=True,
+        etag=attachment.sha256,
+        max_age=0
+    )
+
+@attachments_bp.route('/attachments/<int:id>', methods=['DELETE'])
+@jwt_required()
+def delete_attachment(id):
+    user_id = int(get_jwt_identity())
+    attachment = db.session.get(Attachment, id)
+    if not attachment or attachment.uploaded_by != user_id:
+        return jsonify({'error': 'Attachment not found'}), 404
+
+    store = attachment_store()
+    sha256 = attachment.sha256
+    db.session.delete(attachment)
+    db.session.commit()
+
+    if sha256 is None:
+        store.discard(id)
+    else:
+        with store.object_lock(sha256):
+            if not Attachment.query.filter_by(sha256=sha256).first():
+                # Last reference to a deduplicated object
+                store.remove_object(sha256)
+    return jsonify({'message': 'Attachment deleted'})
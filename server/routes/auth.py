@@ -2,7 +2,6 @@ from flask import Blueprint, request, jsonify, current_app, make_response
 from flask_login import login_user, logout_user, login_required
 from flask_jwt_extended import create_access_token, jwt_required
 from extensions import db, mail
-from flask_mail import Message
 from models import User
 from datetime import datetime, timedelta
 import secrets
@@ -20,10 +19,12 @@ def handle_preflight():
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
 from flask_login import login_user, logout_user, login_required
-from flask_jwt_extended import create_access_token, jwt_required
+from flask_jwt_extended import (create_access_token, create_refresh_token, decode_token, get_jwt,
+                                get_jwt_identity, jwt_required, verify_jwt_in_request)
+from itsdangerous import BadSignature, SignatureExpired
 from extensions import db, mail
-from flask_mail import Message
-from models import User
+from models import User, is_signed_token
+from revocation import revoke_token
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -43,13 +44,14 @@ def register():
     )
     user.set_password(data['password'])
     
-    # Generate email verification token
-    verification_token = user.generate_verification_token()
-    
     db.session.add(user)
     db.session.commit()
 
-    # Send verification email
+    # Signed email verification token (needs the new user's id, stores nothing)
+    verification_token = user.generate_verification_token()
+
+    # Send verification email (flask_mail is imported on first use)
+    from flask_mail import Message
     msg = Message('Email Verification - Scholarship Portal',
                   sender='noreply@scholarshipportal.com',
                   recipients=[user.email])
@@ -93,14 +95,47 @@ def login():
         
         # Don't use login_user for JWT - it's not needed
         access_token = create_access_token(identity=str(user.id))
-        return jsonify(access_token=access_token, message='Logged in successfully')
+        refresh_token = create_refresh_token(identity=str(user.id))
+        return jsonify(access_token=access_token, refresh_token=refresh_token, message='Logged in successfully')
         
     return jsonify({'error': 'Invalid credentials'}), 401
 
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    """Trade a refresh token for a new access token and a new refresh token.
+
+    The presented refresh token is revoked, so a stolen one stops working as
+    soon as either party uses it.
+    """
+    identity = get_jwt_identity()
+    revoke_token(get_jwt())
+    return jsonify(
+        access_token=create_access_token(identity=identity),
+        refresh_token=create_refresh_token(identity=identity)
+    )
+
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
-    # For JWT, logout is handled client-side by removing the token
-    # No server-side session to destroy
+    """Revoke the bearer token and, when sent as `refresh_token`, the refresh token"""
+    try:
+        verify_jwt_in_request(optional=True, verify_type=False)
+        payload = get_jwt()
+    except Exception:
+        payload = None  # Expired or already revoked: nothing left to revoke
+    if payload:
+        revoke_token(payload)
+
+    data = request.get_json(silent=True) or {}
+    if data.get('refresh_token'):
+        try:
+            refresh_payload = decode_token(data['refresh_token'])
+        except Exception:
+            refresh_payload = None
+        # Only the owner of the bearer token may revoke its refresh token
+        if refresh_payload and refresh_payload.get('type') == 'refresh' and \
+                (not payload or refresh_payload['sub'] == payload['sub']):
+            revoke_token(refresh_payload)
     return jsonify({'message': 'Logged out successfully'})
 
 @auth_bp.route('/forgot-password', methods=['POST'])
@@ -114,11 +149,11 @@ def forgot_password():
         # Don't reveal if email exists or not for security
         return jsonify({'message': 'If the email exists, a reset link has been sent'}), 200
 
-    # Generate reset token
+    # Signed reset token; nothing to write
     token = user.generate_reset_token()
-    db.session.commit()
 
     # Send reset email
+    from flask_mail import Message
     msg = Message('Password Reset Request',
                   sender='noreply@scholarshipportal.com',
                   recipients=[user.email])
@@ -153,12 +188,18 @@ def reset_password(token):
     if not data or not data.get('password'):
         return jsonify({'error': 'New password is required'}), 400
 
-    # Find user by token
-    user = db.session.query(User).filter_by(password_reset_token=token).first()
-    if not user or not user.verify_reset_token(token):
-        return jsonify({'error': 'Invalid or expired reset token'}), 400
+    if is_signed_token(token):
+        try:
+            user = User.from_signed_token(token, 'reset')
+        except BadSignature:
+            return jsonify({'error': 'Invalid or expired reset token'}), 400
+    else:
+        # Token stored by an older release
+        user = db.session.query(User).filter_by(password_reset_token=token).first()
+        if not user or not user.verify_reset_token(token):
+            return jsonify({'error': 'Invalid or expired reset token'}), 400
 
-    # Update password and clear reset token
+    # The new password hash also retires the signed token
     user.set_password(data['password'])
     user.clear_reset_token()
     db.session.commit()
@@ -167,7 +208,18 @@ def reset_password(token):
 
 @auth_bp.route('/verify-email/<token>', methods=['GET'])
 def verify_email(token):
-    # Find user by verification token
+    if is_signed_token(token):
+        try:
+            user = User.from_signed_token(token, 'verify')
+        except SignatureExpired:
+            return jsonify({'error': 'Verification token has expired'}), 400
+        except BadSignature:
+            return jsonify({'error': 'Invalid verification token'}), 400
+        user.email_verified = True
+        db.session.commit()
+        return jsonify({'message': 'Email verified successfully! You can now log in.'}), 200
+
+    # Token stored by an older release
     user = db.session.query(User).filter_by(email_verification_token=token).first()
     if not user:
         return jsonify({'error': 'Invalid verification token'}), 400
@@ -2,13 +2,14 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from extensions import db, cache
 from models import User
+from cache_utils import cached
 from datetime import datetime
 
 profile_bp = Blueprint('profile', __name__)
 
 @profile_bp.route('/', methods=['GET'])
 @jwt_required()
-@cache.cached(timeout=120, key_prefix=lambda: f'user_profile_{get_jwt_identity()}')  # Cache for 2 minutes
+@cached(timeout=120, key_prefix=lambda: f'user_profile_{get_jwt_identity()}')  # Cache for 2 minutes
 def get_profile():
     """Get current user's profile"""
     user_id = get_jwt_identity()
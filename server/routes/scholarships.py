@@ -1,54 +1,70 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from extensions import db, cache
+from extensions import db
+from idempotency import idempotent
 from models import Scholarship
 from datetime import datetime
 from sqlalchemy.sql import select
+from pagination import count_requested, paginate
+from cache_utils import bump_catalog_generation, cached, catalog_generation
+from popularity import record_hit
+from warmup import warm_after_invalidation
 
 scholarships_bp = Blueprint('scholarships', __name__)
 
+SCHOLARSHIP_LIST_TIMEOUT = 300  # 5 minutes; catalog changes retire pages sooner
+
+def scholarship_list_item(s):
+    return {
+        'id': s.id,
+        'title': s.title,
+        'description': s.description,
+        'amount': s.amount,
+        'deadline': s.deadline.isoformat() if s.deadline else None,
+        'created_at': s.created_at.isoformat() if s.created_at else None
+    }
+
+def scholarship_detail(scholarship):
+    return {
+        'id': scholarship.id,
+        'title': scholarship.title,
+        'description': scholarship.description,
+        'amount': scholarship.amount,
+        'deadline': scholarship.deadline.isoformat()
+    }
+
+def _list_page_args():
+    page = int(request.args.get('page', 1))
+    per_page = int(request.args.get('per_page', 10))
+    if page < 1:
+        page = 1
+    if per_page < 1 or per_page > 100:
+        per_page = 10
+    return page, per_page
+
+def _scholarship_list_key():
+    # The catalog generation retires every cached page when the catalog changes
+    try:
+        page, per_page = _list_page_args()
+    except ValueError:
+        return 'scholarships_list_invalid'
+    suffix = '' if count_requested(request.args) else '_nocount'
+    return f'scholarships_list_{catalog_generation()}_{page}_{per_page}{suffix}'
+
 @scholarships_bp.route('/', methods=['GET'], strict_slashes=False)
+@cached(timeout=SCHOLARSHIP_LIST_TIMEOUT, key_prefix=_scholarship_list_key)
 def get_scholarships():
     try:
         # Get pagination parameters
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
+        page, per_page = _list_page_args()
         
-        # Validate pagination parameters
-        if page < 1:
-            page = 1
-        if per_page < 1 or per_page > 100:
-            per_page = 10
-        
-        # Get total count for pagination metadata
-        total_scholarships = Scholarship.query.filter_by(is_active=True).count()
-        
-        # Apply pagination to query
-        scholarships_query = Scholarship.query.filter_by(is_active=True).order_by(Scholarship.deadline)
-        scholarships = scholarships_query.offset((page - 1) * per_page).limit(per_page).all()
-        
-        # Calculate pagination metadata
-        total_pages = (total_scholarships + per_page - 1) // per_page
+        # Page and total in one query (estimated for very large catalogs)
+        statement = select(Scholarship).filter_by(is_active=True).order_by(Scholarship.deadline)
+        scholarships, pagination = paginate(statement, page, per_page, count_requested(request.args), 'total_scholarships')
         
         result = {
-            'scholarships': [{
-                'id': s.id,
-                'title': s.title,
-                'description': s.description,
-                'amount': s.amount,
-                'deadline': s.deadline.isoformat() if s.deadline else None,
-                'created_at': s.created_at.isoformat() if s.created_at else None
-            } for s in scholarships],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total_scholarships': total_scholarships,
-                'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1,
-                'next_page': page + 1 if page < total_pages else None,
-                'prev_page': page - 1 if page > 1 else None
-            }
+            'scholarships': [scholarship_list_item(s) for s in scholarships],
+            'pagination': pagination
         }
         
         return jsonify(result)
@@ -56,19 +72,22 @@ def get_scholarships():
         return jsonify({'error': 'Failed to fetch scholarships'}), 500
 
 @scholarships_bp.route('/<int:id>', methods=['GET'])
-@cache.cached(timeout=600, key_prefix=lambda: f'scholarship_{request.view_args["id"]}')  # Cache for 10 minutes
 def get_scholarship(id):
+    record_hit('scholarship', id)  # Ranks details for the cache warmer
+    return _scholarship_detail_response(id)
+
+def scholarship_detail_key(id):
+    """Cache key of a rendered scholarship detail (shared with asgi.py)."""
+    return f'scholarship_{id}'
+
+@cached(timeout=600, key_prefix=lambda: scholarship_detail_key(request.view_args['id']))  # Cache for 10 minutes
+def _scholarship_detail_response(id):
     scholarship = Scholarship.query.get_or_404(id)
-    return jsonify({
-        'id': scholarship.id,
-        'title': scholarship.title,
-        'description': scholarship.description,
-        'amount': scholarship.amount,
-        'deadline': scholarship.deadline.isoformat()
-    })
+    return jsonify(scholarship_detail(scholarship))
 
 @scholarships_bp.route('/', methods=['POST'])
 @jwt_required()
+@idempotent()
 def create_scholarship():
     try:
         data = request.get_json()
@@ -112,8 +131,9 @@ def create_scholarship():
         db.session.add(scholarship)
         db.session.commit()
         
-        # Clear scholarships list cache
-        cache.delete('scholarships_list')
+        # Retires the cached list pages and searches, then refills them
+        bump_catalog_generation()
+        warm_after_invalidation()
         
         return jsonify({
             'id': scholarship.id,
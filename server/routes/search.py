@@ -1,32 +1,69 @@
 from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
-from extensions import db
+from extensions import db, cache
 from models import Scholarship, Application
-from sqlalchemy import or_, and_
-from datetime import datetime
+from sqlalchemy import or_, and_, case, false, func, literal, literal_column, select
+from archive import application_columns, application_rows, include_archived_requested, row_to_dict
+from cache_utils import cached, catalog_generation
+from popularity import record_hit
+from suggest import suggest_index
+from fuzzy import fuzzy_index
+from datetime import datetime, timedelta
+from pagination import count_requested, page_metadata, paginate
+import hashlib
+import json
 
 search_bp = Blueprint('search', __name__)
 
-@search_bp.route('/scholarships', methods=['GET'], strict_slashes=False)
-def search_scholarships():
-    """Search and filter scholarships"""
+# Facet buckets as (key, lower bound, upper bound); bounds are [lower, upper)
+AMOUNT_FACET_BUCKETS = [
+    ('0-1000', 0, 1000),
+    ('1000-5000', 1000, 5000),
+    ('5000-10000', 5000, 10000),
+    ('10000+', 10000, None),
+]
+# Days from now until the deadline
+DEADLINE_FACET_BUCKETS = [
+    ('closed', None, 0),
+    ('0-7', 0, 7),
+    ('7-30', 7, 30),
+    ('30-90', 30, 90),
+    ('90+', 90, None),
+]
+FACETS_TIMEOUT = 60  # Deadline buckets move with the clock, so keep this short
+# Request args that change the matching set (and therefore the facet counts)
+FACET_FILTER_ARGS = ('q', 'min_amount', 'max_amount', 'deadline_before', 'deadline_after')
+SEARCH_TIMEOUT = 60  # Search pages; catalog changes retire them sooner
+SUGGEST_DEFAULT_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+
+def scholarship_search_statement(args, fuzzy=False):
+    """Build the search_scholarships() select from request args.
+
+    Returns (statement, error); error is a message for a 400 response. Shared
+    with the async read API in asgi.py. With `fuzzy`, `q` is matched
+    typo-tolerantly and results are ranked by relevance unless `sort_by` is
+    given (see fuzzy_text_match).
+    """
     # Get query parameters
-    query = request.args.get('q', '')
-    min_amount = request.args.get('min_amount', type=float)
-    max_amount = request.args.get('max_amount', type=float)
-    deadline_before = request.args.get('deadline_before')
-    deadline_after = request.args.get('deadline_after')
-    sort_by = request.args.get('sort_by', 'deadline')  # deadline, amount, title
-    sort_order = request.args.get('sort_order', 'asc')  # asc, desc
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    query = args.get('q', '')
+    min_amount = args.get('min_amount', type=float)
+    max_amount = args.get('max_amount', type=float)
+    deadline_before = args.get('deadline_before')
+    deadline_after = args.get('deadline_after')
+    sort_by = args.get('sort_by', 'deadline')  # deadline, amount, title
+    sort_order = args.get('sort_order', 'asc')  # asc, desc
 
     # Build query
-    scholarships_query = Scholarship.query.filter_by(is_active=True)
+    statement = select(Scholarship).where(Scholarship.is_active == True)
 
     # Text search
-    if query:
-        scholarships_query = scholarships_query.filter(
+    relevance = None
+    if query and fuzzy:
+        condition, relevance = fuzzy_text_match(query)
+        statement = statement.where(condition)
+    elif query:
+        statement = statement.where(
             or_(
                 Scholarship.title.ilike(f'%{query}%'),
                 Scholarship.description.ilike(f'%{query}%'),
@@ -36,26 +73,28 @@ def search_scholarships():
 
     # Amount filters
     if min_amount is not None:
-        scholarships_query = scholarships_query.filter(Scholarship.amount >= min_amount)
+        statement = statement.where(Scholarship.amount >= min_amount)
     if max_amount is not None:
-        scholarships_query = scholarships_query.filter(Scholarship.amount <= max_amount)
+        statement = statement.where(Scholarship.amount <= max_amount)
 
     # Deadline filters
     if deadline_before:
         try:
             deadline_before_date = datetime.fromisoformat(deadline_before)
-            scholarships_query = scholarships_query.filter(Scholarship.deadline <= deadline_before_date)
+            statement = statement.where(Scholarship.deadline <= deadline_before_date)
         except ValueError:
-            return jsonify({'error': 'Invalid deadline_before format. Use ISO format.'}), 400
+            return None, 'Invalid deadline_before format. Use ISO format.'
 
     if deadline_after:
         try:
             deadline_after_date = datetime.fromisoformat(deadline_after)
-            scholarships_query = scholarships_query.filter(Scholarship.deadline >= deadline_after_date)
+            statement = statement.where(Scholarship.deadline >= deadline_after_date)
         except ValueError:
-            return jsonify({'error': 'Invalid deadline_after format. Use ISO format.'}), 400
+            return None, 'Invalid deadline_after format. Use ISO format.'
 
     # Sorting
+    if relevance is not None and 'sort_by' not in args:
+        return statement.order_by(relevance, Scholarship.id), None
     if sort_by == 'amount':
         order_column = Scholarship.amount
     elif sort_by == 'title':
@@ -64,27 +103,204 @@ def search_scholarships():
         order_column = Scholarship.deadline
 
     if sort_order == 'desc':
-        scholarships_query = scholarships_query.order_by(order_column.desc())
+        statement = statement.order_by(order_column.desc())
     else:
-        scholarships_query = scholarships_query.order_by(order_column.asc())
+        statement = statement.order_by(order_column.asc())
 
-    # Pagination
-    scholarships = scholarships_query.paginate(page=page, per_page=per_page, error_out=False)
+    return statement, None
 
-    return jsonify({
-        'scholarships': [s.to_dict() for s in scholarships.items],
-        'pagination': {
-            'page': scholarships.page,
-            'per_page': scholarships.per_page,
-            'total_scholarships': scholarships.total,
-            'total_pages': scholarships.pages,
-            'has_next': scholarships.has_next,
-            'has_prev': scholarships.has_prev,
-            'next_page': scholarships.page + 1 if scholarships.has_next else None,
-            'prev_page': scholarships.page - 1 if scholarships.has_prev else None
+def _search_document():
+    # Must match the expression of ix_scholarship_search_tsv exactly
+    return func.to_tsvector(
+        literal_column("'english'"),
+        func.coalesce(Scholarship.title, literal_column("''")).op('||')(literal_column("' '"))
+        .op('||')(func.coalesce(Scholarship.eligibility_criteria, literal_column("''")))
+    )
+
+def fuzzy_text_match(query):
+    """(where clause, ORDER BY expression) for a typo-tolerant match on `query`.
+
+    Postgres uses pg_trgm word similarity on title / eligibility criteria and
+    English full-text search (stemming), all GIN-indexed. Other databases use
+    the in-process trigram index from fuzzy.py and filter on its ranked ids.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        document = _search_document()
+        terms = func.plainto_tsquery(literal_column("'english'"), query)
+        condition = or_(
+            literal(query).op('<%')(Scholarship.title),
+            literal(query).op('<%')(Scholarship.eligibility_criteria),
+            document.op('@@')(terms)
+        )
+        relevance = func.greatest(
+            func.word_similarity(query, Scholarship.title) * 2,
+            func.word_similarity(query, func.coalesce(Scholarship.eligibility_criteria, '')),
+            func.ts_rank(document, terms)
+        )
+        return condition, relevance.desc()
+
+    ranked = fuzzy_index().search(query)
+    if not ranked:
+        return false(), None
+    return Scholarship.id.in_(ranked), case({id: rank for rank, id in enumerate(ranked)}, value=Scholarship.id)
+
+def requested_facets(args):
+    """Parse `facets=amount,deadline`; returns (facet names, error)."""
+    facets = sorted({f.strip() for f in args.get('facets', '').split(',') if f.strip()})
+    unknown = [f for f in facets if f not in ('amount', 'deadline')]
+    if unknown:
+        return None, f'Unknown facet: {unknown[0]}'
+    return facets, None
+
+def _facet_buckets(facet, rows, now):
+    """(key, lower, upper, condition) for each bucket of a facet over `rows`."""
+    if facet == 'amount':
+        column, buckets, bound = rows.c.amount, AMOUNT_FACET_BUCKETS, lambda value: value
+    else:
+        column, buckets, bound = rows.c.deadline, DEADLINE_FACET_BUCKETS, lambda days: now + timedelta(days=days)
+    for key, lower, upper in buckets:
+        conditions = []
+        if lower is not None:
+            conditions.append(column >= bound(lower))
+        if upper is not None:
+            conditions.append(column < bound(upper))
+        yield key, lower, upper, and_(*conditions)
+
+def scholarship_facet_counts(statement, facets):
+    """Total and bucket counts for the rows matched by `statement`.
+
+    Everything comes from one aggregate over the filtered rows, with one
+    COUNT(*) FILTER (WHERE ...) per bucket.
+    """
+    now = datetime.utcnow()
+    matched = statement.order_by(None).subquery()
+    buckets = [(facet,) + bucket for facet in facets for bucket in _facet_buckets(facet, matched, now)]
+    columns = [func.count()] + [func.count().filter(condition) for *_, condition in buckets]
+    row = db.session.execute(select(*columns).select_from(matched)).one()
+
+    result = {facet: [] for facet in facets}
+    for (facet, key, lower, upper, _), count in zip(buckets, row[1:]):
+        result[facet].append({'key': key, 'from': lower, 'to': upper, 'count': count})
+    return row[0], result
+
+def _facets_cache_key(args, facets, fuzzy):
+    normalized = {name: args.get(name) for name in FACET_FILTER_ARGS if args.get(name)}
+    if 'q' in normalized:
+        normalized['q'] = normalized['q'].lower()  # Matching is case-insensitive
+    normalized['facets'] = facets
+    normalized['fuzzy'] = fuzzy
+    digest = hashlib.md5(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'scholarship_facets_{catalog_generation()}_{digest}'
+
+def _search_cache_key():
+    args = sorted(request.args.items(multi=True))
+    digest = hashlib.md5(json.dumps(args).encode('utf-8')).hexdigest()
+    return f'scholarship_search_{catalog_generation()}_{digest}'
+
+@search_bp.route('/scholarships', methods=['GET'], strict_slashes=False)
+def search_scholarships():
+    """Search and filter scholarships
+
+    `facets=amount,deadline` adds bucket counts over all matching
+    scholarships (not just the current page). `fuzzy=true` matches `q`
+    typo-tolerantly; by default (`fuzzy=auto`) that only happens when the
+    exact match finds nothing, and the response then carries `fuzzy: true`.
+    """
+    if request.args.get('q'):
+        record_hit('search', request.args['q'].strip().lower())  # Ranks queries for the cache warmer
+    return _scholarship_search_response()
+
+@cached(timeout=SEARCH_TIMEOUT, key_prefix=_search_cache_key)
+def _scholarship_search_response():
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    fuzzy_mode = request.args.get('fuzzy', 'auto').lower()
+    fuzzy = fuzzy_mode in ('1', 'true', 'yes')
+
+    statement, error = scholarship_search_statement(request.args, fuzzy=fuzzy)
+    if error:
+        return jsonify({'error': error}), 400
+    facets, error = requested_facets(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+
+    result = _scholarship_search_page(statement, page, per_page, facets, fuzzy)
+    if not fuzzy and fuzzy_mode == 'auto' and request.args.get('q') and _no_matches(result):
+        fuzzy = True
+        statement, _ = scholarship_search_statement(request.args, fuzzy=True)
+        result = _scholarship_search_page(statement, page, per_page, facets, fuzzy)
+    if fuzzy:
+        result['fuzzy'] = True
+    return jsonify(result)
+
+def _no_matches(result):
+    pagination = result['pagination']
+    if pagination['total_scholarships'] is None:
+        # count=false: only an empty first page says nothing matched
+        return pagination['page'] == 1 and not result['scholarships']
+    return pagination['total_scholarships'] == 0
+
+def _scholarship_search_page(statement, page, per_page, facets, fuzzy):
+    if page is None or page < 1:
+        page = 1
+    if per_page is None or per_page < 1:
+        per_page = 20
+
+    if not facets:
+        scholarships, pagination = paginate(statement, page, per_page, count_requested(request.args),
+                                            'total_scholarships')
+        return {
+            'scholarships': [s.to_dict() for s in scholarships],
+            'pagination': pagination
         }
+
+    # The facet aggregate also yields the total, so it replaces paginate()'s count
+    cache_key = _facets_cache_key(request.args, facets, fuzzy)
+    counts = cache.get(cache_key)
+    if counts is None:
+        total, buckets = scholarship_facet_counts(statement, facets)
+        counts = {'total': total, 'facets': buckets}
+        cache.set(cache_key, counts, timeout=FACETS_TIMEOUT)
+
+    scholarships = db.session.scalars(statement.offset((page - 1) * per_page).limit(per_page)).all()
+    return {
+        'scholarships': [s.to_dict() for s in scholarships],
+        'pagination': page_metadata(page, per_page, counts['total'], 'total_scholarships'),
+        'facets': counts['facets']
+    }
+
+@search_bp.route('/suggest', methods=['GET'])
+def suggest_scholarships():
+    """Typeahead: active scholarship titles starting with `q`
+
+    Served from the in-process prefix index (suggest.py); only when that
+    finds nothing does it fall back to a trigram (Postgres) or substring
+    match in the database.
+    """
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', SUGGEST_DEFAULT_LIMIT, type=int)
+    if limit is None or limit < 1 or limit > SUGGEST_MAX_LIMIT:
+        limit = SUGGEST_DEFAULT_LIMIT
+
+    matches = suggest_index().lookup(query, limit) if query.strip() else []
+    if not matches and len(query.strip()) >= 3:
+        matches = _fuzzy_title_matches(query.strip(), limit)
+
+    return jsonify({
+        'suggestions': [{'id': id, 'title': title} for id, title in matches]
     })
 
+def _fuzzy_title_matches(query, limit):
+    statement = select(Scholarship.id, Scholarship.title).where(Scholarship.is_active == True)
+    if db.engine.dialect.name == 'postgresql':
+        # `%` uses the pg_trgm GIN index on title (similarity >= pg_trgm.similarity_threshold)
+        statement = statement.where(Scholarship.title.op('%')(query)).order_by(
+            func.similarity(Scholarship.title, query).desc()
+        )
+    else:
+        statement = statement.where(Scholarship.title.ilike(f'%{query}%')).order_by(Scholarship.title)
+    return [tuple(row) for row in db.session.execute(statement.limit(limit))]
+
 @search_bp.route('/applications', methods=['GET'])
 @login_required
 def search_applications():
@@ -94,6 +310,9 @@ def search_applications():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
 
+    if include_archived_requested():
+        return _search_applications_with_archive(status, scholarship_title, page, per_page)
+
     # Build query for user's applications
     applications_query = Application.query.filter_by(student_id=current_user.id)
 
@@ -111,12 +330,14 @@ def search_applications():
     applications_query = applications_query.order_by(Application.submission_date.desc())
 
     # Pagination
-    applications = applications_query.paginate(page=page, per_page=per_page, error_out=False)
+    page = max(page or 1, 1)
+    per_page = per_page if per_page and per_page > 0 else 20
+    applications, pagination = paginate(applications_query.statement, page, per_page, count_requested(request.args))
 
     # Include scholarship details in response
     result = []
-    for app in applications.items:
-        app_dict = app.to_dict()
+    for app in applications:
+        app_dict = app.to_dict(include_essay=False)
         app_dict['scholarship'] = {
             'id': app.scholarship.id,
             'title': app.scholarship.title,
@@ -127,12 +348,56 @@ def search_applications():
 
     return jsonify({
         'applications': result,
-        'pagination': {
-            'page': applications.page,
-            'per_page': applications.per_page,
-            'total': applications.total,
-            'pages': applications.pages,
-            'has_next': applications.has_next,
-            'has_prev': applications.has_prev
+        'pagination': _legacy_pagination(pagination)
+    })
+
+def _legacy_pagination(pagination):
+    """The older {page, per_page, total, pages, has_next, has_prev} block"""
+    return {
+        'page': pagination['page'],
+        'per_page': pagination['per_page'],
+        'total': pagination['total'],
+        'pages': pagination['total_pages'],
+        'has_next': pagination['has_next'],
+        'has_prev': pagination['has_prev']
+    }
+
+
+def _search_applications_with_archive(status, scholarship_title, page, per_page):
+    """search_applications() over both the hot and archived applications"""
+    page = max(page, 1)
+    per_page = max(per_page, 1)
+
+    def build_query(model):
+        query = application_columns(model).add_columns(
+            Scholarship.title.label('scholarship_title'),
+            Scholarship.amount.label('scholarship_amount'),
+            Scholarship.deadline.label('scholarship_deadline')
+        ).join(Scholarship, Scholarship.id == model.scholarship_id).where(
+            model.student_id == current_user.id
+        )
+        if status:
+            query = query.where(model.status == status)
+        if scholarship_title:
+            query = query.where(Scholarship.title.ilike(f'%{scholarship_title}%'))
+        return query
+
+    rows = application_rows(build_query)
+    page_rows, pagination = paginate(select(rows).order_by(rows.c.submission_date.desc()), page, per_page,
+                                     count_requested(request.args))
+
+    result = []
+    for row in page_rows:
+        app_dict = row_to_dict(row)
+        app_dict['scholarship'] = {
+            'id': row.scholarship_id,
+            'title': row.scholarship_title,
+            'amount': row.scholarship_amount,
+            'deadline': row.scholarship_deadline.isoformat() if row.scholarship_deadline else None
         }
+        result.append(app_dict)
+
+    return jsonify({
+        'applications': result,
+        'pagination': _legacy_pagination(pagination)
     })
@@ -0,0 +1,322 @@
+"""
+Slow-query log.
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are timed by SQLAlchemy
+engine events, reduced to a fingerprint (literals, bind names and IN lists
+stripped) and aggregated per fingerprint and endpoint in `slow_query_stat`,
+so every worker - and `flask slow-queries` - sees the same report. The first
+time a worker sees a fingerprint it also stores its plan: `EXPLAIN` (no
+ANALYZE, the statement is not run again) on Postgres, `EXPLAIN QUERY PLAN` on
+SQLite. Aggregation and EXPLAIN happen on a background thread; the request
+only pays for a timer and, when slow, a queue put.
+"""
+
+import contextvars
+import hashlib
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+
+import click
+from flask import current_app, has_request_context, request
+from flask.cli import with_appcontext
+from sqlalchemy import case, delete, event, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+logger = logging.getLogger(__name__)
+
+UPSERT_DIALECTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+EXPLAIN_PREFIXES = {'postgresql': 'EXPLAIN (ANALYZE off) ', 'sqlite': 'EXPLAIN QUERY PLAN '}
+EXPLAINABLE = ('select', 'with', 'update', 'delete', 'insert')
+SORT_KEYS = ('total', 'max', 'avg', 'calls')
+# Marks connections the recorder itself uses, so its writes are never recorded
+IGNORE_OPTION = 'slow_query_ignore'
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+BIND_RE = re.compile(r'%\(\w+\)s|(?<!:):\w+\b|\$\d+')
+IN_LIST_RE = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+SPACE_RE = re.compile(r'\s+')
+
+# Endpoint for code that runs without a Flask request context (the ASGI handlers)
+current_endpoint = contextvars.ContextVar('slow_query_endpoint', default=None)
+
+
+def normalize_sql(statement):
+    """The statement with literals and bind parameters replaced by `?`."""
+    statement = STRING_RE.sub('?', statement)
+    statement = BIND_RE.sub('?', statement)
+    statement = NUMBER_RE.sub('?', statement)
+    statement = IN_LIST_RE.sub('IN (...)', statement)
+    return SPACE_RE.sub(' ', statement).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def bind_shape(parameters, executemany=False):
+    """Types of the bound values (never the values themselves)."""
+    if executemany:
+        return f'{len(parameters)} x ({bind_shape(parameters[0]) if parameters else ""})'
+    if isinstance(parameters, dict):
+        return ', '.join(f'{name}: {type(value).__name__}' for name, value in parameters.items())
+    return ', '.join(type(value).__name__ for value in parameters or ())
+
+
+def _endpoint():
+    if has_request_context():
+        return request.endpoint or request.path
+    return current_endpoint.get() or '-'
+
+
+class SlowQueryLog:
+    """One app's recorder state: its engine, queue and background thread."""
+
+    def __init__(self, app, engine):
+        self.app = app
+        # The recorder's own EXPLAINs and writes are never timed
+        self.engine = engine.execution_options(**{IGNORE_OPTION: True})
+        self.queue = queue.Queue(maxsize=app.config['SLOW_QUERY_QUEUE_SIZE'])
+        self.worker = None
+        self.worker_pid = None
+        self.explained = set()
+        self.lock = threading.Lock()
+
+    def watch(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    @staticmethod
+    def _ignored(context):
+        return context is not None and context.execution_options.get(IGNORE_OPTION)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the execution context, so a statement that raises leaves nothing behind
+        if context is not None and not self._ignored(context):
+            context._slow_query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_slow_query_start', None)
+        if start is None:
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        threshold = self.app.config['SLOW_QUERY_THRESHOLD_MS']
+        if threshold is None or elapsed < threshold:
+            return
+        endpoint = _endpoint()
+        self.app.logger.warning('Slow query (%.1f ms) in %s: %s', elapsed, endpoint, statement)
+        self._enqueue({
+            'statement': statement,
+            'parameters': parameters[0] if executemany and parameters else parameters,
+            'bind_shape': bind_shape(parameters, executemany),
+            'endpoint': endpoint,
+            'paramstyle': conn.dialect.paramstyle,
+            'elapsed': elapsed,
+            'seen_at': datetime.utcnow()
+        })
+
+    def _enqueue(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            return  # Dropping a sample beats slowing the request down
+        if self.app.config['SLOW_QUERY_ASYNC']:
+            self._ensure_worker()
+
+    def _ensure_worker(self):
+        # Threads don't survive a fork; each worker process starts its own
+        with self.lock:
+            if self.worker is None or self.worker_pid != os.getpid() or not self.worker.is_alive():
+                self.explained = set()
+                self.worker_pid = os.getpid()
+                self.worker = threading.Thread(target=self._run, name='slow-query-recorder', daemon=True)
+                self.worker.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                self._record(item)
+            except Exception:
+                logger.exception('Could not record slow query')
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        if self.app.config['SLOW_QUERY_ASYNC'] and self.worker is not None:
+            self.queue.join()
+            return
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            self._record(item)
+            self.queue.task_done()
+
+    def _explain(self, item):
+        dialect = self.engine.dialect.name
+        prefix = EXPLAIN_PREFIXES.get(dialect)
+        words = item['statement'].split(None, 1)
+        if prefix is None or not words or words[0].lower() not in EXPLAINABLE:
+            return None
+        if item['paramstyle'] != self.engine.dialect.paramstyle:
+            # e.g. asyncpg's $1 placeholders can't be replayed through the sync driver
+            logger.info('Not explaining %s statement with the %s driver', item['paramstyle'],
+                        self.engine.dialect.paramstyle)
+            return None
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.exec_driver_sql(prefix + item['statement'], item['parameters'] or ()).all()
+        except Exception:
+            logger.warning('EXPLAIN failed for: %s', item['statement'], exc_info=True)
+            return None
+        # Postgres returns one text column per plan line, SQLite the detail last
+        return '\n'.join(str(row[-1]) for row in rows)
+
+    def _record(self, item):
+        from models import SlowQueryStat
+        normalized = normalize_sql(item['statement'])
+        key = fingerprint(normalized)
+        plan = None
+        if self.app.config['SLOW_QUERY_EXPLAIN'] and key not in self.explained:
+            plan = self._explain(item)
+            self.explained.add(key)
+
+        table = SlowQueryStat.__table__
+        values = {
+            'fingerprint': key, 'endpoint': item['endpoint'][:200], 'statement': normalized,
+            'bind_shape': item['bind_shape'], 'calls': 1, 'total_ms': item['elapsed'],
+            'max_ms': item['elapsed'], 'plan': plan, 'last_seen': item['seen_at']
+        }
+        changes = {
+            'calls': table.c.calls + 1,
+            'total_ms': table.c.total_ms + item['elapsed'],
+            'max_ms': case((table.c.max_ms < item['elapsed'], item['elapsed']), else_=table.c.max_ms),
+            'bind_shape': item['bind_shape'],
+            'last_seen': item['seen_at']
+        }
+        if plan is not None:
+            changes['plan'] = plan
+        with self.engine.begin() as conn:
+            upsert = UPSERT_DIALECTS.get(conn.dialect.name)
+            if upsert is not None:
+                conn.execute(upsert(table).values(**values).on_conflict_do_update(
+                    index_elements=[table.c.fingerprint, table.c.endpoint], set_=changes
+                ))
+                return
+            result = conn.execute(update(table).where(
+                table.c.fingerprint == key, table.c.endpoint == values['endpoint']
+            ).values(**changes))
+            if result.rowcount == 0:
+                conn.execute(insert(table).values(**values))
+
+
+class SlowQueryRecorder:
+    """Extension that installs a SlowQueryLog on each app with SLOW_QUERY_THRESHOLD_MS set."""
+
+    def init_app(self, app):
+        if app.config.get('SLOW_QUERY_THRESHOLD_MS') is None:
+            return
+        from extensions import db
+        with app.app_context():
+            log = SlowQueryLog(app, db.engine)
+            for engine in db.engines.values():
+                log.watch(engine)
+        app.extensions['slow_queries'] = log
+
+    @staticmethod
+    def _log(app=None):
+        return (app or current_app).extensions.get('slow_queries')
+
+    def watch(self, engine, app=None):
+        """Also time statements run on `engine` (e.g. an AsyncEngine's sync_engine)."""
+        log = self._log(app)
+        if log is not None:
+            log.watch(engine)
+
+    def flush(self, app=None):
+        """Record everything queued so far (inline unless SLOW_QUERY_ASYNC)."""
+        log = self._log(app)
+        if log is not None:
+            log.flush()
+
+
+def top_slow_queries(limit=20, sort='total'):
+    """The worst fingerprints, each with its per-endpoint breakdown and plan."""
+    from extensions import db
+    from models import SlowQueryStat
+    calls = func.sum(SlowQueryStat.calls)
+    total = func.sum(SlowQueryStat.total_ms)
+    worst = func.max(SlowQueryStat.max_ms)
+    order = {'total': total, 'max': worst, 'avg': total / calls, 'calls': calls}[sort]
+    rows = db.session.execute(
+        select(SlowQueryStat.fingerprint, calls, total, worst)
+        .group_by(SlowQueryStat.fingerprint)
+        .order_by(order.desc(), SlowQueryStat.fingerprint)
+        .limit(limit)
+    ).all()
+
+    by_fingerprint = {}
+    if rows:
+        details = SlowQueryStat.query.filter(
+            SlowQueryStat.fingerprint.in_([row[0] for row in rows])
+        ).order_by(SlowQueryStat.calls.desc()).all()
+        for stat in details:
+            by_fingerprint.setdefault(stat.fingerprint, []).append(stat)
+
+    report = []
+    for key, call_count, total_ms, max_ms in rows:
+        stats = by_fingerprint.get(key, [])
+        latest = max(stats, key=lambda stat: stat.last_seen)
+        report.append({
+            'fingerprint': key,
+            'statement': latest.statement,
+            'bind_shape': latest.bind_shape,
+            'calls': int(call_count),
+            'total_ms': round(total_ms, 1),
+            'avg_ms': round(total_ms / call_count, 1),
+            'max_ms': round(max_ms, 1),
+            'last_seen': latest.last_seen.isoformat(),
+            'plan': next((stat.plan for stat in stats if stat.plan), None),
+            'endpoints': [{'endpoint': stat.endpoint, 'calls': stat.calls} for stat in stats]
+        })
+    return report
+
+
+def reset_slow_queries():
+    from extensions import db
+    from models import SlowQueryStat
+    db.session.execute(delete(SlowQueryStat))
+    db.session.commit()
+
+
+@click.command('slow-queries')
+@click.option('--limit', default=20, show_default=True, help='Number of fingerprints to show.')
+@click.option('--sort', type=click.Choice(SORT_KEYS), default='total', show_default=True)
+@click.option('--plans/--no-plans', default=True, help='Print the captured plans.')
+@click.option('--reset', is_flag=True, help='Clear the collected statistics instead.')
+@with_appcontext
+def slow_queries_command(limit, sort, plans, reset):
+    """Show the slowest query fingerprints."""
+    if reset:
+        reset_slow_queries()
+        click.echo('Slow query statistics cleared')
+        return
+    report = top_slow_queries(limit, sort)
+    if not report:
+        click.echo('No slow queries recorded')
+    for entry in report:
+        click.echo(f"{entry['fingerprint']}  calls={entry['calls']}  total={entry['total_ms']}ms  "
+                   f"avg={entry['avg_ms']}ms  max={entry['max_ms']}ms")
+        click.echo(f"  {entry['statement']}")
+        click.echo('  endpoints: ' + ', '.join(f"{e['endpoint']} ({e['calls']})" for e in entry['endpoints']))
+        if plans and entry['plan']:
+            for line in entry['plan'].splitlines():
+                click.echo(f'  | {line}')
+        click.echo()
@@ -44,32 +44,15 @@ if ! command -v gunicorn &> /dev/null; then
 fi
 
 # Set default port
-PORT=${PORT:-8000}
+export PORT=${PORT:-8000}
 
 echo "Starting Scholarship Portal with Gunicorn..."
 echo "Port: $PORT"
 echo "SSL Enabled: $SSL_AVAILABLE"
 
-# Start with Gunicorn
-if [ "$SSL_AVAILABLE" = true ]; then
-    # Start with HTTPS
-    gunicorn \
-        --bind 0.0.0.0:$PORT \
-        --certfile=$SSL_CERT_PATH \
-        --keyfile=$SSL_KEY_PATH \
-        --workers=4 \
-        --worker-class=gevent \
-        --access-logfile - \
-        --error-logfile - \
-        wsgi:app
-else
-    # Start without HTTPS (for testing or behind reverse proxy)
+# Start with Gunicorn - workers, threads, preload and recycling come from gunicorn.conf.py
+# (certfile/keyfile are picked up there from SSL_CERT_PATH/SSL_KEY_PATH)
+if [ "$SSL_AVAILABLE" != true ]; then
     echo "Warning: Starting without HTTPS. Ensure your reverse proxy handles SSL termination."
-    gunicorn \
-        --bind 0.0.0.0:$PORT \
-        --workers=4 \
-        --worker-class=gevent \
-        --access-logfile - \
-        --error-logfile - \
-        wsgi:app
 fi
+exec gunicorn --config gunicorn.conf.py wsgi:app
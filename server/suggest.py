@@ -0,0 +1,73 @@
+"""
+In-memory prefix index over active scholarship titles for /api/search/suggest.
+
+Titles are kept in two sorted arrays - one keyed by the whole title, one by
+every word in it - so a lookup is a bisect plus a short slice, without any
+database round trip. Each worker builds its own index and rebuilds it when the
+catalog generation (cache_utils) moves on.
+"""
+
+from bisect import bisect_left
+
+from sqlalchemy import select
+
+from cache_utils import catalog_index
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+class TitleIndex:
+    def __init__(self, scholarships):
+        """`scholarships` is an iterable of (id, title) pairs."""
+        titles = []
+        words = []
+        for id, title in scholarships:
+            key = normalize(title)
+            titles.append((key, title, id))
+            # Every word start after the first, e.g. "grant" in "nursing grant"
+            position = key.find(' ')
+            while position != -1:
+                words.append((key[position + 1:], title, id))
+                position = key.find(' ', position + 1)
+        titles.sort()
+        words.sort()
+        self.titles = titles
+        self.words = words
+
+    def __len__(self):
+        return len(self.titles)
+
+    def lookup(self, prefix, limit):
+        """Up to `limit` (id, title) pairs; whole-title matches rank first."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        for entries in (self.titles, self.words):
+            index = bisect_left(entries, (prefix,))
+            while index < len(entries) and len(results) < limit:
+                key, title, id = entries[index]
+                if not key.startswith(prefix):
+                    break
+                if id not in seen:
+                    seen.add(id)
+                    results.append((id, title))
+                index += 1
+        return results
+
+
+def _build_title_index():
+    from extensions import db
+    from models import Scholarship
+    rows = db.session.execute(
+        select(Scholarship.id, Scholarship.title).where(Scholarship.is_active == True)
+    ).all()
+    return TitleIndex(rows)
+
+
+def suggest_index():
+    """The current app's TitleIndex, rebuilt when the catalog changes."""
+    return catalog_index('suggest', _build_title_index)
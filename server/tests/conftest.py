@@ -1,35 +1,32 @@
 import pytest
+import asyncio
+import json
 import os
 import sys
-sys.path.insert(0, os.path.dirname(__file__))
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import app as flask_app
-from extensions import db
+from app import create_app
+from extensions import db, cache, limiter
 
 
-class TestConfig:
-    """Test configuration with in-memory SQLite database"""
-    TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
-    JWT_SECRET_KEY = 'test-secret-key'
-    SECRET_KEY = 'test-secret-key'
+@pytest.fixture(scope='session')
+def flask_app():
+    """One application for the whole session, built from TestingConfig
+    (in-memory SQLite)."""
+    return create_app('testing')
 
 
 @pytest.fixture
-def app():
+def app(flask_app):
     """Create and configure a test app instance."""
-    flask_app.config['TESTING'] = True
-    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    flask_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    flask_app.config['JWT_SECRET_KEY'] = 'test-secret-key'
-    flask_app.config['SECRET_KEY'] = 'test-secret-key'
-
     with flask_app.app_context():
         db.create_all()
         yield flask_app
         db.session.remove()
         db.drop_all()
+        cache.clear()
+        limiter.storage.reset()
 
 
 @pytest.fixture
@@ -42,3 +39,74 @@ def client(app):
 def runner(app):
     """A test runner for the app's Click commands."""
     return app.test_cli_runner()
+
+
+@pytest.fixture
+def admin(client):
+    """An admin user, logged in on `client` (Flask-Login session)."""
+    from models import User
+    admin = User(name='Admin User', email='admin@example.com', role='admin',
+                 created_at=datetime.utcnow() - timedelta(days=365))
+    admin.set_password('password123')
+    db.session.add(admin)
+    db.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin.id)
+        session['_fresh'] = True
+    return admin
+
+
+@pytest.fixture
+def sample_scholarships(app):
+    """Four active scholarships with spread-out amounts and deadlines."""
+    from models import Scholarship
+    now = datetime.utcnow()
+    scholarships = [
+        Scholarship(title=title, description='A test scholarship', amount=amount,
+                    deadline=now + timedelta(days=days))
+        for title, amount, days in [('Engineering Award', 500, 3), ('Nursing Grant', 2500, 20),
+                                    ('Science Fund', 7500, 45), ('Arts Prize', 20000, 200)]
+    ]
+    db.session.add_all(scholarships)
+    db.session.commit()
+    return scholarships
+
+
+@pytest.fixture
+def asgi_app(tmp_path):
+    """ASGI app whose sync and async engines share one SQLite file"""
+    from asgi import create_asgi_app
+    application = create_asgi_app('testing', test_config={
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path}/asgi.db'
+    })
+    with application.flask_app.app_context():
+        db.create_all()
+    yield application
+    asyncio.run(application.engine.dispose())
+
+
+@pytest.fixture
+def asgi_get(asgi_app):
+    """Drive one GET request through the ASGI callable; returns (status, JSON body)"""
+    def get(path, headers=None):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '', 'server': ('testserver', 80),
+            'client': ('127.0.0.1', 1234),
+            'headers': [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(asgi_app(scope, receive, send))
+        status = messages[0]['status']
+        body = b''.join(m.get('body', b'') for m in messages[1:])
+        return status, json.loads(body) if body else None
+    return get
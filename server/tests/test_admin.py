@@ -0,0 +1,223 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+
+
+def _create_students(db, count):
+    from models import User
+    now = datetime.utcnow()
+    for i in range(count):
+        db.session.add(User(name=f'Student {i}', email=f'student{i}@example.com', role='student',
+                            password_hash='x', email_verified=i % 2 == 0,
+                            created_at=now - timedelta(hours=i)))
+    db.session.commit()
+
+
+def test_user_directory_keyset_pages(client, app, admin):
+    """Following next_cursor walks every user exactly once, newest first"""
+    from extensions import db
+    _create_students(db, 7)
+
+    seen = []
+    url = '/api/admin/users?role=student&per_page=3&cursor='
+    while url:
+        data = json.loads(client.get(url).data)
+        seen.extend(user['email'] for user in data['users'])
+        cursor = data['pagination']['next_cursor']
+        url = f'/api/admin/users?role=student&per_page=3&cursor={cursor}' if cursor else None
+    assert seen == [f'student{i}@example.com' for i in range(7)]
+
+
+def test_user_directory_search_filters(client, app, admin):
+    """q matches an email prefix or part of the name; filters combine"""
+    from extensions import db
+    _create_students(db, 12)
+
+    data = json.loads(client.get('/api/admin/users?q=STUDENT1').data)
+    assert {u['email'] for u in data['users']} == {'student1@example.com', 'student10@example.com',
+                                                   'student11@example.com'}
+
+    data = json.loads(client.get('/api/admin/users?q=dent 1&email_verified=true').data)
+    assert {u['email'] for u in data['users']} == {'student10@example.com'}
+
+    data = json.loads(client.get('/api/admin/users?q=100%25').data)
+    assert data['users'] == []
+
+    response = client.get('/api/admin/users?cursor=not-a-cursor')
+    assert response.status_code == 400
+
+
+def test_user_directory_offset_paging(client, app, admin):
+    """page= keeps the OFFSET response with totals"""
+    from extensions import db
+    _create_students(db, 5)
+
+    data = json.loads(client.get('/api/admin/users?page=2&per_page=2').data)
+    assert data['pagination']['total'] == 6
+    assert len(data['users']) == 2
+
+    # Without page or cursor: the first page, with its total
+    data = json.loads(client.get('/api/admin/users?per_page=2').data)
+    pagination = data['pagination']
+    assert (pagination['page'], pagination['per_page'], pagination['total'], pagination['pages']) == (1, 2, 6, 3)
+    assert pagination['has_next'] is True
+    assert [user['email'] for user in data['users']] == ['student0@example.com', 'student1@example.com']
+
+
+def test_user_directory_offset_paging_without_count(client, app, admin):
+    """count=false skips the total but still says whether another page exists"""
+    from extensions import db
+    _create_students(db, 3)
+
+    pagination = json.loads(client.get('/api/admin/users?per_page=2&count=false').data)['pagination']
+    assert pagination['total'] is None and pagination['pages'] is None
+    assert pagination['has_next'] is True
+
+    pagination = json.loads(client.get('/api/admin/users?page=2&per_page=2&count=false').data)['pagination']
+    assert pagination['has_next'] is False
+
+
+def test_user_directory_keyset_pages_include_null_created_at(client, app, admin):
+    """Accounts without created_at come first and aren't skipped by the cursor"""
+    from extensions import db
+    from models import User
+    from sqlalchemy import update
+    _create_students(db, 4)
+    db.session.execute(update(User).where(User.email.in_(['student1@example.com', 'student3@example.com']))
+                       .values(created_at=None))
+    db.session.commit()
+
+    seen = []
+    url = '/api/admin/users?role=student&per_page=1&cursor='
+    while url:
+        data = json.loads(client.get(url).data)
+        seen.extend(user['email'] for user in data['users'])
+        cursor = data['pagination']['next_cursor']
+        url = f'/api/admin/users?role=student&per_page=1&cursor={cursor}' if cursor else None
+    assert seen == ['student3@example.com', 'student1@example.com', 'student0@example.com', 'student2@example.com']
+
+
+def _create_applications(db, count):
+    from models import User, Scholarship, Application
+    student = User(name='Student, "Quoted"', email='student@example.com', role='student', password_hash='x')
+    scholarship = Scholarship(title='=Formula Award', description='A test scholarship', amount=1000,
+                              deadline=datetime.utcnow() + timedelta(days=30))
+    db.session.add_all([student, scholarship])
+    db.session.commit()
+    for _ in range(count):
+        db.session.add(Application(student_id=student.id, scholarship_id=scholarship.id, status='pending'))
+    db.session.commit()
+
+
+def test_export_applications_csv(client, app, admin):
+    """The CSV export streams one joined row per application"""
+    import csv
+    import io
+    from extensions import db
+    _create_applications(db, 3)
+
+    response = client.get('/api/admin/applications/export')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.is_streamed
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0][0] == 'application_id'
+    assert len(rows) == 4
+    assert rows[1][5] == "'=Formula Award"  # Neutralized for spreadsheet apps
+    assert rows[1][7] == 'Student, "Quoted"'
+
+
+def test_export_applications_xlsx(client, app, admin):
+    """The XLSX export is a valid workbook with a row per application"""
+    import io
+    import zipfile
+    from extensions import db
+    _create_applications(db, 3)
+
+    response = client.get('/api/admin/applications/export?format=xlsx&include_archived=true')
+    assert response.status_code == 200
+    workbook = zipfile.ZipFile(io.BytesIO(response.data))
+    assert workbook.testzip() is None
+    sheet = workbook.read('xl/worksheets/sheet1.xml').decode('utf-8')
+    assert sheet.count('<row>') == 4
+
+
+def test_daily_rollup_follows_submissions_and_reviews(client, app, admin):
+    """The rollup counts submissions per day and moves them on review"""
+    from extensions import db
+    from models import Application
+    _create_applications(db, 3)
+
+    application = Application.query.first()
+    application.status = 'approved'
+    db.session.commit()
+
+    data = json.loads(client.get('/api/admin/analytics/applications').data)
+    assert len(data['series']) == 30
+    today = data['series'][-1]
+    assert today['date'] == datetime.utcnow().date().isoformat()
+    assert today['by_status'] == {'pending': 2, 'approved': 1}
+    assert json.loads(client.get('/api/admin/stats').data)['recent_applications'] == 3
+
+
+def test_review_does_not_load_the_essay(client, app, admin):
+    """Reviewing returns the list-item shape without touching the deferred essay"""
+    from extensions import db
+    from models import Application
+    from sqlalchemy import event
+    _create_applications(db, 1)
+    application_id = Application.query.first().id
+    db.session.expire_all()
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.post(f'/api/admin/applications/{application_id}/review', json={'status': 'approved'})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert response.status_code == 200
+    data = json.loads(response.data)['application']
+    assert data['status'] == 'approved' and 'essay' not in data
+    assert not any('essay' in statement for statement in statements)
+
+
+def test_rollup_counts_apply_after_commit(app):
+    """Submissions don't touch the counter rows until they commit; rollbacks never do"""
+    from extensions import db
+    from models import Application, ApplicationDailyStat
+    from sqlalchemy import func, select
+    _create_applications(db, 1)
+    application = Application.query.first()
+
+    def counted():
+        return db.session.execute(select(func.sum(ApplicationDailyStat.count))).scalar()
+
+    db.session.add(Application(student_id=application.student_id, scholarship_id=application.scholarship_id))
+    db.session.flush()
+    assert counted() == 1
+    db.session.rollback()
+    assert counted() == 1
+
+    db.session.add(Application(student_id=application.student_id, scholarship_id=application.scholarship_id))
+    db.session.commit()
+    assert counted() == 2
+
+
+def test_rollup_command_rebuilds_buckets(client, app, runner, admin):
+    """flask rollup-applications recomputes the rollup from the application tables"""
+    from extensions import db
+    from models import ApplicationDailyStat
+    from analytics import daily_application_counts
+    _create_applications(db, 2)
+    ApplicationDailyStat.query.delete()
+    db.session.commit()
+
+    result = runner.invoke(args=['rollup-applications'])
+    assert 'Wrote 1 daily buckets' in result.output
+    today = datetime.utcnow().date()
+    series = daily_application_counts(today, today, group_by='scholarship')
+    assert series[0]['total'] == 2
+    assert list(series[0]['by_scholarship'].values()) == [2]
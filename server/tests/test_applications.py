@@ -230,3 +230,49 @@ def test_delete_application(client, app):
     # Verify it's deleted
     response = client.get(f'/api/applications/{application_id}', headers=headers)
     assert response.status_code == 404
+
+
+def test_user_applications_cache_invalidated_on_apply(client, app):
+    """Cached application list is refreshed after applying"""
+    with app.app_context():
+        from models import User, Scholarship
+        from datetime import datetime, timedelta
+        user = User(name='Test User', email='test@example.com', role='student')
+        user.set_password('password123')
+        scholarship = Scholarship(
+            title='Test Scholarship',
+            description='A test scholarship',
+            amount=5000,
+            deadline=datetime.utcnow() + timedelta(days=30)
+        )
+        from extensions import db
+        db.session.add(user)
+        db.session.add(scholarship)
+        db.session.commit()
+
+        scholarship_id = scholarship.id
+        access_token = create_access_token(identity=str(user.id))
+
+    headers = {'Authorization': f'Bearer {access_token}'}
+    response = client.get('/api/applications/my-applications', headers=headers)
+    assert json.loads(response.data)['pagination']['total_applications'] == 0
+
+    response = client.post('/api/applications/apply',
+                          data=json.dumps({'scholarship_id': scholarship_id}),
+                          content_type='application/json',
+                          headers=headers)
+    assert response.status_code == 201
+
+    response = client.get('/api/applications/my-applications', headers=headers)
+    assert json.loads(response.data)['pagination']['total_applications'] == 1
+
+
+def test_user_applications_pages_written_before_invalidation_are_retired(app):
+    """A page rendered from data read before a change can't be served after it"""
+    from cache_utils import (get_cached_user_applications, invalidate_user_applications,
+                             set_cached_user_applications)
+    key, cached = get_cached_user_applications(7, 1, 10)
+    assert cached is None
+    invalidate_user_applications(7)  # e.g. an application submitted meanwhile
+    set_cached_user_applications(key, {'applications': [], 'pagination': {}})
+    assert get_cached_user_applications(7, 1, 10)[1] is None
@@ -0,0 +1,94 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+
+
+def _create_applications(db):
+    from models import User, Scholarship, Application
+    user = User(name='Test User', email='test@example.com', role='student')
+    user.set_password('password123')
+    scholarship = Scholarship(
+        title='Test Scholarship',
+        description='A test scholarship',
+        amount=5000,
+        deadline=datetime.utcnow() + timedelta(days=30)
+    )
+    db.session.add(user)
+    db.session.add(scholarship)
+    db.session.commit()
+
+    old_date = datetime.utcnow() - timedelta(days=400)
+    for status, submitted in [('approved', old_date), ('rejected', old_date),
+                              ('pending', old_date), ('approved', datetime.utcnow())]:
+        db.session.add(Application(
+            student_id=user.id,
+            scholarship_id=scholarship.id,
+            status=status,
+            submission_date=submitted
+        ))
+    db.session.commit()
+    return user
+
+
+def test_archive_moves_only_old_decided_applications(app):
+    """Only approved/rejected applications past the cutoff are archived"""
+    from extensions import db
+    from models import Application, ArchivedApplication
+    from archive import archive_decided_applications
+
+    _create_applications(db)
+    moved = archive_decided_applications(older_than_days=365, batch_size=1)
+
+    assert moved == 2
+    assert Application.query.count() == 2
+    assert ArchivedApplication.query.count() == 2
+    assert all(a.archived_at is not None for a in ArchivedApplication.query.all())
+
+
+def test_my_applications_include_archived(client, app):
+    """Archived applications are only listed when include_archived=true"""
+    from extensions import db
+    from archive import archive_decided_applications
+
+    user = _create_applications(db)
+    archive_decided_applications(older_than_days=365)
+    access_token = create_access_token(identity=str(user.id))
+    headers = {'Authorization': f'Bearer {access_token}'}
+
+    response = client.get('/api/applications/my-applications', headers=headers)
+    data = json.loads(response.data)
+    assert data['pagination']['total_applications'] == 2
+
+    response = client.get('/api/applications/my-applications?include_archived=true', headers=headers)
+    data = json.loads(response.data)
+    assert data['pagination']['total_applications'] == 4
+    assert sum(1 for a in data['applications'] if a['archived']) == 2
+
+
+def test_essay_is_compressed_and_deferred(client, app):
+    """Long essays are stored compressed and only loaded for the detail view"""
+    from extensions import db
+    from sqlalchemy import inspect, text
+    from models import Application
+
+    user_id = _create_applications(db).id
+    essay = 'I would like to study engineering. ' * 200
+    application = Application.query.first()
+    application.essay = essay
+    db.session.commit()
+
+    stored = db.session.execute(text('SELECT essay FROM application WHERE id = :id'),
+                                {'id': application.id}).scalar()
+    assert stored[:1] == b'\x01'
+    assert len(stored) < len(essay)
+
+    db.session.expunge_all()
+    listed = Application.query.get(application.id)
+    assert 'essay' in inspect(listed).unloaded
+    assert 'essay' not in listed.to_dict(include_essay=False)
+
+    access_token = create_access_token(identity=str(user_id))
+    headers = {'Authorization': f'Bearer {access_token}'}
+    response = client.get(f'/api/applications/{listed.id}', headers=headers)
+    assert json.loads(response.data)['essay'] == essay
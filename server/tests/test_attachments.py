@@ -0,0 +1,150 @@
+import pytest
+import json
+import os
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+
+PDF = b'%PDF-1.4 ' + os.urandom(300 * 1024)
+
+
+@pytest.fixture
+def storage(app, tmp_path):
+    previous = app.config['ATTACHMENT_STORAGE_DIR']
+    app.config['ATTACHMENT_STORAGE_DIR'] = str(tmp_path)
+    yield tmp_path
+    app.config['ATTACHMENT_STORAGE_DIR'] = previous
+
+
+def _create_student_application(db, email):
+    from models import User, Scholarship, Application
+    user = User(name='Test User', email=email, role='student')
+    user.set_password('password123')
+    scholarship = Scholarship(
+        title='Test Scholarship',
+        description='A test scholarship',
+        amount=5000,
+        deadline=datetime.utcnow() + timedelta(days=30)
+    )
+    db.session.add_all([user, scholarship])
+    db.session.commit()
+    application = Application(student_id=user.id, scholarship_id=scholarship.id)
+    db.session.add(application)
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+    return application.id, headers
+
+
+def _upload(client, application_id, headers, content, chunk_size=100 * 1024):
+    response = client.post(f'/api/applications/{application_id}/attachments', headers=headers, json={
+        'filename': 'transcript.pdf', 'content_type': 'application/pdf',
+        'kind': 'transcript', 'size': len(content)
+    })
+    assert response.status_code == 201
+    attachment_id = json.loads(response.data)['id']
+
+    for start in range(0, len(content), chunk_size):
+        chunk = content[start:start + chunk_size]
+        response = client.put(f'/api/attachments/{attachment_id}', data=chunk, headers={
+            **headers, 'Content-Range': f'bytes {start}-{start + len(chunk) - 1}/{len(content)}'
+        })
+    return attachment_id, response
+
+
+def test_chunked_upload_and_range_download(client, app, storage):
+    """Chunks are assembled into one stored object that supports Range requests"""
+    from extensions import db
+    application_id, headers = _create_student_application(db, 'test@example.com')
+
+    attachment_id, response = _upload(client, application_id, headers, PDF)
+    assert response.status_code == 201
+    data = json.loads(response.data)
+    assert data['complete'] and data['upload_offset'] == len(PDF)
+    assert not os.listdir(storage / 'uploads')
+
+    response = client.get(f'/api/attachments/{attachment_id}/download', headers=headers)
+    assert response.status_code == 200
+    assert response.data == PDF
+
+    response = client.get(f'/api/attachments/{attachment_id}/download',
+                          headers={**headers, 'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.data == PDF[100:200]
+
+
+def test_out_of_order_chunk_reports_resume_offset(client, app, storage):
+    """A chunk at the wrong offset is rejected with the offset to resume from"""
+    from extensions import db
+    application_id, headers = _create_student_application(db, 'test@example.com')
+    response = client.post(f'/api/applications/{application_id}/attachments', headers=headers, json={
+        'filename': 'letter.pdf', 'content_type': 'application/pdf', 'size': 10
+    })
+    attachment_id = json.loads(response.data)['id']
+
+    client.put(f'/api/attachments/{attachment_id}', data=b'01234',
+               headers={**headers, 'Content-Range': 'bytes 0-4/10'})
+    response = client.put(f'/api/attachments/{attachment_id}', data=b'789',
+                          headers={**headers, 'Content-Range': 'bytes 7-9/10'})
+    assert response.status_code == 409
+    assert json.loads(response.data)['upload_offset'] == 5
+
+
+def test_identical_files_are_stored_once(client, app, storage):
+    """Two applicants uploading the same file share one stored object"""
+    from extensions import db
+    first = _create_student_application(db, 'first@example.com')
+    second = _create_student_application(db, 'second@example.com')
+
+    _upload(client, *first, PDF)
+    _upload(client, *second, PDF)
+
+    objects = [name for _, _, files in os.walk(storage / 'objects') for name in files]
+    assert len(objects) == 1
+
+
+def test_object_lock_is_exclusive(storage):
+    import threading
+    from attachments import AttachmentStore
+    store = AttachmentStore(str(storage))
+    sha256 = 'ab' + '0' * 62
+    events = []
+
+    def contender():
+        with store.object_lock(sha256):
+            events.append('contender')
+
+    with store.object_lock(sha256):
+        thread = threading.Thread(target=contender)
+        thread.start()
+        thread.join(0.2)
+        assert thread.is_alive()  # Waiting for the lock
+        events.append('holder')
+    thread.join()
+    assert events == ['holder', 'contender']
+
+
+def test_abandoned_uploads_are_swept(client, app, runner, storage):
+    """Staged files untouched for ATTACHMENT_STAGING_MAX_AGE go; active ones stay"""
+    import fcntl
+    import time
+    from extensions import db
+    uploads = storage / 'uploads'
+    uploads.mkdir()
+    stale = time.time() - app.config['ATTACHMENT_STAGING_MAX_AGE'] - 60
+    for name in ('901', '902', '903'):
+        (uploads / name).write_bytes(b'partial')
+    os.utime(uploads / '901', (stale, stale))
+    os.utime(uploads / '903', (stale, stale))
+
+    with open(uploads / '903', 'ab') as writing:
+        fcntl.flock(writing, fcntl.LOCK_EX)  # A chunk being appended
+        result = runner.invoke(args=['sweep-uploads'])
+    assert 'Deleted 1 abandoned uploads' in result.output
+    assert sorted(os.listdir(uploads)) == ['902', '903']
+
+    # Starting a new upload sweeps too
+    application_id, headers = _create_student_application(db, 'test@example.com')
+    response = client.post(f'/api/applications/{application_id}/attachments', headers=headers, json={
+        'filename': 'letter.pdf', 'content_type': 'application/pdf', 'size': 10
+    })
+    assert response.status_code == 201
+    assert os.listdir(uploads) == ['902']
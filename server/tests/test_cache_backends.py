@@ -0,0 +1,103 @@
+import pytest
+import json
+
+from flask_caching.backends import SimpleCache
+
+from cache_backends import LayeredCache, MemoryInvalidationBus
+
+
+@pytest.fixture
+def workers():
+    """Two processes' caches over one shared backend and invalidation bus."""
+    remote = SimpleCache()
+    bus = MemoryInvalidationBus()
+    return LayeredCache(remote, bus), LayeredCache(remote, bus)
+
+
+def test_hot_keys_are_served_locally(workers):
+    first, second = workers
+    first.set('scholarship_1', {'title': 'Nursing'})
+    assert second.get('scholarship_1') == {'title': 'Nursing'}  # Remote, then kept locally
+    second.remote.delete('scholarship_1')  # Bypass the layer: only the local copy is left
+    assert second.get('scholarship_1') == {'title': 'Nursing'}
+    assert second.metrics['remote_hits'] == 1
+    assert second.metrics['local_hits'] == 1
+
+
+def test_writes_invalidate_other_workers(workers):
+    first, second = workers
+    first.set('scholarship_1', 'old')
+    assert second.get('scholarship_1') == 'old'
+    first.set('scholarship_1', 'new')
+    assert second.get('scholarship_1') == 'new'
+    first.delete('scholarship_1')
+    assert second.get('scholarship_1') is None
+    first.set('a', 1)
+    second.get('a')
+    first.clear()
+    assert second.get('a') is None
+
+
+def test_local_values_are_copies(workers):
+    first, _ = workers
+    first.set('key', {'items': [1]})
+    first.get('key')['items'].append(2)
+    assert first.get('key') == {'items': [1]}
+
+
+def test_local_tier_is_bounded_by_size():
+    cache = LayeredCache(SimpleCache(), MemoryInvalidationBus(), local_max_bytes=4096)
+    for i in range(20):
+        cache.set(f'key_{i}', 'x' * 400)
+    assert cache.local.size <= 4096
+    assert cache.local.evictions > 0
+    assert 'key_19' in cache.local.entries
+    assert cache.get('key_0') == 'x' * 400  # Still in the shared tier
+
+
+def test_local_entries_expire(workers, monkeypatch):
+    import time
+    first, second = workers
+    first.set('key', 'value')
+    second.get('key')
+    second.remote.delete('key')
+    now = time.monotonic()
+    monkeypatch.setattr(time, 'monotonic', lambda: now + 10)
+    assert second.get('key') is None
+
+
+def test_only_overwrites_are_published(workers):
+    first, _ = workers
+    published = []
+    first.bus.subscribe(published.append)
+    first.set('new', 1)
+    assert published == []
+    first.set('new', 2)
+    first.delete('new')
+    assert [message.split(' ', 1)[1] for message in published] == ['new', 'new']
+
+
+def test_fetch_racing_an_invalidation_is_not_kept_locally(workers, monkeypatch):
+    first, second = workers
+    first.set('key', 'old')
+    remote_get = second.remote.get
+
+    def get_then_overwrite(key):
+        value = remote_get(key)
+        first.set(key, 'new')  # Lands while `second` is fetching the old value
+        return value
+    monkeypatch.setattr(second.remote, 'get', get_then_overwrite)
+    assert second.get('key') == 'old'
+    monkeypatch.setattr(second.remote, 'get', remote_get)
+    assert second.get('key') == 'new'
+
+
+def test_add_goes_to_the_shared_tier(workers):
+    first, second = workers
+    assert first.add('lock', 1)
+    assert not second.add('lock', 1)
+
+
+def test_cache_stats_endpoint(client, app, admin):
+    data = json.loads(client.get('/api/admin/cache-stats').data)
+    assert data == {'backend': 'SimpleCache', 'tiers': None}
@@ -0,0 +1,125 @@
+import pytest
+import time
+
+from flask import jsonify
+
+
+def _counting_view(calls, **cached_args):
+    from cache_utils import cached
+
+    @cached(key_prefix='test_view', **cached_args)
+    def view():
+        calls.append(1)
+        return jsonify({'calls': len(calls)})
+    return view
+
+
+def _set_freshness(cache, key, expires, delta):
+    from cache_serialization import pack_response, unpack_response
+    body, status, headers = unpack_response(cache.get(key))
+    cache.set(key, pack_response(body, status, headers, expires, delta))
+
+
+def test_cached_view_is_built_once(app):
+    calls = []
+    view = _counting_view(calls, timeout=60, beta=0)
+    with app.test_request_context('/'):
+        assert view().get_json() == {'calls': 1}
+        assert view().get_json() == {'calls': 1}
+    assert len(calls) == 1
+
+
+def test_expired_entry_served_stale_while_another_worker_rebuilds(app):
+    from extensions import cache
+    calls = []
+    view = _counting_view(calls, timeout=60, beta=0)
+    with app.test_request_context('/'):
+        view()
+        _set_freshness(cache, 'test_view', expires=time.time() - 1, delta=0.0)
+        cache.add('test_view:lock', 1)  # Rebuild in progress elsewhere
+        assert view().get_json() == {'calls': 1}
+        assert len(calls) == 1
+
+        cache.delete('test_view:lock')
+        assert view().get_json() == {'calls': 2}
+        assert not cache.has('test_view:lock')
+
+
+def test_early_refresh_rebuilds_before_expiry(app):
+    from extensions import cache
+    calls = []
+    view = _counting_view(calls, timeout=60, beta=1e9)
+    with app.test_request_context('/'):
+        view()
+        # A slow build makes XFetch refresh early
+        _set_freshness(cache, 'test_view', expires=time.time() + 60, delta=1.0)
+        assert view().get_json() == {'calls': 2}
+
+
+def test_miss_waits_for_rebuild_then_gives_up(app, monkeypatch):
+    import cache_utils
+    from extensions import cache
+    monkeypatch.setattr(cache_utils, 'VIEW_CACHE_WAIT', 0.1)
+    calls = []
+    view = _counting_view(calls, timeout=60)
+    with app.test_request_context('/'):
+        cache.add('test_view:lock', 1)
+        started = time.monotonic()
+        assert view().get_json() == {'calls': 1}
+        assert time.monotonic() - started >= 0.1
+
+
+def test_error_responses_are_not_cached(app):
+    from cache_utils import cached
+    from extensions import cache
+
+    @cached(timeout=60, key_prefix='test_error')
+    def view():
+        return jsonify({'error': 'nope'}), 404
+
+    with app.test_request_context('/'):
+        assert view().status_code == 404
+        assert cache.get('test_error') is None
+
+
+def test_cached_responses_are_stored_as_raw_bytes(app):
+    """A hit is a byte copy: no pickling, large bodies gzip-compressed"""
+    from cache_utils import cached
+    from extensions import cache
+
+    @cached(timeout=60, key_prefix='test_large')
+    def view():
+        return jsonify({'items': ['scholarship'] * 500})
+
+    with app.test_request_context('/'):
+        expected = view().get_data()
+    _, stored = cache.cache._cache['test_large']  # SimpleCache: (expires, serialized value)
+    assert stored[:1] == b'\x00'  # CompactSerializer's raw tag, not a pickle
+    assert len(stored) < len(expected) // 4
+
+    with app.test_request_context('/', headers={'Accept-Encoding': 'gzip, br'}):
+        response = view()
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        import gzip
+        assert gzip.decompress(response.get_data()) == expected
+    with app.test_request_context('/'):
+        response = view()
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_data() == expected
+        assert response.content_type == 'application/json'
+
+
+def test_cache_uses_compact_serializer(app):
+    """CACHE_SERIALIZER reaches the backend (Flask-Caching 2.5 honours it)"""
+    from cache_serialization import CompactSerializer
+    from extensions import cache
+    assert isinstance(cache.cache.serializer, CompactSerializer)
+
+
+def test_compact_serializer_round_trips():
+    from cache_serialization import CompactSerializer
+    serializer = CompactSerializer()
+    for value in (b'raw', 42, {'a': [1, 2]}, 'text', None, b''):
+        assert serializer.loads(serializer.dumps(value)) == value
+    assert serializer.dumps(7) == b'7'  # Redis INCR still works on ints
@@ -0,0 +1,44 @@
+import pytest
+import os
+import runpy
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')
+
+
+@pytest.fixture
+def gunicorn_config():
+    return runpy.run_path(CONFIG_PATH)
+
+
+def test_production_settings(gunicorn_config):
+    """Preloading, keep-alive and jittered recycling are enabled by default"""
+    assert gunicorn_config['preload_app'] is True
+    assert gunicorn_config['worker_class'] == 'gthread'
+    assert gunicorn_config['keepalive'] > 0
+    assert gunicorn_config['max_requests'] > 0
+    assert gunicorn_config['max_requests_jitter'] > 0
+    assert gunicorn_config['default_workers'](4) == 9
+
+
+def test_post_fork_resets_engine_pool(gunicorn_config, app):
+    """Forked workers drop the pool inherited from the master"""
+    from extensions import db
+
+    class FakeApplication:
+        def wsgi(self):
+            return app
+
+    class FakeWorker:
+        pid = 1234
+
+    class FakeServer:
+        class log:
+            @staticmethod
+            def info(message):
+                pass
+
+    worker = FakeWorker()
+    worker.app = FakeApplication()
+    pool_before = db.engine.pool
+    gunicorn_config['post_fork'](FakeServer(), worker)
+    assert db.engine.pool is not pool_before
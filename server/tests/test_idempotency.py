@@ -0,0 +1,113 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+
+
+def _student_and_scholarship(db):
+    from models import User, Scholarship
+    user = User(name='Test User', email='test@example.com', role='student', password_hash='x')
+    scholarship = Scholarship(title='Test Scholarship', description='A test scholarship', amount=5000,
+                              deadline=datetime.utcnow() + timedelta(days=30))
+    db.session.add_all([user, scholarship])
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+    return headers, scholarship.id
+
+
+def test_retried_submission_is_replayed(client, app):
+    """A repeat with the same Idempotency-Key replays the first response"""
+    from extensions import db
+    from models import Application
+    headers, scholarship_id = _student_and_scholarship(db)
+    headers['Idempotency-Key'] = 'submit-1'
+
+    first = client.post('/api/applications/apply', json={'scholarship_id': scholarship_id}, headers=headers)
+    second = client.post('/api/applications/apply', json={'scholarship_id': scholarship_id}, headers=headers)
+    assert first.status_code == second.status_code == 201
+    assert second.data == first.data
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert Application.query.count() == 1
+
+    # Without a key the duplicate reaches the view
+    del headers['Idempotency-Key']
+    response = client.post('/api/applications/apply', json={'scholarship_id': scholarship_id}, headers=headers)
+    assert response.status_code == 409
+
+
+def test_replay_survives_cache_eviction(client, app):
+    """Stored responses are read back from the database when the cache misses"""
+    from extensions import db, cache
+    headers, scholarship_id = _student_and_scholarship(db)
+    headers['Idempotency-Key'] = 'submit-1'
+
+    client.post('/api/applications/apply', json={'scholarship_id': scholarship_id}, headers=headers)
+    cache.clear()
+    response = client.post('/api/applications/apply', json={'scholarship_id': scholarship_id}, headers=headers)
+    assert response.status_code == 201
+    assert response.headers['Idempotent-Replayed'] == 'true'
+
+
+def test_key_reused_for_different_request(client, app):
+    """Reusing a key with a different body is rejected"""
+    from extensions import db
+    headers, scholarship_id = _student_and_scholarship(db)
+    headers['Idempotency-Key'] = 'submit-1'
+
+    client.post('/api/applications/apply', json={'scholarship_id': scholarship_id}, headers=headers)
+    response = client.post('/api/applications/apply', json={'scholarship_id': 999}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_duplicate_waits_for_in_flight_request(client, app):
+    """A duplicate of a request still in progress gets 409 once the wait runs out"""
+    from extensions import db
+    from models import IdempotencyRecord
+    from idempotency import _claim, _digest
+    headers, scholarship_id = _student_and_scholarship(db)
+    headers['Idempotency-Key'] = 'submit-1'
+
+    body = json.dumps({'scholarship_id': scholarship_id}).encode('utf-8')
+    key = _digest('applications.apply_for_scholarship', 'user:1', 'submit-1')
+    assert _claim(key, _digest('POST', '/api/applications/apply', b'', body))
+
+    app.config['IDEMPOTENCY_WAIT'] = 0.1
+    try:
+        response = client.post('/api/applications/apply', data=body, headers=headers,
+                               content_type='application/json')
+    finally:
+        app.config['IDEMPOTENCY_WAIT'] = 5
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+    assert db.session.get(IdempotencyRecord, key).status_code is None
+
+
+def test_key_reused_with_different_query_string(client, app):
+    """The query string is part of the request a key stands for"""
+    from extensions import db
+    headers, scholarship_id = _student_and_scholarship(db)
+    headers['Idempotency-Key'] = 'submit-1'
+
+    client.post('/api/applications/apply', json={'scholarship_id': scholarship_id}, headers=headers)
+    response = client.post('/api/applications/apply?draft=true', json={'scholarship_id': scholarship_id},
+                           headers=headers)
+    assert response.status_code == 422
+
+
+def test_bookkeeping_leaves_the_view_session_alone(app):
+    """Claiming and completing a key neither commits nor discards db.session's pending work"""
+    from extensions import db
+    from flask import make_response
+    from models import IdempotencyRecord, Scholarship
+    from idempotency import _claim, _complete, _digest
+    scholarship = Scholarship(title='Pending', description='Not committed', amount=100,
+                              deadline=datetime.utcnow() + timedelta(days=30))
+    db.session.add(scholarship)
+    key = _digest('test', 'bookkeeping')
+    assert _claim(key, 'fingerprint')
+    assert scholarship in db.session.new
+    with app.test_request_context():
+        _complete(key, 'fingerprint', make_response('done', 201))
+    assert scholarship in db.session.new
+    db.session.rollback()
+    assert db.session.get(IdempotencyRecord, key).status_code == 201
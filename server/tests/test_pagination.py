@@ -0,0 +1,136 @@
+import pytest
+import json
+
+
+@pytest.fixture
+def threshold(app):
+    """Restore PAGINATION_ESTIMATE_THRESHOLD on the session-wide app."""
+    original = app.config['PAGINATION_ESTIMATE_THRESHOLD']
+    yield
+    app.config['PAGINATION_ESTIMATE_THRESHOLD'] = original
+
+
+def test_paginate_returns_page_and_exact_total(app, sample_scholarships):
+    from models import Scholarship
+    from pagination import paginate
+    from sqlalchemy import select
+
+    statement = select(Scholarship).order_by(Scholarship.amount)
+    items, pagination = paginate(statement, 2, 3)
+    assert [s.title for s in items] == ['Arts Prize']
+    assert pagination['total'] == 4
+    assert pagination['total_pages'] == 2
+    assert pagination['has_next'] is False
+    assert 'total_estimated' not in pagination
+
+    # Past the last page the total still comes back
+    items, pagination = paginate(statement, 5, 3)
+    assert items == []
+    assert pagination['total'] == 4
+
+
+def test_paginate_column_rows(app, sample_scholarships):
+    from models import Scholarship
+    from pagination import paginate
+    from sqlalchemy import select
+
+    rows, pagination = paginate(select(Scholarship.title, Scholarship.amount).order_by(Scholarship.amount), 1, 2)
+    assert [(row.title, row.amount) for row in rows] == [('Engineering Award', 500), ('Nursing Grant', 2500)]
+    assert pagination['total'] == 4
+
+
+def test_count_false_skips_total(client, app, sample_scholarships):
+    response = client.get('/api/scholarships/?per_page=3&count=false')
+    pagination = json.loads(response.data)['pagination']
+    assert len(json.loads(response.data)['scholarships']) == 3
+    assert pagination['total_scholarships'] is None
+    assert pagination['total_pages'] is None
+    assert pagination['has_next'] is True
+    assert pagination['next_page'] == 2
+
+    response = client.get('/api/scholarships/?per_page=3&page=2&count=false')
+    pagination = json.loads(response.data)['pagination']
+    assert len(json.loads(response.data)['scholarships']) == 1
+    assert pagination['has_next'] is False
+
+    # The counted listing is cached separately
+    response = client.get('/api/scholarships/?per_page=3')
+    assert json.loads(response.data)['pagination']['total_scholarships'] == 4
+
+
+def test_large_totals_are_estimated(client, app, sample_scholarships, threshold):
+    app.config['PAGINATION_ESTIMATE_THRESHOLD'] = 3
+
+    response = client.get('/api/search/scholarships?per_page=2')
+    pagination = json.loads(response.data)['pagination']
+    assert pagination['total_scholarships'] == 4
+    assert 'total_estimated' not in pagination  # First count is exact, then cached
+
+    response = client.get('/api/search/scholarships?per_page=2&page=2')
+    pagination = json.loads(response.data)['pagination']
+    assert pagination['total_scholarships'] == 4
+    assert pagination['total_estimated'] is True
+    assert len(json.loads(response.data)['scholarships']) == 2
+
+
+def test_search_count_false_still_retries_fuzzy(client, app, sample_scholarships):
+    response = client.get('/api/search/scholarships?q=Nursng&count=false')
+    data = json.loads(response.data)
+    assert data['fuzzy'] is True
+    assert [s['title'] for s in data['scholarships']] == ['Nursing Grant']
+    assert data['pagination']['total_scholarships'] is None
+
+
+def test_planner_estimate_only_for_known_large_queries(app, sample_scholarships, threshold, monkeypatch):
+    from extensions import cache, db
+    from models import Scholarship
+    import pagination
+    from sqlalchemy import select
+    explained = []
+    monkeypatch.setattr(pagination, '_planner_estimate', lambda connection, statement: explained.append(1) or 50000)
+    statement = select(Scholarship).order_by(Scholarship.amount)
+
+    # Small results: the window count alone, no EXPLAIN
+    _, metadata = pagination.paginate(statement, 1, 2)
+    assert explained == [] and metadata['total'] == 4
+
+    # Once a count showed the query to be large, an expired count is estimated
+    app.config['PAGINATION_ESTIMATE_THRESHOLD'] = 3
+    pagination.paginate(statement, 1, 2)
+    cache.delete(pagination._count_cache_key(statement, db.session.connection().dialect))
+    items, metadata = pagination.paginate(statement, 1, 2)
+    assert explained == [1]
+    assert metadata['total'] == 50000 and metadata['total_estimated'] is True
+    assert len(items) == 2
+
+
+@pytest.mark.parametrize('driver', ['psycopg2', 'psycopg', 'asyncpg'])
+def test_planner_estimate_binds_expanded_in_lists(driver):
+    """EXPLAIN keeps IN (...) values as bound parameters on every Postgres driver"""
+    import importlib
+    from models import Scholarship
+    from pagination import _planner_estimate
+    from sqlalchemy import select
+    dialect = importlib.import_module(f'sqlalchemy.dialects.postgresql.{driver}').dialect()
+    executed = []
+
+    class Connection:
+        def __init__(self):
+            self.dialect = dialect
+
+        def execute(self, clause, params):
+            compiled = clause.compile(dialect=dialect)
+            executed.append((str(compiled), compiled.construct_params(params)))
+
+            class Result:
+                def scalar(self):
+                    return [{'Plan': {'Plan Rows': 1234}}]
+            return Result()
+
+    statement = select(Scholarship).where(Scholarship.id.in_([3, 5, 8]), Scholarship.title == 'a:b')
+    assert _planner_estimate(Connection(), statement) == 1234
+    sql, params = executed[0]
+    assert sql.startswith('EXPLAIN (FORMAT JSON) SELECT')
+    assert 'POSTCOMPILE' not in sql and "'a:b'" not in sql
+    assert sorted(value for value in params.values() if isinstance(value, int)) == [3, 5, 8]
+    assert 'a:b' in params.values()
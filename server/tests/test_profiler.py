@@ -0,0 +1,77 @@
+import pytest
+import json
+
+
+@pytest.fixture
+def profile_dir(app, tmp_path):
+    previous = app.config['PROFILE_DIR']
+    app.config['PROFILE_DIR'] = str(tmp_path)
+    yield tmp_path
+    app.config['PROFILE_DIR'] = previous
+
+
+def test_admin_request_is_profiled(client, app, admin, profile_dir):
+    """X-Profile from an admin saves folded stacks and links to them"""
+    response = client.get('/api/admin/stats', headers={'X-Profile': '1'})
+    assert response.status_code == 200
+    url = response.headers['X-Profile-URL']
+    assert url.startswith('/api/admin/profiles/')
+    assert 'profile;dur=' in response.headers['Server-Timing']
+
+    profile = client.get(url)
+    assert profile.status_code == 200
+    for line in profile.get_data(as_text=True).splitlines():
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+    listed = json.loads(client.get('/api/admin/profiles').data)['profiles']
+    assert [entry['name'] for entry in listed] == [url.rsplit('/', 1)[1]]
+
+
+def test_profile_header_ignored_for_non_admins(client, app, profile_dir):
+    response = client.get('/api/scholarships/', headers={'X-Profile': '1'})
+    assert 'X-Profile-URL' not in response.headers
+    assert list(profile_dir.iterdir()) == []
+
+
+def test_signed_profile_token(client, app, runner, profile_dir):
+    token = runner.invoke(args=['profile-token']).stdout.strip()
+    response = client.get(f'/api/scholarships/?_profile={token}')
+    assert 'X-Profile-URL' in response.headers
+    assert len(list(profile_dir.iterdir())) == 1
+
+    response = client.get(f'/api/scholarships/?_profile={token}x')
+    assert 'X-Profile-URL' not in response.headers
+
+
+def test_sampler_records_the_running_stack():
+    import time
+    from profiler import Sampler
+
+    def busy_wait():
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+
+    with Sampler(0.001) as sampler:
+        busy_wait()
+    assert any('busy_wait' in stack for stack in sampler.samples)
+    assert sampler.duration >= 0.05
+
+
+def test_saved_profiles_are_capped(client, app, admin, profile_dir, monkeypatch):
+    monkeypatch.setitem(app.config, 'PROFILE_MAX_FILES', 2)
+    for stamp in ('20240101T000000', '20240102T000000', '20240103T000000'):
+        (profile_dir / f'{stamp}-old-00000000.folded').write_text('main 1\n')
+    (profile_dir / 'notes.txt').write_text('kept')
+
+    response = client.get('/api/admin/stats', headers={'X-Profile': '1'})
+    newest = response.headers['X-Profile-URL'].rsplit('/', 1)[1]
+    assert sorted(path.name for path in profile_dir.iterdir()) == [
+        '20240103T000000-old-00000000.folded', newest, 'notes.txt'
+    ]
+
+
+def test_profiling_is_off_outside_development():
+    import os
+    from config import ProductionConfig
+    assert ProductionConfig.PROFILE_DIR == os.environ.get('PROFILE_DIR')
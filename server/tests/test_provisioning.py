@@ -0,0 +1,143 @@
+import pytest
+import io
+import json
+
+
+ROSTER = '''name,email,role,password
+Ada Student,ada@uni.edu,,secret123
+Ben Student,ben@uni.edu,student,
+,missing@uni.edu,,
+Cy Donor,cy@uni.edu,donor,
+Ada Again,ada@uni.edu,,
+Eve Admin,eve@uni.edu,admin,
+Old User,admin@example.com,,
+'''
+
+
+def test_provision_roster(client, app, admin):
+    from extensions import db, mail
+    from models import User
+
+    with mail.record_messages() as outbox:
+        response = client.post('/api/admin/users/provision', data=ROSTER, content_type='text/csv')
+    assert response.status_code == 200
+    report = json.loads(response.data)
+    assert report['created'] == 3
+    assert report['invited'] == 2
+    assert [(error['line'], error['error']) for error in report['errors']] == [
+        (4, 'Missing required fields'),
+        (6, 'Duplicate email in roster'),
+        (7, 'Invalid role'),
+        (8, 'User already exists')
+    ]
+
+    ada = db.session.scalars(db.select(User).filter_by(email='ada@uni.edu')).one()
+    assert ada.check_password('secret123')
+    assert ada.email_verified
+    ben = db.session.scalars(db.select(User).filter_by(email='ben@uni.edu')).one()
+    assert ben.role == 'student'
+    assert not ben.check_password('')
+
+    # The invite link sets the password
+    assert sorted(message.recipients[0] for message in outbox) == ['ben@uni.edu', 'cy@uni.edu']
+    body = next(m.body for m in outbox if m.recipients == ['ben@uni.edu'])
+    token = body.split('/reset-password/')[1].split()[0]
+    response = client.post(f'/api/auth/reset-password/{token}', data=json.dumps({'password': 'chosen123'}),
+                           content_type='application/json')
+    assert response.status_code == 200
+    db.session.refresh(ben)
+    assert ben.check_password('chosen123')
+
+
+def test_provision_roster_requires_admin(client, app):
+    from extensions import db
+    from models import User
+    student = User(name='Student', email='student@example.com', role='student')
+    student.set_password('password123')
+    db.session.add(student)
+    db.session.commit()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(student.id)
+
+    response = client.post('/api/admin/users/provision', data=ROSTER, content_type='text/csv')
+    assert response.status_code == 403
+
+
+def test_provision_rejects_roster_without_columns(client, app, admin):
+    response = client.post('/api/admin/users/provision', data='first,last\nA,B\n', content_type='text/csv')
+    assert response.status_code == 400
+
+
+def test_provision_batches_on_process_pool(app):
+    from extensions import db
+    from models import User
+    from provisioning import provision_users, read_roster
+    lines = ['name,email,password'] + [f'Student {i},s{i}@uni.edu,pw{i}' for i in range(25)]
+
+    report = provision_users(read_roster(io.StringIO('\n'.join(lines))), batch_size=10, workers=2)
+    assert report == {'created': 25, 'invited': 0, 'errors': []}
+    user = db.session.scalars(db.select(User).filter_by(email='s17@uni.edu')).one()
+    assert user.check_password('pw17')
+
+
+def test_provision_users_command(runner, app, tmp_path):
+    from extensions import db
+    from models import User
+    roster = tmp_path / 'roster.csv'
+    roster.write_text('name,email\nZed,zed@uni.edu\n')
+    result = runner.invoke(args=['provision-users', str(roster), '--no-invites'])
+    assert result.exit_code == 0, result.output
+    assert 'Created 1 accounts (1 invited)' in result.output
+    assert db.session.scalars(db.select(User).filter_by(email='zed@uni.edu')).one()
+
+
+def test_provision_users_command_sends_invites_before_exit(runner, app, tmp_path, monkeypatch):
+    import time
+    import provisioning
+    sent = []
+
+    def slow_send(invites):
+        time.sleep(0.2)
+        sent.extend(email for _, email, _ in invites)
+        return len(invites)
+
+    monkeypatch.setattr(provisioning, 'send_invites', slow_send)
+    monkeypatch.setitem(app.config, 'PROVISION_INVITES_ASYNC', True)
+    roster = tmp_path / 'roster.csv'
+    roster.write_text('name,email\nZed,zed@uni.edu\nYan,yan@uni.edu\n')
+    result = runner.invoke(args=['provision-users', str(roster)])
+    assert result.exit_code == 0, result.output
+    assert 'Created 2 accounts (2 invited)' in result.output
+    assert sorted(sent) == ['yan@uni.edu', 'zed@uni.edu']
+
+
+def test_provision_route_caps_roster_size(client, app, admin):
+    from extensions import db
+    from models import User
+    previous = app.config['PROVISION_HTTP_MAX_ROWS']
+    app.config['PROVISION_HTTP_MAX_ROWS'] = 2
+    try:
+        roster = 'name,email\nA,a@uni.edu\nB,b@uni.edu\nC,c@uni.edu\n'
+        response = client.post('/api/admin/users/provision', data=roster, content_type='text/csv')
+    finally:
+        app.config['PROVISION_HTTP_MAX_ROWS'] = previous
+    assert response.status_code == 413
+    assert db.session.scalars(db.select(User).filter_by(email='a@uni.edu')).first() is None
+
+
+def test_provision_without_upsert_skips_existing(app, monkeypatch):
+    from extensions import db
+    from models import User
+    import provisioning
+    monkeypatch.setattr(provisioning, 'UPSERT_DIALECTS', {})
+    existing = User(name='Old', email='old@uni.edu', role='student')
+    existing.set_password('password123')
+    db.session.add(existing)
+    db.session.commit()
+
+    provisioner = provisioning.Provisioner(batch_size=10, workers=1, send_invites=False)
+    values = [{'name': name, 'email': email, 'role': 'student', 'password_hash': 'x', 'email_verified': True}
+              for name, email in (('Old', 'old@uni.edu'), ('New', 'new@uni.edu'))]
+    created = provisioner._insert(values)
+    assert list(created) == ['new@uni.edu']
+    assert db.session.scalars(db.select(User).filter_by(email='old@uni.edu')).one().name == 'Old'
@@ -0,0 +1,50 @@
+import pytest
+import json
+from ratelimit import MemoryStorage, parse_limit
+
+
+def test_parse_limit():
+    """Limit strings are parsed into (amount, window seconds)"""
+    assert parse_limit('5/hour') == (5, 3600)
+    assert parse_limit('10 per minute') == (10, 60)
+    with pytest.raises(ValueError):
+        parse_limit('often')
+
+
+def test_memory_storage_counts_per_key():
+    """MemoryStorage increments the current window and reads the previous one"""
+    storage = MemoryStorage()
+    assert storage.hit('k:2', 'k:1', 60) == (1, 0)
+    assert storage.hit('k:2', 'k:1', 60) == (2, 0)
+    assert storage.hit('k:3', 'k:2', 60) == (1, 2)
+    storage.undo('k:3')
+    assert storage.hit('k:3', 'k:2', 60) == (1, 2)
+
+
+def test_login_rate_limited(client, app):
+    """Login is rejected with 429 and RateLimit headers once the limit is used up"""
+    from extensions import limiter
+    limiter.storage.reset()
+
+    data = json.dumps({'email': 'nobody@example.com', 'password': 'wrong'})
+    for _ in range(10):
+        response = client.post('/api/auth/login', data=data, content_type='application/json')
+        assert response.status_code == 401
+        assert 'RateLimit-Remaining' in response.headers
+
+    response = client.post('/api/auth/login', data=data, content_type='application/json')
+    assert response.status_code == 429
+    assert response.headers['RateLimit-Remaining'] == '0'
+    assert 'Retry-After' in response.headers
+    limiter.storage.reset()
+
+
+def test_redis_url_without_redis_package(monkeypatch, caplog):
+    """Without the redis package the limiter warns once and counts per process"""
+    import sys
+    from ratelimit import storage_from_url
+    monkeypatch.setitem(sys.modules, 'redis', None)
+    with caplog.at_level('WARNING', logger='ratelimit'):
+        storage = storage_from_url('redis://localhost:6379/0')
+    assert isinstance(storage, MemoryStorage)
+    assert len(caplog.records) == 1
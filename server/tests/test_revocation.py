@@ -0,0 +1,127 @@
+import pytest
+import json
+
+
+def _create_user(db):
+    from models import User
+    user = User(name='Token User', email='token@example.com', role='student', email_verified=True)
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _login(client):
+    response = client.post('/api/auth/login', data=json.dumps({'email': 'token@example.com', 'password': 'password123'}),
+                           content_type='application/json')
+    assert response.status_code == 200
+    return json.loads(response.data)
+
+
+def _bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_bloom_filter_has_no_false_negatives():
+    from revocation import BloomFilter
+    bloom = BloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom.add(f'revoked-{i}')
+    assert all(f'revoked-{i}' in bloom for i in range(1000))
+    false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_refresh_rotates_tokens(client, app):
+    from extensions import db
+    _create_user(db)
+    tokens = _login(client)
+
+    # A refresh token is not an access token
+    assert client.get('/api/profile/', headers=_bearer(tokens['refresh_token'])).status_code == 422
+
+    response = client.post('/api/auth/refresh', headers=_bearer(tokens['refresh_token']))
+    assert response.status_code == 200
+    renewed = json.loads(response.data)
+    assert client.get('/api/profile/', headers=_bearer(renewed['access_token'])).status_code == 200
+
+    # The used refresh token was revoked
+    assert client.post('/api/auth/refresh', headers=_bearer(tokens['refresh_token'])).status_code == 401
+    assert client.post('/api/auth/refresh', headers=_bearer(renewed['refresh_token'])).status_code == 200
+
+
+def test_logout_revokes_access_and_refresh_tokens(client, app):
+    from extensions import db
+    _create_user(db)
+    tokens = _login(client)
+    assert client.get('/api/profile/', headers=_bearer(tokens['access_token'])).status_code == 200
+
+    response = client.post('/api/auth/logout', headers=_bearer(tokens['access_token']),
+                           data=json.dumps({'refresh_token': tokens['refresh_token']}),
+                           content_type='application/json')
+    assert response.status_code == 200
+    assert client.get('/api/profile/', headers=_bearer(tokens['access_token'])).status_code == 401
+    assert client.post('/api/auth/refresh', headers=_bearer(tokens['refresh_token'])).status_code == 401
+    # Logging out again with the revoked token still succeeds
+    assert client.post('/api/auth/logout', headers=_bearer(tokens['access_token'])).status_code == 200
+
+
+def test_unrevoked_tokens_skip_the_database(client, app):
+    from extensions import db
+    from revocation import revocation_list
+    _create_user(db)
+    tokens = _login(client)
+    stats = revocation_list().stats
+    before = dict(stats)
+
+    for _ in range(3):
+        assert client.get('/api/profile/', headers=_bearer(tokens['access_token'])).status_code == 200
+    assert stats['checks'] == before['checks'] + 3
+    assert stats['filter_hits'] == before['filter_hits']
+
+
+def test_other_workers_pick_up_revocations(app):
+    from flask_jwt_extended import create_access_token, decode_token
+    from extensions import db
+    from revocation import RevocationList, revoke_token
+    user = _create_user(db)
+    payload = decode_token(create_access_token(identity=str(user.id)))
+
+    other_worker = RevocationList(app)
+    assert not other_worker.is_revoked(payload['jti'])
+    revoke_token(payload)
+    assert other_worker.is_revoked(payload['jti'])
+
+
+def test_asgi_rejects_revoked_tokens(asgi_app, asgi_get):
+    from flask_jwt_extended import create_access_token, decode_token
+    from extensions import db
+    from revocation import revoke_token
+    with asgi_app.flask_app.app_context():
+        user = _create_user(db)
+        token = create_access_token(identity=str(user.id))
+
+    status, _ = asgi_get('/api/applications/my-applications', _bearer(token))
+    assert status == 200
+    with asgi_app.flask_app.app_context():
+        revoke_token(decode_token(token))
+    status, body = asgi_get('/api/applications/my-applications', _bearer(token))
+    assert status == 401
+    assert body == {'msg': 'Token has been revoked'}
+
+
+def test_workers_sync_revocations_incrementally(app):
+    from flask_jwt_extended import create_access_token, decode_token
+    from extensions import db
+    from revocation import RevocationList, revoke_token
+    user = _create_user(db)
+    first, second = (decode_token(create_access_token(identity=str(user.id))) for _ in range(2))
+
+    other_worker = RevocationList(app)
+    other_worker.sync()
+    revoke_token(first)
+    revoke_token(first)  # Twice (e.g. a retried logout) is harmless
+    revoke_token(second)
+    assert other_worker.is_revoked(first['jti']) and other_worker.is_revoked(second['jti'])
+    assert other_worker.stats['rebuilds'] == 1
+    assert other_worker.stats['syncs'] == 1
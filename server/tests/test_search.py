@@ -0,0 +1,112 @@
+import pytest
+import json
+from datetime import datetime, timedelta
+
+
+def _counts(facet):
+    return {bucket['key']: bucket['count'] for bucket in facet}
+
+
+def test_search_facets(client, app, sample_scholarships):
+    """facets=amount,deadline returns bucket counts over every match"""
+
+    response = client.get('/api/search/scholarships?facets=amount,deadline&per_page=1')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert len(data['scholarships']) == 1
+    assert data['pagination']['total_scholarships'] == 4
+    assert _counts(data['facets']['amount']) == {
+        '0-1000': 1, '1000-5000': 1, '5000-10000': 1, '10000+': 1
+    }
+    assert _counts(data['facets']['deadline']) == {
+        'closed': 0, '0-7': 1, '7-30': 1, '30-90': 1, '90+': 1
+    }
+
+    response = client.get('/api/search/scholarships?facets=amount&min_amount=2000')
+    data = json.loads(response.data)
+    assert list(data['facets']) == ['amount']
+    assert _counts(data['facets']['amount'])['0-1000'] == 0
+
+
+def test_search_facets_refresh_when_catalog_changes(client, app, sample_scholarships):
+    """Cached facet counts are retired when a scholarship changes"""
+    from extensions import db
+    from models import Scholarship
+    from cache_utils import bump_catalog_generation
+
+    client.get('/api/search/scholarships?facets=amount')
+    db.session.add(Scholarship(title='New Award', description='New', amount=100,
+                               deadline=datetime.utcnow() + timedelta(days=10)))
+    db.session.commit()
+    bump_catalog_generation()
+
+    data = json.loads(client.get('/api/search/scholarships?facets=amount').data)
+    assert data['pagination']['total_scholarships'] == 5
+    assert _counts(data['facets']['amount'])['0-1000'] == 2
+
+
+def test_search_unknown_facet(client, app):
+    """Unknown facet names are rejected"""
+    response = client.get('/api/search/scholarships?facets=colour')
+    assert response.status_code == 400
+
+
+def test_suggest_prefix_and_word_matches(client, app, sample_scholarships):
+    """Suggestions match the start of the title first, then any word"""
+    from extensions import db
+    from models import Scholarship
+    db.session.add(Scholarship(title='Grant for Engineers', description='A test scholarship',
+                               amount=1000, deadline=datetime.utcnow() + timedelta(days=5)))
+    db.session.commit()
+
+    data = json.loads(client.get('/api/search/suggest?q=gra').data)
+    assert [s['title'] for s in data['suggestions']] == ['Grant for Engineers', 'Nursing Grant']
+
+    data = json.loads(client.get('/api/search/suggest?q=ENGINEERING%20a').data)
+    assert [s['title'] for s in data['suggestions']] == ['Engineering Award']
+
+
+def test_suggest_index_follows_catalog_changes(client, app, sample_scholarships):
+    """Deactivated scholarships drop out of suggestions"""
+    from extensions import db
+    from models import Scholarship
+    from cache_utils import bump_catalog_generation
+    assert len(json.loads(client.get('/api/search/suggest?q=arts').data)['suggestions']) == 1
+
+    Scholarship.query.filter_by(title='Arts Prize').one().is_active = False
+    db.session.commit()
+    bump_catalog_generation()
+    assert json.loads(client.get('/api/search/suggest?q=arts').data)['suggestions'] == []
+
+
+def test_suggest_falls_back_to_database(client, app, sample_scholarships):
+    """A query that isn't a word prefix falls back to the database match"""
+    data = json.loads(client.get('/api/search/suggest?q=ursing').data)
+    assert [s['title'] for s in data['suggestions']] == ['Nursing Grant']
+
+
+def test_misspelled_search_falls_back_to_fuzzy(client, app, sample_scholarships):
+    """A query with no exact match is retried typo-tolerantly"""
+
+    data = json.loads(client.get('/api/search/scholarships?q=enginering').data)
+    assert data['fuzzy'] is True
+    assert [s['title'] for s in data['scholarships']] == ['Engineering Award']
+
+    data = json.loads(client.get('/api/search/scholarships?q=enginering&fuzzy=false').data)
+    assert data['scholarships'] == []
+
+
+def test_fuzzy_search_stems_and_ranks(client, app, sample_scholarships):
+    """Stemming matches word forms; title matches rank above criteria matches"""
+    from extensions import db
+    from models import Scholarship
+    db.session.add(Scholarship(title='Community Fund', description='A test scholarship', amount=800,
+                               deadline=datetime.utcnow() + timedelta(days=1),
+                               eligibility_criteria='Open to engineers'))
+    db.session.commit()
+
+    data = json.loads(client.get('/api/search/scholarships?q=engineer&fuzzy=true').data)
+    assert [s['title'] for s in data['scholarships']] == ['Engineering Award', 'Community Fund']
+
+    data = json.loads(client.get('/api/search/scholarships?q=engineer').data)
+    assert 'fuzzy' not in data
@@ -0,0 +1,75 @@
+import pytest
+import json
+import time
+
+
+def _create_user(db, verified=False):
+    from models import User
+    user = User(name='Token User', email='token@example.com', role='student', email_verified=verified)
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _post_reset(client, token, password='newpassword1'):
+    return client.post(f'/api/auth/reset-password/{token}', data=json.dumps({'password': password}),
+                       content_type='application/json')
+
+
+def test_reset_token_is_stateless_and_single_use(client, app):
+    from extensions import db
+    user = _create_user(db, verified=True)
+    token = user.generate_reset_token()
+    assert user.password_reset_token is None  # Nothing stored
+
+    assert _post_reset(client, token).status_code == 200
+    db.session.refresh(user)
+    assert user.check_password('newpassword1')
+    # The new password hash retires the token
+    assert _post_reset(client, token, 'another123').status_code == 400
+
+
+def test_tampered_and_expired_tokens_are_rejected(client, app, monkeypatch):
+    from extensions import db
+    import models
+    user = _create_user(db)
+
+    token = user.generate_reset_token()
+    assert _post_reset(client, token[:-2] + ('AA' if not token.endswith('AA') else 'BB')).status_code == 400
+    # A verification token is not a reset token
+    assert _post_reset(client, user.generate_verification_token()).status_code == 400
+
+    verification_token = user.generate_verification_token()
+    now = time.time()
+    monkeypatch.setattr(models.time, 'time', lambda: now + 2 * 60 * 60)
+    assert _post_reset(client, token).status_code == 400  # Reset links last an hour
+    response = client.get(f'/api/auth/verify-email/{verification_token}')
+    assert response.status_code == 200  # Verification links a day
+
+def test_verify_email_with_signed_token(client, app):
+    from extensions import db
+    user = _create_user(db)
+    token = user.generate_verification_token()
+
+    response = client.get(f'/api/auth/verify-email/{token}')
+    assert response.status_code == 200
+    db.session.refresh(user)
+    assert user.email_verified
+    assert client.get(f'/api/auth/verify-email/{token}').status_code == 400
+
+
+def test_stored_tokens_still_work(client, app):
+    from datetime import datetime, timedelta
+    from extensions import db
+    user = _create_user(db)
+    user.password_reset_token = 'legacy-reset-token'
+    user.password_reset_expires = datetime.utcnow() + timedelta(hours=1)
+    user.email_verification_token = 'legacy-verify-token'
+    user.email_verification_expires = datetime.utcnow() + timedelta(hours=1)
+    db.session.commit()
+
+    assert client.get('/api/auth/verify-email/legacy-verify-token').status_code == 200
+    assert _post_reset(client, 'legacy-reset-token').status_code == 200
+    db.session.refresh(user)
+    assert user.email_verified and user.password_reset_token is None
@@ -0,0 +1,117 @@
+import pytest
+import json
+
+
+@pytest.fixture
+def record_everything(app):
+    """Treat every statement as slow for the duration of a test."""
+    from extensions import slow_queries
+    previous = app.config['SLOW_QUERY_THRESHOLD_MS']
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = 0
+    yield slow_queries
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = previous
+    slow_queries.flush()
+
+
+def test_normalize_sql_strips_literals_and_in_lists():
+    from slow_queries import normalize_sql, fingerprint
+    first = normalize_sql("SELECT * FROM scholarship WHERE title ILIKE '%nurse%' AND id IN (?, ?, ?) LIMIT 10")
+    second = normalize_sql("SELECT *  FROM scholarship\nWHERE title ILIKE 'x' AND id IN (?) LIMIT 20")
+    assert first == 'SELECT * FROM scholarship WHERE title ILIKE ? AND id IN (...) LIMIT ?'
+    assert fingerprint(first) == fingerprint(second)
+    assert normalize_sql('SELECT anon_1.id::text FROM t WHERE id = %(id_1)s') == \
+        'SELECT anon_1.id::text FROM t WHERE id = ?'
+
+
+def test_slow_search_is_aggregated_with_plan(client, app, record_everything):
+    """Repeated searches land on one fingerprint with endpoint, bind shape and plan"""
+    from slow_queries import top_slow_queries
+    client.get('/api/search/scholarships?q=nursing')
+    client.get('/api/search/scholarships?q=engineering')
+    record_everything.flush()
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = None  # Don't record the report's own queries
+
+    report = top_slow_queries(limit=100)
+    search = [entry for entry in report
+              if any(e['endpoint'] == 'search.search_scholarships' for e in entry['endpoints'])
+              and 'LIKE' in entry['statement'].upper()]
+    assert search
+    entry = search[0]
+    assert entry['calls'] >= 2
+    assert 'nursing' not in entry['statement']
+    assert 'str' in entry['bind_shape']
+    assert entry['plan']  # EXPLAIN QUERY PLAN on SQLite
+
+
+def test_recorder_ignores_its_own_writes(app, record_everything):
+    from extensions import db
+    from models import SlowQueryStat
+    from sqlalchemy import text
+    db.session.execute(text('SELECT 1'))
+    record_everything.flush()
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+    statements = [stat.statement for stat in SlowQueryStat.query.all()]
+    assert 'SELECT ?' in statements
+    assert not any('slow_query_stat' in statement for statement in statements)
+
+
+def test_slow_query_report_endpoint(client, app, admin, record_everything):
+    client.get('/api/search/scholarships?q=nursing')
+    record_everything.flush()
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+
+    response = client.get('/api/admin/slow-queries?sort=calls&limit=5')
+    assert response.status_code == 200
+    queries = json.loads(response.data)['queries']
+    assert 0 < len(queries) <= 5
+    assert queries == sorted(queries, key=lambda entry: -entry['calls'])
+
+    assert client.get('/api/admin/slow-queries?sort=bogus').status_code == 400
+
+
+def test_slow_queries_command(app, runner, record_everything):
+    from extensions import db
+    from sqlalchemy import text
+    db.session.execute(text('SELECT 1'))
+    record_everything.flush()
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+
+    result = runner.invoke(args=['slow-queries', '--limit', '3'])
+    assert result.exit_code == 0
+    assert 'calls=' in result.output
+    result = runner.invoke(args=['slow-queries', '--reset'])
+    assert 'cleared' in result.output
+    assert 'No slow queries recorded' in runner.invoke(args=['slow-queries']).output
+
+
+def test_failed_statement_does_not_skew_next_timing(app, record_everything):
+    import time
+    from extensions import db
+    from models import SlowQueryStat, User
+    from sqlalchemy import text
+    from sqlalchemy.exc import IntegrityError
+    user = User(name='Twice', email='twice@example.com', role='student')
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    db.session.add(User(name='Twice', email='twice@example.com', role='student', password_hash='x'))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+    # No timer left behind on the connection for a later statement to pick up
+    assert not any(str(key).startswith('slow_query') for key in db.session.connection().info)
+    time.sleep(0.2)
+
+    db.session.execute(text('SELECT 42 AS answer'))
+    record_everything.flush()
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+    stat = SlowQueryStat.query.filter(SlowQueryStat.statement == 'SELECT ? AS answer').one()
+    assert stat.max_ms < 200
+
+
+def test_threshold_setting():
+    from config import _threshold_ms
+    assert _threshold_ms(None, 200.0) == 200.0
+    assert _threshold_ms('50', 200.0) == 50.0
+    assert _threshold_ms('', 200.0) is None
+    assert _threshold_ms('off', 200.0) is None
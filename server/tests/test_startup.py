@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Import + create_app() in a fresh interpreter must stay under this many seconds
+STARTUP_BUDGET_SECONDS = 2.5
+
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+app = create_app('testing')
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'elapsed': elapsed,
+    'modules': [m for m in ('flask_mail', 'flask_bcrypt', 'bcrypt') if m in sys.modules]
+}))
+"""
+
+
+def _measure_startup():
+    output = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT],
+        cwd=SERVER_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_create_app_within_import_budget():
+    """A cold worker builds the app within the startup budget"""
+    result = _measure_startup()
+    assert result['elapsed'] < STARTUP_BUDGET_SECONDS
+
+
+def test_heavy_extensions_are_deferred():
+    """bcrypt and Flask-Mail are not imported until first used"""
+    result = _measure_startup()
+    assert result['modules'] == []
+
+
+def test_bcrypt_loads_on_first_use(app):
+    """The lazy bcrypt extension hashes passwords once accessed"""
+    from models import User
+    user = User(name='Test User', email='test@example.com', role='student')
+    user.set_password('password123')
+    assert user.check_password('password123')
+    assert not user.check_password('wrong')
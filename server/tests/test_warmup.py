@@ -0,0 +1,74 @@
+import pytest
+import json
+
+
+@pytest.fixture(autouse=True)
+def fresh_popularity(app):
+    """Drop hits other tests left pending in the session-wide app."""
+    from extensions import cache
+    from popularity import popularity_tracker
+    popularity_tracker().flush()
+    cache.clear()
+
+
+def test_most_popular_ranks_hits(client, app, sample_scholarships):
+    from popularity import most_popular, warm_secret
+    for id in (2, 2, 2, 2, 1, 3, 3):
+        client.get(f'/api/scholarships/{id}')
+    client.get('/api/search/scholarships?q=Nursing')
+    client.get('/api/search/scholarships?q=nursing ')
+    client.get('/api/search/scholarships?q=arts')
+    client.get('/api/scholarships/3', headers={'X-Cache-Warm': '1'})  # Counted: not the warmer's secret
+    with app.app_context():
+        secret = warm_secret(app)
+    client.get('/api/scholarships/4', headers={'X-Cache-Warm': secret})  # Not counted
+
+    assert most_popular('scholarship', 2) == [2, 3]
+    assert most_popular('scholarship', 10) == [2, 3, 1]
+    assert most_popular('search', 1) == ['nursing']
+
+
+def test_warm_cache_fills_hot_entries(client, app, sample_scholarships):
+    from extensions import cache
+    from cache_utils import catalog_generation
+    from warmup import warm_cache
+    client.get('/api/scholarships/1')
+    client.get('/api/search/scholarships?q=science')
+    cache.delete('scholarship_1')
+    generation = catalog_generation()
+
+    summary = warm_cache(app, pages=2, scholarships=5, queries=5, workers=1, rate=0)
+    assert summary['urls'] == 4
+    assert summary['failed'] == 0
+    assert cache.get(f'scholarships_list_{generation}_1_10') is not None
+    assert cache.get(f'scholarships_list_{generation}_2_10') is not None
+    assert cache.get('scholarship_1') is not None
+    assert cache.get('admin_stats_0')['total_scholarships'] == 4
+
+
+def test_warm_lock_coalesces_triggers(app):
+    from warmup import warm_in_background
+    thread = warm_in_background(app, pages=1, scholarships=0, queries=0, workers=1, rate=0)
+    assert thread is not None
+    thread.join()
+    assert warm_in_background(app) is None
+
+
+def test_catalog_change_rewarms(app):
+    from cache_utils import bump_catalog_generation
+    from warmup import warm_in_background
+    options = dict(pages=1, scholarships=0, queries=0, workers=1, rate=0)
+    warm_in_background(app, **options).join()
+
+    with app.app_context():
+        bump_catalog_generation()
+    thread = warm_in_background(app, **options)
+    assert thread is not None
+    thread.join()
+    assert warm_in_background(app, **options) is None
+
+
+def test_warm_cache_command(app, runner):
+    result = runner.invoke(args=['warm-cache', '--pages', '1', '--workers', '1', '--rate', '0'])
+    assert result.exit_code == 0
+    assert 'Warmed 1 urls (0 failed)' in result.output
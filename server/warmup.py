@@ -0,0 +1,147 @@
+"""
+Cache warming.
+
+Precomputes what the first wave of users would otherwise pay for after a
+deploy or a catalog change: the first pages of /api/scholarships, the most
+viewed scholarship details, the top search queries and the admin dashboard
+stats. Public pages are fetched through the app itself (a test client with
+WARM_HEADER), so they land under exactly the keys the views read.
+
+Requests run on a small thread pool and are started at most `rate` per
+second, so warming never becomes the load spike it is meant to prevent.
+A shared lock key makes concurrent triggers - several workers booting, a
+burst of catalog changes - warm once, and a warm-up that finds the catalog
+changed while it ran goes again. WARM_HEADER carries a secret (see
+popularity.warm_secret) so only the warmer's requests skip popularity
+counting.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from extensions import cache
+from cache_utils import catalog_generation
+from popularity import WARM_HEADER, most_popular, warm_secret
+
+WARM_LOCK_KEY = 'cache_warm_lock'
+WARMED_GENERATION_KEY = 'cache_warm_generation'  # Catalog generation the cache was last warmed for
+
+
+class _Throttle:
+    """Spaces call starts at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_at)
+            self.next_at = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def warm_urls(pages, scholarships, queries):
+    urls = [f'/api/scholarships/?{urlencode({"page": page})}' for page in range(1, pages + 1)]
+    urls += [f'/api/scholarships/{id}' for id in most_popular('scholarship', scholarships)]
+    urls += [f'/api/search/scholarships?{urlencode({"q": q})}' for q in most_popular('search', queries)]
+    return urls
+
+
+def warm_cache(app, pages=None, scholarships=None, queries=None, workers=None, rate=None):
+    """Warm the cache for `app`; returns a summary dict."""
+    config = app.config
+    pages = config['CACHE_WARM_PAGES'] if pages is None else pages
+    scholarships = config['CACHE_WARM_SCHOLARSHIPS'] if scholarships is None else scholarships
+    queries = config['CACHE_WARM_QUERIES'] if queries is None else queries
+    workers = workers or config['CACHE_WARM_WORKERS']
+    rate = config['CACHE_WARM_RATE'] if rate is None else rate
+
+    started = time.monotonic()
+    with app.app_context():
+        from routes.admin import dashboard_stats
+        urls = warm_urls(pages, scholarships, queries)
+        dashboard_stats(refresh=True)
+
+    throttle = _Throttle(rate)
+    headers = {WARM_HEADER: warm_secret(app)}
+
+    def fetch(url):
+        throttle.wait()
+        response = app.test_client().get(url, headers=headers)
+        return response.status_code == 200
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cache-warm') as pool:
+        results = list(pool.map(fetch, urls))
+    return {
+        'urls': len(urls),
+        'failed': results.count(False),
+        'seconds': round(time.monotonic() - started, 2)
+    }
+
+
+def warm_in_background(app, **kwargs):
+    """Warm on a daemon thread unless the cache is already warm for the current catalog.
+
+    Triggers while a warm-up runs are coalesced: when it finishes, the
+    warm-up starts over if the catalog generation moved in the meantime.
+    """
+    with app.app_context():
+        if cache.get(WARMED_GENERATION_KEY) == catalog_generation():
+            return None
+        # Expires on its own if the warming process dies
+        if not cache.add(WARM_LOCK_KEY, 1, timeout=app.config['CACHE_WARM_INTERVAL']):
+            return None
+
+    def run():
+        try:
+            while True:
+                with app.app_context():
+                    generation = catalog_generation()
+                summary = warm_cache(app, **kwargs)
+                app.logger.info('Cache warmed: %(urls)d urls, %(failed)d failed in %(seconds)ss', summary)
+                with app.app_context():
+                    if catalog_generation() == generation:
+                        cache.set(WARMED_GENERATION_KEY, generation, timeout=0)
+                        break
+        except Exception:
+            app.logger.exception('Cache warming failed')
+            return
+        finally:
+            with app.app_context():
+                cache.delete(WARM_LOCK_KEY)
+        # A change made while the lock was being released found it still held
+        warm_in_background(app, **kwargs)
+
+    thread = threading.Thread(target=run, name='cache-warmer', daemon=True)
+    thread.start()
+    return thread
+
+
+def warm_after_invalidation():
+    """Called after a catalog change retired the list and search caches."""
+    if current_app.config['CACHE_WARM_AFTER_INVALIDATION']:
+        # Details are cached per scholarship, not per generation, so they are still warm
+        warm_in_background(current_app._get_current_object(), scholarships=0)
+
+
+@click.command('warm-cache')
+@click.option('--pages', type=int, default=None, help='Pages of /api/scholarships to warm.')
+@click.option('--scholarships', type=int, default=None, help='Most viewed scholarship details to warm.')
+@click.option('--queries', type=int, default=None, help='Top search queries to warm.')
+@click.option('--workers', type=int, default=None, help='Concurrent requests.')
+@click.option('--rate', type=float, default=None, help='Requests started per second (0: unlimited).')
+@with_appcontext
+def warm_cache_command(pages, scholarships, queries, workers, rate):
+    """Precompute hot pages, details, searches and admin stats."""
+    summary = warm_cache(current_app._get_current_object(), pages, scholarships, queries, workers, rate)
+    click.echo(f"Warmed {summary['urls']} urls ({summary['failed']} failed) in {summary['seconds']}s")
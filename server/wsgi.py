@@ -2,6 +2,11 @@
 """
 Production WSGI application for Scholarship Portal
 This script configures the Flask application for production deployment with HTTPS support.
+
+    python wsgi.py      # gunicorn prefork server configured by gunicorn.conf.py
+    gunicorn wsgi:app   # same, started by gunicorn itself
+
+With FLASK_CONFIG=development, `python wsgi.py` runs Flask's debug server instead.
 """
 
 import os
@@ -12,11 +17,10 @@ from pathlib import Path
 server_dir = Path(__file__).parent
 sys.path.insert(0, str(server_dir))
 
-from app import app
-from config import ProductionConfig
+from app import create_app
 
-# Configure for production
-app.config.from_object(ProductionConfig)
+# Build the app with the production config before any extension is initialized
+app = create_app(os.environ.get('FLASK_CONFIG', 'production'))
 
 # SSL context for HTTPS (if certificates are available)
 ssl_context = None
@@ -27,10 +31,31 @@ if app.config.get('SSL_CERT_PATH') and app.config.get('SSL_KEY_PATH'):
     else:
         print("SSL certificate files not found, running without HTTPS")
 
+def run_production_server(application):
+    """Serve `application` with gunicorn's prefork server using gunicorn.conf.py."""
+    import runpy
+    from gunicorn.app.base import BaseApplication
+
+    class PortalServer(BaseApplication):
+        def load_config(self):
+            settings = runpy.run_path(str(server_dir / 'gunicorn.conf.py'))
+            for key, value in settings.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return application
+
+    PortalServer().run()
+
+
 if __name__ == '__main__':
-    # Development server with optional HTTPS
     print("Starting Scholarship Portal server...")
-    if ssl_context:
+    if not app.debug:
+        # Production: prefork gunicorn workers (see gunicorn.conf.py)
+        run_production_server(app)
+    elif ssl_context:
+        # Development server with optional HTTPS
         print("Running with HTTPS enabled")
         app.run(
             host='0.0.0.0',